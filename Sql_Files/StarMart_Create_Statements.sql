@@ -17,6 +17,7 @@ KEY TABLES & RELATIONSHIPS:
 - `starmart_inventory`: Tracks real-time on-hand quantities of products.
 - `starmart_inventory_lookup`: Defines restock quantities on given dates.
 - `starmart_vendors`: Multiple vendors can supply the same product.
+- `starmart_vendor_prices`: Vendor unit cost per order quantity tier.
 - `starmart_customers`: Holds customer membership and contact info.
 - `starmart_orders`: Captures each individual item purchase by customers.
 - `starmart_holiday_dates`: Stores dates for national or store holidays.
@@ -83,7 +84,9 @@ CREATE TABLE starmart_inventory_lookup (
     product_id        VARCHAR(25) NOT NULL,
     restock_date      DATE        NOT NULL,
     prod_lookup_qty   INT         NOT NULL,
-    CONSTRAINT fk_invlk_product FOREIGN KEY (product_id) REFERENCES starmart_products ON DELETE CASCADE
+    vendor_unique_id  VARCHAR(25),          -- Cheapest vendor for this restock quantity
+    CONSTRAINT fk_invlk_product FOREIGN KEY (product_id) REFERENCES starmart_products ON DELETE CASCADE,
+    CONSTRAINT fk_invlk_vendor FOREIGN KEY (vendor_unique_id) REFERENCES starmart_vendors ON DELETE CASCADE
 );
 
 -- 6. Vendor details per product
@@ -97,6 +100,14 @@ CREATE TABLE starmart_vendors (
   CONSTRAINT fk_vendor_product FOREIGN KEY (product_id) REFERENCES starmart_products ON DELETE CASCADE
 );
 
+-- 6b. Vendor unit cost per order quantity tier (smaller orders cost more per unit)
+CREATE TABLE starmart_vendor_prices (
+  vendor_unique_id VARCHAR(25),     -- FK to the vendor's product offer
+  min_qty INT NOT NULL,             -- Smallest order quantity of this tier
+  per_item_cost DECIMAL(10, 2),
+  CONSTRAINT fk_vendor_prices_vendor FOREIGN KEY (vendor_unique_id) REFERENCES starmart_vendors ON DELETE CASCADE
+);
+
 -- 7. Customer profile and loyalty tier
 CREATE TABLE starmart_customers (
   customer_id VARCHAR(25) PRIMARY KEY,
@@ -107,7 +118,9 @@ CREATE TABLE starmart_customers (
   email VARCHAR(75),
   address VARCHAR(100),
   recurring VARCHAR(30),           -- Frequency descriptor
-  membership INT                  
+  membership INT,
+  income INT,                      -- Yearly income, cart size model feature
+  family_size INT                  -- Cart size model feature
 );
 
 -- 8. One row per item sold in an order
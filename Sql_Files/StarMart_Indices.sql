@@ -14,6 +14,7 @@ CREATE INDEX idx_invlk_product_date ON starmart_inventory_lookup(product_id, res
 
 -- Indexes for starmart_vendors
 CREATE INDEX idx_vendor_product_id ON starmart_vendors(product_id);
+CREATE INDEX idx_vendor_prices_vendor ON starmart_vendor_prices(vendor_unique_id, min_qty);
 
 -- Indexes for starmart_customers
 CREATE INDEX idx_cust_email ON starmart_customers(email);
@@ -74,7 +74,8 @@ BEGIN
     FOR rec_lookup IN
         SELECT
             lkp.product_id,
-            lkp.prod_lookup_qty
+            lkp.prod_lookup_qty,
+            lkp.vendor_unique_id
         FROM starmart_inventory_lookup AS lkp
         WHERE lkp.restock_date = curr_date
     LOOP
@@ -85,13 +86,8 @@ BEGIN
               AND log.restocked_date = curr_date
               AND log.reason = 'Restock'
         ) THEN
-            -- Pick a random vendor who supplies this product
-            SELECT vendor_unique_id
-              INTO chosen_vendor_id
-            FROM starmart_vendors
-            WHERE product_id = rec_lookup.product_id
-            ORDER BY RANDOM()
-            LIMIT 1;
+            -- The cheapest vendor for the restock quantity, chosen when the lookup was generated
+            chosen_vendor_id := rec_lookup.vendor_unique_id;
 
             INSERT INTO starmart_inventory_log (
                 product_id,
@@ -5,20 +5,35 @@ import calendar
 import re
 from collections import defaultdict
 from faker import Faker
-from stores import generate_stores_df
-import csv
+import pickle
 import random
 from collections import Counter
+from functools import lru_cache
 from pathlib import Path
+from types import SimpleNamespace
 
 from project_data import *
+from table_cache import cached_table
+from catalog_artifact import load_catalog_artifact, parse_shelf_life
+from compressed_io import open_output, read_output_csv
+from dataset_registry import get_dataset
+from restock_forecast import forecast_restock_quantities
+from retail_calendar import RetailCalendar, holiday_names, season_names
 
 
 base_dir = Path(
     "C:/Users/shrav/Data_Analysis_Projects/Big Projects/Project StarMart/Datasets"
 )
+# Cart size model bundle written by other_scripts/cart_size_training.py
+basket_model_path = Path(__file__).resolve().parent / "build" / "cart_size_model.pkl"
 
-fake = Faker()
+
+# ---- Lazily built state ----
+# Nothing below runs at import time, every context is built on first use and cached for the rest of the process.
+@lru_cache(maxsize=1)
+def get_faker() -> Faker:
+    """Returns the shared Faker instance used for person names, created on first use."""
+    return Faker()
 
 
 # ---- Custom Functions ----
@@ -32,6 +47,8 @@ def get_random_date_group(day_group: int, year: int = 2024) -> list[datetime] |
     :return: List[datetime]: List of consecutive dates in datetime format.
     """
     random.seed(42)
+    # holiday windows of the year, plus the next one for groups that run past December 31st
+    holiday_code = RetailCalendar(year, year + 1).holiday_code
 
     while True:
         month = random.randint(1, 13)
@@ -39,10 +56,8 @@ def get_random_date_group(day_group: int, year: int = 2024) -> list[datetime] |
         start_date = datetime(year, month, day)
 
         # Check the full range for overlap
-        if any(
-                (start_date + timedelta(days=i)) in high_traffic_periods
-                for i in range(day_group)
-        ):
+        start_idx = start_date.timetuple().tm_yday - 1
+        if holiday_code[start_idx:start_idx + day_group].any():
             continue
 
         return [(start_date + timedelta(days=i)) for i in range(day_group)]
@@ -68,12 +83,16 @@ def create_discount_periods(n: int, day_groups: tuple = (1, 3, 7)) -> list[list[
     return final_list
 
 
-discount_group = create_discount_periods(15)
-discount_list = set()
+@lru_cache(maxsize=1)
+def get_discount_dates() -> frozenset[datetime]:
+    """Returns every non-holiday discount date, drawn once by create_discount_periods(15) on first use."""
+    return frozenset(date for grp in create_discount_periods(15) for date in grp)
+
 
-for grp in discount_group:
-    for date in grp:
-        discount_list.add(date)
+@lru_cache(maxsize=None)
+def get_calendar(start_year: int = r_start_year, end_year: int = r_end_year) -> RetailCalendar:
+    """Returns the retail calendar of start_year..end_year, discount flags include get_discount_dates()."""
+    return RetailCalendar(start_year, end_year, discount_dates=get_discount_dates())
 
 
 def apply_markup_and_round(price: float) -> float:
@@ -152,7 +171,7 @@ def generate_unique_skus(f_categories):
 
 
 # Right-skewed sampling for key drivers
-def sample_right_skewed(base_mean, sigma):
+def sample_right_skewed(base_mean, sigma, rng: np.random.Generator | None = None):
     """
     Generates a right-skewed random variable using a log-normal distribution.
 
@@ -164,19 +183,21 @@ def sample_right_skewed(base_mean, sigma):
 
     :param base_mean: Mean, which is log transformed.
     :param sigma: Standard deviation, higher values increase the skew and variability.
+    :param rng: Generator the value is drawn from, np.random.default_rng(42) if not given.
     :return: A right-skewed value greater than or around the base_mean.
     """
-    np.random.seed(42)
+    if rng is None:
+        rng = np.random.default_rng(42)
     mu = math.log(max(base_mean, 0.01))
-    return np.random.lognormal(mean=mu, sigma=sigma)
+    return rng.lognormal(mean=mu, sigma=sigma)
 
 
 # Utility functions
 def get_discount_flag(f_date, discount_dt_lst=()) -> tuple:
     """
-    Checks the `holiday_lookup` dict keys to get the holiday name. If the holiday name is not present in the dict then
-    `Normal Day` is returned with the respective discount flag, discount flag is 1 if the current date is in holiday
-    lookup dict or is present in the `discount_dt_lst`
+    Checks the holiday windows of the retail calendar to get the holiday name. If the date is not in a holiday window
+    then `Normal Day` is returned with the respective discount flag, discount flag is 1 if the current date is in a
+    holiday window or is present in the `discount_dt_lst`
 
     In the orders' generator, there will be another check, as some products are not eligible for a discount, the split
     of basket size will favor more towards the discounted item
@@ -185,7 +206,7 @@ def get_discount_flag(f_date, discount_dt_lst=()) -> tuple:
     :param discount_dt_lst: List of dates other than holidays when discounts will be provided
     :return: A tuple containing a discount flag and the holiday name
     """
-    curr_holiday = holiday_lookup.get(f_date, "Normal Day")
+    curr_holiday = str(get_calendar(f_date.year, f_date.year).holiday_name(f_date))
     if curr_holiday != "Normal Day":
         return 1, curr_holiday
     if discount_dt_lst and f_date in discount_dt_lst:
@@ -303,7 +324,8 @@ def basket_size_calculator(dt: datetime,
                            base_mean=15,
                            holiday_weight=1.5,
                            discount_weight=1.25,
-                           seed=42) -> int:
+                           seed=42,
+                           rng: np.random.Generator | None = None) -> int:
     """
     Calculates the basket size for a customer purchase based on the given context.
     :param dt: Current Date(Datetime)
@@ -316,27 +338,30 @@ def basket_size_calculator(dt: datetime,
     :param base_mean: Base-mean for the basket size, middle point for further calculation.
     :param holiday_weight: Weightage for holidays, more will lead to holidays having higher basket sizes
     :param discount_weight: Same as `holiday_weight`
-    :param seed: np random seed.
+    :param seed: Seed of the generator used when rng is not given.
+    :param rng: Generator the draws come from, np.random.default_rng(seed) if not given. The global np.random
+        stream is never touched.
     :return:
     """
-    np.random.seed(seed)
+    if rng is None:
+        rng = np.random.default_rng(seed)
 
     # Draw base basket size
-    base = np.random.normal(base_mean, 0.5)
+    base = rng.normal(base_mean, 0.5)
 
     # Impact factors with std
-    weekday_impact = np.random.normal(day_of_week_impact_dict[dt.weekday()], 0.10)
-    store_impact = np.random.normal(store_cat_impact_dict[store_category], 0.10)
-    member_impact = np.random.normal(customer_member_impact_dict[membership], 0.10)
+    weekday_impact = rng.normal(day_of_week_impact_dict[dt.weekday()], 0.10)
+    store_impact = rng.normal(store_cat_impact_dict[store_category], 0.10)
+    member_impact = rng.normal(customer_member_impact_dict[membership], 0.10)
 
     # Discount and holiday impacts
     discount_impact = (
-        sample_right_skewed(discount_impact_dict[1], 0.15) if discount_flag else 1.0
+        sample_right_skewed(discount_impact_dict[1], 0.15, rng) if discount_flag else 1.0
     )
 
     is_holiday = curr_holiday != "Normal Day"
     holiday_base = holiday_impact_dict.get(curr_holiday, 1.0)
-    holiday_impact = sample_right_skewed(holiday_base, 0.20) if is_holiday else 1.0
+    holiday_impact = sample_right_skewed(holiday_base, 0.20, rng) if is_holiday else 1.0
 
     # Final calculation
     core_value = base * weekday_impact * store_impact * member_impact
@@ -345,6 +370,94 @@ def basket_size_calculator(dt: datetime,
 
     return max(1, int(core_value + holiday_bonus + discount_bonus))
 
+
+class HeuristicBasketSizes:
+    """Basket size provider using the hand-tuned basket_size_calculator, one call per customer."""
+
+    def __init__(self, seed: int = 42):
+        """
+        :param seed: Seed of the provider's own generator, every basket size of the run is drawn from it in order.
+        """
+        self.rng = np.random.default_rng(seed)
+
+    def basket_sizes(self, dt: datetime, store_category: str, discount_flag: int, curr_holiday: str,
+                     c_ids: list) -> np.ndarray:
+        """
+        Basket size of every customer of a store-day.
+        :param dt: Current Date(Datetime)
+        :param store_category: Store popularity, "High", "Medium" or "Low".
+        :param discount_flag: 1 if the day has a discount else 0.
+        :param curr_holiday: Holiday name, "Normal Day" when there is none.
+        :param c_ids: customer_ids in the order they shop.
+        :return: int array of basket sizes, aligned with c_ids
+        """
+        customer_dict = customer_context().dict
+        return np.array([
+            basket_size_calculator(dt, store_category, discount_flag, curr_holiday, customer_dict[c_id]["membership"],
+                                   rng=self.rng)
+            for c_id in c_ids
+        ], dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def load_basket_model(model_path: Path) -> dict:
+    """Unpickles a cart size model bundle, once per process."""
+    with open(model_path, "rb") as model_file:
+        return pickle.load(model_file)
+
+
+class ModelBasketSizes:
+    """
+    Basket size provider using the cart size regression model (other_scripts/cart_size_training.py).
+    Every customer of a store-day shares the date, store and holiday features, so the feature matrix is one encoded
+    row repeated with the customers' income and family size, predicted in a single call, plus residual noise.
+    """
+
+    def __init__(self, model_path: Path = basket_model_path, seed: int = 42):
+        """
+        :param model_path: Model bundle, loaded once per process.
+        :param seed: Seed of the residual noise.
+        """
+        self.bundle = load_basket_model(Path(model_path))
+        self.model = self.bundle["model"]
+        self.residual_std = self.bundle["residual_std"]
+        self.column_index = {column: idx for idx, column in enumerate(self.bundle["feature_columns"])}
+        self.rng = np.random.default_rng(seed)
+
+        # an unknown holiday would silently encode as a normal day
+        missing = [name for name in holiday_names if f"holiday_{name}" not in self.column_index]
+        if missing:
+            raise ValueError(f"{model_path} has no holiday columns for {missing}, retrain it with "
+                             f"other_scripts/cart_size_training.py")
+
+    def basket_sizes(self, dt: datetime, store_category: str, discount_flag: int, curr_holiday: str,
+                     c_ids: list) -> np.ndarray:
+        """Same interface as HeuristicBasketSizes.basket_sizes."""
+        n = len(c_ids)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        customers = customer_context()
+        codes = np.array([customers.codes[c_id] for c_id in c_ids])
+        scale = self.bundle["numeric_scale"]
+
+        # shared one hot columns, categories the model has not seen stay 0
+        day_row = np.zeros(len(self.column_index), dtype=np.float32)
+        for feature, value in (("holiday", curr_holiday), ("store_location", store_category),
+                               ("month", dt.month), ("weekday", dt.weekday())):
+            idx = self.column_index.get(f"{feature}_{value}")
+            if idx is not None:
+                day_row[idx] = 1
+
+        features = np.tile(day_row, (n, 1))
+        features[:, self.column_index["family_size"]] = customers.family_size[codes] / scale["family_size"]
+        features[:, self.column_index["income"]] = customers.income[codes] / scale["income"]
+        features[:, self.column_index["discount_flag"]] = discount_flag / scale["discount_flag"]
+
+        prediction = self.model.predict(features) + self.rng.normal(0, self.residual_std, n)
+        return np.maximum(1, np.round(prediction)).astype(np.int64)
+
+
 def generate_customers9_df(n: int) -> pd.DataFrame:
     """Generates base customer info including address, name, age, phone, email, gender."""
     region_neighborhoods = []
@@ -362,6 +475,7 @@ def generate_customers9_df(n: int) -> pd.DataFrame:
     addresses = generate_unique_addresses(n, region_neighborhoods, weights, chicago_streets)
     phone_numbers = generate_unique_phone_numbers(size=n)
     gender = np.random.choice(["Male", "Female"], size=n, p=[0.4854, 0.5146])
+    fake = get_faker()
     names = [fake.name_male() if g == "Male" else fake.name_female() for g in gender]
     emails = generate_unique_emails(size=n, names=names, phone_num=phone_numbers)
 
@@ -405,6 +519,12 @@ def return_complete_df(recurring_count: int, non_recurring_count: int, one_time_
     base_df["recurring"] = np.array(recurring_flags)[shuffle_indices]
     base_df["membership"] = membership_flags[shuffle_indices]
 
+    # income skewed towards low income and family size, same distributions as the cart size training data
+    base_df["income"] = np.round(
+        np.clip(np.random.lognormal(mean=4.2, sigma=0.35, size=total) * 1000, 35000, 150000)
+    ).astype(int)
+    base_df["family_size"] = np.random.choice([1, 2, 3, 4, 5, 6], size=total, p=[0.15, 0.25, 0.24, 0.2, 0.1, 0.06])
+
     # Add unique customer ID
     base_df["customer_id"] = [f"STRMRT_CSTMR_{i}" for i in range(1, total + 1)]
 
@@ -413,119 +533,154 @@ def return_complete_df(recurring_count: int, non_recurring_count: int, one_time_
     return base_df[cols]
 
 
-stores_df = generate_stores_df()
-# Generate ages and probabilities
-e_ages, e_probs = generate_age_grp_and_prob("emp")
+# Create a DataFrame using list comprehension
+@cached_table()
+def generate_stores_df():
+    """
+    Attributes: store_id, region, neighborhood, pop_density, store_size, parking_space, category
+    :return:
+    """
+    f_stores_df = pd.DataFrame(
+        [
+            [region, *neighborhood_info,]  # Unpack neighborhood details into separate columns
+            for s_id, (region, neighborhoods) in enumerate(chicago_regions.items(), start=1)  # Assign unique store_id
+            for neighborhood_info in neighborhoods  # Iterate through each neighborhood in a region
+        ],
+        columns=[
+            "region",
+            "neighbourhood",
+            "pop_density",
+            "store_size",
+            "parking_space",
+            "category",
+            "zip_codes"
+        ],
+    )
+    # store id
+    f_stores_df["store_id"] = [f"STRMRT_STR_{i + 1:02d}" for i in range(len(f_stores_df))]
+
+    # moving store_id to the start
+    cols = f_stores_df.columns.tolist()
+    cols.insert(0, cols.pop(cols.index("store_id")))
+    f_stores_df = f_stores_df[cols]
+
+    return f_stores_df
 
 
+@cached_table(seed=42)
 def generate_employee_df() -> pd.DataFrame:
     """
     Generates a dataframe of employee information using the store_roles dict in this function
     attributes:
     emp_id, store_id, f_name, l_name, age, gender, ph_no, email, address, department, role, hourly_rate, customer_rating
+
+    The roster is expanded as arrays (one row per (store, role) repeated by headcount) and every attribute is drawn
+    with a single call per column.
     """
     np.random.seed(42)
 
+    stores_df = generate_stores_df()
+    e_ages, e_probs = generate_age_grp_and_prob("emp")
+
     area_codes = [312, 872]
     area_code_probs = [0.8, 0.2]
     email_domains = ["gmail.com", "yahoo.com", "hotmail.com"]
     email_probs = [0.7, 0.2, 0.1]
 
-    emp_list = []
-    # loop through the stores
-    for idx, store_row in stores_df.iterrows():
-        store_id = store_row["store_id"]
-        str_num = int(store_id.split("_")[-1])
-        store_size = store_row["store_size"]
-        store_region = store_row["region"]
-
-        neighbourhood_list = np.array(chicago_regions[store_region])
-        neighbourhoods = neighbourhood_list[:, 0]
-        population = neighbourhood_list[:, 1].astype(int)
-        population_weights = population / population.sum()
-
-        emp_id = 1
-
-        for dept, roles_dict in store_roles_and_hourly_rates.items():
-            roles_list = roles_dict["roles"]
-            emp_count = roles_dict["count"]
-
-            emp_count = (
-                max(1, emp_count - 1)
-                if store_size == "Medium"
-                else max(1, emp_count - 2)
-                if store_size == "Small"
-                else emp_count
-            )
+    # flatten the dept -> roles dict into one entry per role
+    role_dept, role_name, role_rate, role_count = [], [], [], []
+    for dept, roles_dict in store_roles_and_hourly_rates.items():
+        for i, role in enumerate(roles_dict["roles"]):
+            role_dept.append(dept)
+            role_name.append(role)
+            role_rate.append(roles_dict["hourly_rate"][i])
+            role_count.append(roles_dict["count"])
+
+    role_dept = np.array(role_dept)
+    role_name = np.array(role_name)
+    role_rate = np.array(role_rate)
+    role_count = np.array(role_count)
+
+    # headcount per (store, role), smaller stores have fewer employees per role
+    size_reduction = stores_df["store_size"].map({"Large": 0, "Medium": 1, "Small": 2}).to_numpy()
+    headcount = np.maximum(1, role_count[None, :] - size_reduction[:, None])
+
+    # one row per employee
+    n_stores, n_roles = headcount.shape
+    store_idx = np.repeat(np.repeat(np.arange(n_stores), n_roles), headcount.ravel())
+    role_idx = np.repeat(np.tile(np.arange(n_roles), n_stores), headcount.ravel())
+    n = len(store_idx)
+
+    # employee number restarts at 1 for every store
+    store_start = np.concatenate(([0], np.cumsum(headcount.sum(axis=1))[:-1]))
+    emp_num = np.arange(n) - store_start[store_idx] + 1
+    str_num = stores_df["store_id"].str.split("_").str[-1].astype(int).to_numpy()
+
+    # gender, name, phone and email
+    male_prob = np.array([gender_roles.get(role, [0.50, 0.50])[0] for role in role_name])
+    gender = np.where(np.random.random(n) < male_prob[role_idx], "Male", "Female")
+    fake = get_faker()
+    names = pd.Series([fake.name_male() if g == "Male" else fake.name_female() for g in gender])
+
+    ph_number = (
+        "+1(" + pd.Series(np.random.choice(area_codes, size=n, p=area_code_probs)).astype(str) + ")-"
+        + pd.Series(np.random.randint(100, 999, size=n)).astype(str) + "-"
+        + pd.Series(np.random.randint(1000, 9999, size=n)).astype(str)
+    )
 
-            hourly_rate = roles_dict["hourly_rate"]
+    email = (
+        names.str.lower().str.replace(" ", "", regex=False)
+        + "@"
+        + np.random.choice(email_domains, size=n, p=email_probs)
+    )
 
-            for i, role in enumerate(roles_list):
-                for _ in range(emp_count):
-                    curr_emp_id = f"STRMRT_EMP_{str_num}_{emp_id}"
-                    curr_role = role
-                    curr_salary = hourly_rate[i]
-                    curr_store = store_id
-                    gender_probability = gender_roles.get(role, [0.50, 0.50])
-                    gender = np.random.choice(["Male", "Female"], p=gender_probability)
+    # address, neighbourhood weighted by population within the store's region
+    catalog = load_catalog_artifact()
+    store_region = stores_df["region"].to_numpy()[store_idx]
+    emp_neighbourhood = np.empty(n, dtype=object)
+    emp_street = np.empty(n, dtype=object)
+    for region_code, region in enumerate(catalog.regions):
+        region_mask = store_region == region
+        n_region = region_mask.sum()
+        if not n_region:
+            continue
 
-                    name = fake.name_male() if gender == "Male" else fake.name_female()
+        region_nb = np.flatnonzero(catalog.nb_region == region_code)
+        population = catalog.nb_population[region_nb]
+        nb_idx = region_nb[np.random.choice(len(region_nb), size=n_region, p=population / population.sum())]
 
-                    ph_number = (
-                        f"+1({np.random.choice(area_codes, p=area_code_probs)})-"
-                        + f"{np.random.randint(100, 999)}-"
-                        + f"{np.random.randint(1000, 9999)}"
-                    )
+        # uniform street within the chosen neighbourhood
+        street_count = catalog.nb_street_count[nb_idx]
+        street_idx = catalog.nb_street_offset[nb_idx] + (np.random.random(n_region) * street_count).astype(int)
 
-                    email = (
-                        name.lower().replace(" ", "")
-                        + "@"
-                        + np.random.choice(email_domains, p=email_probs)
-                    )
+        emp_neighbourhood[region_mask] = catalog.neighbourhoods[nb_idx]
+        emp_street[region_mask] = catalog.streets[street_idx]
 
-                    building_number = fake.building_number()
-                    emp_neighbourhood = np.random.choice(
-                        neighbourhoods, p=population_weights
-                    )
-                    emp_street = np.random.choice(
-                        chicago_streets.get((store_region, emp_neighbourhood))
-                    )
-                    full_address = f"{building_number} {emp_street}, {emp_neighbourhood}, {store_region} Chicago"
-
-                    age = np.random.choice(e_ages, p=e_probs)
-
-                    curr_emp_row = [
-                        curr_emp_id,
-                        curr_store,
-                        name,
-                        age,
-                        gender,
-                        ph_number,
-                        email,
-                        full_address,
-                        dept,
-                        curr_role,
-                        curr_salary,
-                    ]
-
-                    emp_list.append(curr_emp_row)
-                    emp_id += 1
+    # 3 to 5 digit building numbers
+    digits = np.random.randint(3, 6, size=n)
+    building_number = np.random.randint(10 ** (digits - 1), 10 ** digits)
+
+    full_address = (
+        pd.Series(building_number).astype(str) + " "
+        + pd.Series(emp_street) + ", "
+        + pd.Series(emp_neighbourhood) + ", "
+        + pd.Series(store_region) + " Chicago"
+    )
 
     emp_df = pd.DataFrame(
-        emp_list,
-        columns=[
-            "emp_id",
-            "store_id",
-            "name",
-            "age",
-            "gender",
-            "ph_num",
-            "email",
-            "address",
-            "department",
-            "role",
-            "hourly_rate",
-        ],
+        {
+            "emp_id": "STRMRT_EMP_" + pd.Series(str_num[store_idx]).astype(str) + "_" + pd.Series(emp_num).astype(str),
+            "store_id": stores_df["store_id"].to_numpy()[store_idx],
+            "name": names,
+            "age": np.random.choice(e_ages, size=n, p=e_probs),
+            "gender": gender,
+            "ph_num": ph_number,
+            "email": email,
+            "address": full_address,
+            "department": role_dept[role_idx],
+            "role": role_name[role_idx],
+            "hourly_rate": role_rate[role_idx],
+        }
     )
 
     return emp_df
@@ -538,123 +693,95 @@ def return_shelf_life(f_item):
     :param f_item: chosen item
     :return: shelf life in days
     """
-
-    shelf_life_value = shelf_life.get(f_item)
-    if shelf_life_value == "Indefinite":
-        return 1000
-
-    n, period = shelf_life_value.split()
-
-    period_multipliers = {"days": 1, "weeks": 7, "months": 30, "years": 365}
-    period_multiplier = period_multipliers.get(
-        period, 1
-    )  # Default to 1 if unit is unknown
-
-    return int(n) * period_multiplier
+    return parse_shelf_life(shelf_life.get(f_item))
 
 
-def generate_balanced_ratings(f_base_rating, f_num_variants):
-    if f_num_variants == 1:
-        return [round(f_base_rating, 2)]  # If only one variant, return the base rating
+@lru_cache(maxsize=1)
+def flatten_product_catalog() -> pd.DataFrame:
+    """
+    One row per (product, variant) of category_and_products, in catalog order, read from the precompiled catalog
+    artifact. Built once per process, treat the returned frame as read only.
 
-    ratings = [
-        round(
-            np.random.uniform(
-                max(1.0, f_base_rating - 0.3), min(5.0, f_base_rating + 0.3)
-            ),
-            2,
-        )
-        for _ in range(f_num_variants - 1)
-    ]
-    last_rating = round(
-        (f_base_rating * f_num_variants) - sum(ratings), 2
-    )  # Adjust last value to keep mean
-    ratings.append(
-        max(0.0, min(5.0, last_rating))
-    )  # Ensure the rating is between 0 and 5
-    return ratings
+    Columns: category, subcategory, sub_idx, prod_pos, n_products, product_name, variant, variant_pos, n_variants,
+    cost_price, base_rating, shelf_life
+    """
+    catalog = load_catalog_artifact()
+    sub_idx = np.asarray(catalog.product_sub)
+
+    return pd.DataFrame({
+        "category": catalog.categories[catalog.sub_category[sub_idx]].astype(object),
+        "subcategory": catalog.subcategories[sub_idx].astype(object),
+        "sub_idx": sub_idx,
+        "prod_pos": np.asarray(catalog.product_pos),
+        "n_products": catalog.sub_n_products[sub_idx],
+        "product_name": catalog.product_names[catalog.product_name].astype(object),
+        "variant": catalog.variants[catalog.product_variant].astype(object),
+        "variant_pos": np.asarray(catalog.product_variant_pos),
+        "n_variants": np.asarray(catalog.product_n_variants),
+        "cost_price": np.asarray(catalog.product_cost),
+        "base_rating": np.asarray(catalog.product_rating),
+        "shelf_life": catalog.sub_shelf_life[sub_idx].astype(np.int64),
+    })
 
 
+@cached_table(seed=42)
 def generate_product_df(stats=False) -> pd.DataFrame:
     """
     Generates a product lookup table.
+    Every store gets the flattened catalog (cross join), minus the last few products of each subcategory, the
+    smaller the store the more products are removed.
     :param stats: If true, prints number of products per store.
     :return: Products DataFrame
     """
     np.random.seed(42)
     f_stores_df = generate_stores_df()
-    products = []
-    for store_num, (_, store) in enumerate(f_stores_df.iterrows(), start=1):
-        # Get the store details
-        store_id = store["store_id"]
-        store_size = store["store_size"]
-
-        # get the product categories
-        f_categories = category_and_products.keys()
-
-        product_id = 1
-        # loop through the categories
-        for category in f_categories:
-            # get the subcategory for the current product category
-            sub_category_list = category_and_products[category].keys()
-
-            # get the product and its shelf life
-            for item in sub_category_list:
-                product_list = category_and_products[category][item]
-                item_shelf_life = return_shelf_life(item)
-
-                # return [['N/A', 1]] to loop through a nested list
-                variant_list = variant_and_multiplier.get(item, [["N/A", 1]])
-
-                # get the number of products in the current category and remove as per store size
-                n_products = len(product_list)
-
-                # removing products based on store size (smaller the store size more product removal)
-                n_remove_products = (
-                    random.randint(1, 2)
-                    if store_size == "Large"
-                    else random.randint(3, 4)
-                    if store_size == "Medium"
-                    else random.randint(4, 5)
-                )
-
-                n_keep = max(0, n_products - n_remove_products)
-
-                for idx in range(n_keep):
-                    (product,
-                     prod_cost_price,
-                     prod_selling_price,
-                     base_rating) = product_list[idx]
-
-                    num_variants = len(variant_list)
-                    variant_ratings = generate_balanced_ratings(
-                        base_rating, num_variants
-                    )
-
-                    for (variant, variant_rating) in zip(variant_list, variant_ratings):
-                        variant_name, price_multiplier = variant
-
-                        cost_price = round(prod_cost_price * price_multiplier, 2)
-                        curr_product_id = f"STRMRT_PRD_{store_num:02d}_{product_id:04d}"
-
-                        product_row = [
-                            curr_product_id,
-                            store_id,
-                            category,
-                            item,
-                            product,
-                            variant_name,
-                            cost_price,
-                            item_shelf_life,
-                            round(variant_rating, 2),
-                        ]
-
-                        products.append(product_row)
-                        product_id += 1
-
-    products_df = pd.DataFrame(
-        products,
-        columns=[
+    catalog = flatten_product_catalog()
+
+    n_stores = len(f_stores_df)
+    n_catalog = len(catalog)
+    n_sub_categories = catalog["sub_idx"].max() + 1
+
+    # removing products based on store size (smaller the store size more product removal)
+    min_remove = f_stores_df["store_size"].map({"Large": 1, "Medium": 3, "Small": 4}).to_numpy()
+    n_remove = min_remove[:, None] + np.random.randint(0, 2, size=(n_stores, n_sub_categories))
+    n_products = catalog.groupby("sub_idx")["n_products"].first().to_numpy()
+    n_keep = np.maximum(0, n_products[None, :] - n_remove)
+
+    # store x catalog cross join, keeping the first n_keep products of every subcategory
+    store_idx = np.repeat(np.arange(n_stores), n_catalog)
+    cat_idx = np.tile(np.arange(n_catalog), n_stores)
+    keep = catalog["prod_pos"].to_numpy()[cat_idx] < n_keep[store_idx, catalog["sub_idx"].to_numpy()[cat_idx]]
+    store_idx = store_idx[keep]
+    products_df = catalog.iloc[cat_idx[keep]].reset_index(drop=True)
+
+    # variant ratings average out to the product's base rating
+    base_rating = products_df["base_rating"].to_numpy()
+    n_variants = products_df["n_variants"].to_numpy()
+    variant_pos = products_df["variant_pos"].to_numpy()
+    is_last = variant_pos == n_variants - 1
+
+    ratings = np.round(
+        np.random.uniform(np.maximum(1.0, base_rating - 0.3), np.minimum(5.0, base_rating + 0.3)), 2
+    )
+    first_variant = np.flatnonzero(variant_pos == 0)
+    others_sum = np.add.reduceat(np.where(is_last, 0.0, ratings), first_variant)
+    last_rating = np.clip(np.round(base_rating[is_last] * n_variants[is_last] - others_sum, 2), 0.0, 5.0)
+    ratings[is_last] = np.where(n_variants[is_last] == 1, np.round(base_rating[is_last], 2), last_rating)
+
+    # product numbers restart at 1 for every store
+    store_start = np.searchsorted(store_idx, np.arange(n_stores))
+    product_num = np.arange(len(store_idx)) - store_start[store_idx] + 1
+
+    # id parts are formatted once and joined with object array addition
+    store_prefix = np.array([f"STRMRT_PRD_{i:02d}_" for i in range(1, n_stores + 1)], dtype=object)
+    product_suffix = np.array([f"{i:04d}" for i in range(product_num.max() + 1)], dtype=object)
+    products_df["product_id"] = store_prefix[store_idx] + product_suffix[product_num]
+    products_df["store_id"] = f_stores_df["store_id"].to_numpy()[store_idx]
+    products_df["rating"] = np.round(ratings, 2)
+
+    products_df = products_df.loc[
+        :,
+        [
             "product_id",
             "store_id",
             "category",
@@ -665,7 +792,7 @@ def generate_product_df(stats=False) -> pd.DataFrame:
             "shelf_life",
             "rating",
         ],
-    )
+    ]
 
     if stats:
         num_of_stores = products_df["store_id"].nunique()
@@ -676,49 +803,41 @@ def generate_product_df(stats=False) -> pd.DataFrame:
     return products_df
 
 
-def product_markup_and_discount():
+def product_markup_and_discount(products_df: pd.DataFrame | None = None, seed: int | None = 42,
+                                dtype=np.float32) -> pd.DataFrame:
     """
     Generates a table for markup values, normal day and holiday day.
-    :return: DataFrame with discount percentages
+    :param products_df: Products table with at least product_id and subcategory, the published StarMart_Products.csv
+        if not given.
+    :param seed: Seed for the discount draws.
+    :param dtype: dtype of the returned columns. Everything is computed and rounded in float64 first, pass np.float64
+        when the values feed price math that is rounded to cents.
+    :return: DataFrame with product_id, markup, normal_day_discount and holiday_discount
     """
     # Get base product info
-    prod_price_df = pd.read_csv(
-        r"C:\Users\shrav\Data_Analysis_Projects\Big Projects\Project StarMart\Datasets\StarMart_Products.csv").loc[:,
-                    ["product_id", "subcategory"]]
-
-    # Assign markup based on subcategory mapping
-    prod_price_df['markup'] = prod_price_df.apply(
-        lambda row: multiplication_factor * product_markup.get(row['subcategory'], 1),
-        axis=1
-    ).round(2)
-
-    # Convert flags to integers (1 or 0)
-    prod_price_df["discount_flag_normal_day"] = prod_price_df["subcategory"].isin(normal_day_discount_items).astype(int)
-    prod_price_df["discount_flag_holiday"] = prod_price_df["subcategory"].isin(holiday_discount_items).astype(int)
-
-    # Define discount logic
-    def apply_discount(row, day):
-        discount_percentages = (
-            np.arange(0.05, 0.20, 0.05) if day == "normal day"
-            else np.arange(0.2, 0.50, 0.1)
-        )
-        flag = row["discount_flag_normal_day"] if day == "normal day" else row["discount_flag_holiday"]
-
-        if flag == 1:
-            return np.random.choice(discount_percentages)
-        else:
-            return 0
+    if products_df is None:
+        products_df = get_dataset(base_dir / "StarMart_Products.csv", ["product_id", "subcategory"])
 
-    # Apply discount logic
-    prod_price_df["normal_day_discount"] = prod_price_df.apply(
-        apply_discount, axis=1, args=("normal day",)
-    ).round(2)
-
-    prod_price_df["holiday_discount"] = prod_price_df.apply(
-        apply_discount, axis=1, args=("holiday",)
-    ).round(2)
+    rng = np.random.default_rng(seed)
+    subcategory = products_df["subcategory"]
+    n = len(products_df)
 
-    return prod_price_df.drop(columns=['subcategory', 'discount_flag_normal_day', 'discount_flag_holiday'])
+    # Assign markup based on subcategory mapping
+    markup = (multiplication_factor * subcategory.map(product_markup).fillna(1)).round(2)
+
+    # Discounts are only drawn for the products that are eligible for them
+    def draw_discounts(eligible_items, discount_percentages):
+        mask = subcategory.isin(eligible_items).to_numpy()
+        discounts = np.zeros(n)
+        discounts[mask] = rng.choice(discount_percentages, size=mask.sum())
+        return discounts.round(2).astype(dtype)
+
+    return pd.DataFrame({
+        "product_id": products_df["product_id"].to_numpy(),
+        "markup": markup.to_numpy(dtype=dtype),
+        "normal_day_discount": draw_discounts(normal_day_discount_items, np.arange(0.05, 0.20, 0.05)),
+        "holiday_discount": draw_discounts(holiday_discount_items, np.arange(0.2, 0.50, 0.1)),
+    })
 
 
 # Define category filtering logic
@@ -775,172 +894,388 @@ def predict_categories(n, curr_holiday, curr_season):
 
     return selected
 
-def generate_stocks_table():
-    orders = pd.read_csv(base_dir / "StarMart_Orders.csv").loc[:, ["order_datetime", "quantity", "product_id"]]
-    products = pd.read_csv(base_dir / "StarMart_Products.csv").loc[:, ["product_id", "shelf_life"]]
-
-    # Shelf life groups
-    products_grp_3 = products[products['shelf_life'] < 6]
-    products_grp_6_12 = products[(products['shelf_life'] >= 6) & (products['shelf_life'] <= 12)]
-    products_grp_15_30 = products[(products['shelf_life'] > 12) & (products['shelf_life'] <= 30)]
-    products_grp_30_90 = products[(products['shelf_life'] > 30) & (products['shelf_life'] <= 90)]
-    products_grp_90 = products[products['shelf_life'] > 90]
-
-    # Merge orders with products by group
-    orders_3 = orders.merge(products_grp_3, on=['product_id'])
-    orders_6_12 = orders.merge(products_grp_6_12, on=['product_id'])
-    orders_15_30 = orders.merge(products_grp_15_30, on=['product_id'])
-    orders_30_90 = orders.merge(products_grp_30_90, on=['product_id'])
-    orders_90 = orders.merge(products_grp_90, on=['product_id'])
-
-    # Function to compute grouped sales
-    def products_sold_grp(days, merged_df):
-        merged_df['order_datetime'] = pd.to_datetime(merged_df['order_datetime'])
-        merged_df = merged_df.sort_values('order_datetime')
-        min_date = merged_df['order_datetime'].min()
-
-        merged_df['period_start'] = (
-                ((merged_df['order_datetime'] - min_date).dt.days // days) * days
-        ).apply(lambda x: min_date + pd.Timedelta(days=x))
-
-        grouped = (
-            merged_df.groupby(['product_id', 'period_start'], as_index=False)
-            .agg({'quantity': 'sum', 'shelf_life': 'min'})
-            .rename(columns={'quantity': 'total_sold'})
-            .sort_values(['product_id', 'period_start'])
-        )
-        return grouped
-
-    # Apply grouping per shelf-life bucket
-    sales_3 = products_sold_grp(3, orders_3)
-    sales_6_12 = products_sold_grp(6, orders_6_12)
-    sales_15_30 = products_sold_grp(15, orders_15_30)
-    sales_30_90 = products_sold_grp(30, orders_30_90)
-    sales_90 = products_sold_grp(90, orders_90)
-
-    # Apply adjustments
-    def add_extra(df, p):
-        df['total_sold'] *= (1 + p / 100)
-        df['total_sold'] = np.ceil(df['total_sold'])
-        df['period_start'] = df['period_start'].dt.date
-        return df
-
-    # 15, 20, 22, 25, 30
-    sales_3 = add_extra(sales_3, 10)
-    sales_6_12 = add_extra(sales_6_12, 8)
-    sales_15_30 = add_extra(sales_15_30, 10)
-    sales_30_90 = add_extra(sales_30_90, 12)
-    sales_90 = add_extra(sales_90, 15)
-
-    # Combine all sales
-    final_df = pd.concat(
-        [sales_3, sales_6_12, sales_15_30, sales_30_90, sales_90],
-        ignore_index=True
-    )
+# Restock buckets by shelf life (whole days): <6, 6-12, 13-30, 31-90, >90
+restock_bucket_bins = [-np.inf, 5, 12, 30, 90, np.inf]
+restock_period_days = np.array([3, 6, 15, 30, 90])  # restock period of each bucket
+restock_safety_pct = np.array([10, 8, 10, 12, 15])  # safety stock on top of the forecast
+
 
-    final_df = final_df.rename(columns={
-        'period_start': 'restock_date',
-        'total_sold': 'prod_lookup_qty'
-    }).drop(columns='shelf_life')
+def daily_product_sales(orders: pd.DataFrame, product_index: pd.Index) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sums the quantity sold per (product, day) for one frame of orders.
+    Orders of products missing from product_index are dropped, like an inner merge.
 
-    final_df['prod_lookup_qty'] = final_df['prod_lookup_qty'].astype(int)
+    :param orders: Orders with order_datetime, quantity and product_id.
+    :param product_index: Index of product_ids, the position of a product is its code.
+    :return: Tuple of sorted keys (day ordinal * number of products + product code) and their summed quantities
+    """
+    codes = product_index.get_indexer(orders["product_id"])
+    known = codes >= 0
 
-    restock_dates = final_df[['restock_date']].drop_duplicates().sort_values(by='restock_date')
+    order_dt = pd.to_datetime(orders["order_datetime"], format="ISO8601")
+    days = order_dt.to_numpy().astype("datetime64[D]").view(np.int64)
 
-    return final_df, restock_dates
+    keys = days[known] * len(product_index) + codes[known]
+    quantity = orders["quantity"].to_numpy()[known]
+    return merge_daily_sales([(keys, quantity)])
 
 
-# -----------Vendors---------------
-fake = Faker()
+def merge_daily_sales(parts: list[tuple[np.ndarray, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+    """Merges (keys, quantities) partial sums into one sorted, de-duplicated pair of arrays."""
+    keys = np.concatenate([part_keys for part_keys, _ in parts])
+    quantity = np.concatenate([part_qty for _, part_qty in parts])
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=quantity, minlength=len(keys)).astype(np.int64)
 
 
-def fake_ein():
-    np.random.seed(42)
-    return f"{np.random.randint(10, 99)}-{np.random.randint(1000000, 9999999)}"
+def stream_daily_product_sales(orders_file_path, product_index: pd.Index,
+                               chunk_size: int = 1_000_000) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Out-of-core version of daily_product_sales over an orders CSV.
+    The file is read in chunks of only order_datetime, quantity and product_id. Partial sums are kept pending and
+    merged once they outgrow the running total, so peak memory depends on the number of (product, day) pairs and the
+    chunk size, not on the number of orders.
+
+    :param orders_file_path: Orders CSV.
+    :param product_index: Index of product_ids, the position of a product is its code.
+    :param chunk_size: Order lines per chunk.
+    :return: Same as daily_product_sales
+    """
+    total = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    pending = []
+    pending_len = 0
+
+    reader = read_output_csv(
+        orders_file_path,
+        usecols=["order_datetime", "quantity", "product_id"],
+        dtype={"quantity": np.int32},
+        chunksize=chunk_size,
+    )
+    for chunk in reader:
+        part = daily_product_sales(chunk, product_index)
+        pending.append(part)
+        pending_len += len(part[0])
 
+        if pending_len >= max(len(total[0]), chunk_size):
+            total = merge_daily_sales([total, *pending])
+            pending = []
+            pending_len = 0
 
-def generate_fake_vendors():
-    np.random.seed(42)
-    products_df = pd.read_csv(base_dir / "StarMart_Products.csv").loc[:, ["product_id", "subcategory", "cost_price"]]
-    sub_categories = products_df["subcategory"].unique()
+    return merge_daily_sales([total, *pending])
 
-    cat_sku = generate_unique_skus(sub_categories)
-    vendors = []
-    used_names = set()
-    v_id = 1
 
-    for cat in sub_categories:
-        num_vendors = 1
+def generate_stocks_table(orders: pd.DataFrame | None = None,
+                          products: pd.DataFrame | None = None,
+                          chunk_size: int = 1_000_000) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Builds the restock lookup, the quantity of each product sold in every restock period plus some extra stock.
+    Products are bucketed by shelf life, each bucket has its own period length and its periods start at midnight of
+    the bucket's first order day.
+
+    :param orders: Orders with order_datetime, quantity and product_id. If not given StarMart_Orders.csv is streamed
+        in chunks instead of being loaded.
+    :param products: Products with product_id and shelf_life, the published StarMart_Products.csv if not given.
+    :param chunk_size: Order lines per chunk when streaming the orders file.
+    :return: Tuple of (product_id, restock_date, prod_lookup_qty) lookup and the sorted unique restock dates
+    """
+    if products is None:
+        products = get_dataset(base_dir / "StarMart_Products.csv", ["product_id", "shelf_life"])
 
-        for i in range(num_vendors):
-            vendor_id = f"STRMRT_VNDR_{cat_sku[cat]}_{v_id}"
+    product_index = pd.Index(products["product_id"])
+    if orders is None:
+        keys, quantity = stream_daily_product_sales(base_dir / "StarMart_Orders.csv", product_index, chunk_size)
+    else:
+        keys, quantity = daily_product_sales(orders, product_index)
+
+    codes = keys % len(product_index)
+    days = keys // len(product_index)
 
-            # Ensure unique vendor names
-            while True:
-                vendor_name = fake.company()
-                if vendor_name not in used_names:
-                    used_names.add(vendor_name)
-                    break
+    # periods of every bucket start at the bucket's first order day
+    bucket = pd.cut(products["shelf_life"], bins=restock_bucket_bins, labels=False).to_numpy()
+    bucket_start = np.full(len(restock_period_days), days.min() if len(days) else 0)
+    sold_buckets = np.unique(bucket[codes])
+    bucket_start[sold_buckets] = np.iinfo(np.int64).max
+    np.minimum.at(bucket_start, bucket[codes], days)
 
-            delivery_fee = random.choice([20, 25, 35, 30])
+    # products x periods demand matrix
+    period_days = restock_period_days[bucket]
+    anchor_day = bucket_start[bucket]
+    end_day = days.max() + 1 if len(days) else 0
+    n_periods = max(1, -(-(end_day - bucket_start.min()) // restock_period_days.min()))
 
-            vendors.append([
-                vendor_id,
-                vendor_name,
-                cat,
-                delivery_fee
-            ])
+    demand = np.zeros((len(product_index), n_periods), dtype=np.int64)
+    np.add.at(demand, (codes, (days - anchor_day[codes]) // period_days[codes]), quantity)
 
-            v_id += 1
+    return restock_lookup_table(product_index.to_numpy(), bucket, anchor_day.astype("datetime64[D]"), demand,
+                                np.datetime64(int(end_day), "D"))
 
-    vendors_df = pd.DataFrame(vendors, columns=["vendor_id", "vendor_name", "subcategory", "delivery_fee"])
 
-    vendors_df = (
-        vendors_df
-        .merge(products_df, how="inner", on="subcategory")
-        .rename(columns={"cost_price": "per_item_cost"})
+def restock_lookup_table(product_ids: np.ndarray,
+                         bucket: np.ndarray,
+                         anchor_day: np.ndarray,
+                         demand: np.ndarray,
+                         end_day: np.datetime64,
+                         vendor_prices: "VendorPrices | None" = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Turns the products x periods sales matrix into the restock lookup and restock dates tables.
+    Restock quantities are the trailing sales level of every period times seasonal factors fitted on the whole
+    history (see forecast_restock_quantities), plus the bucket's safety stock, including the first period after the
+    sales end.
+
+    :param product_ids: product_id of every row of demand.
+    :param bucket: Shelf-life bucket of every product (index into restock_period_days).
+    :param anchor_day: Start of period 0 of every product (datetime64[D]).
+    :param demand: products x periods quantities sold.
+    :param end_day: End of the sales (exclusive, datetime64[D]).
+    :param vendor_prices: Vendor price table, when given every restock is ordered from its cheapest vendor
+        (VendorPrices.cheapest_vendor) and the lookup gets a vendor_unique_id column.
+    :return: Tuple of (product_id, restock_date, prod_lookup_qty[, vendor_unique_id]) lookup and the sorted unique
+        restock dates
+    """
+    restock_qty, period_start = forecast_restock_quantities(
+        demand, restock_period_days[bucket], anchor_day, end_day, restock_safety_pct[bucket]
     )
 
-    vendors_df['per_item_cost'] = (
-            vendors_df['per_item_cost'] - np.random.uniform(0.1, 0.3, size=len(vendors_df))
-    ).round(2)
+    codes, periods = np.nonzero(restock_qty)
+    final_df = pd.DataFrame({
+        "bucket": bucket[codes],
+        "product_id": product_ids[codes],
+        "restock_date": period_start[codes, periods],
+        "prod_lookup_qty": restock_qty[codes, periods],
+    })
+    columns = ["product_id", "restock_date", "prod_lookup_qty"]
+    if vendor_prices is not None:
+        vendor_codes = vendor_prices.product_index.get_indexer(final_df["product_id"])
+        if (vendor_codes < 0).any():
+            raise ValueError("Restocked products without a vendor in the vendor price table")
+        final_df["vendor_unique_id"] = vendor_prices.cheapest_vendor(vendor_codes, final_df["prod_lookup_qty"])[0]
+        columns.append("vendor_unique_id")
+
+    final_df = final_df.sort_values(["bucket", "product_id", "restock_date"], kind="stable").reset_index(drop=True)
+    final_df["restock_date"] = final_df["restock_date"].dt.date
+    final_df = final_df.loc[:, columns]
 
-    vendors_df['vendor_unique_id'] = [f"STRMRT_VNDR_{i}" for i in range(1, len(vendors_df) + 1)]
+    restock_dates = final_df[['restock_date']].drop_duplicates().sort_values(by='restock_date')
 
-    return vendors_df.drop(columns='subcategory')
+    return final_df, restock_dates
 
 
-# Create a DataFrame using list comprehension
-def generate_stores_df():
+class RestockAccumulator:
     """
-    Attributes: store_id, region, neighborhood, pop_density, store_size, parking_space, category
-    :return:
+    Running quantity sums per product and restock period, filled by generate_orders_file while it writes the orders,
+    so the restock lookup is ready the moment generation finishes instead of needing a second scan of the orders.
+    Periods are anchored at midnight of start_date.
     """
-    f_stores_df = pd.DataFrame(
-        [
-            [region, *neighborhood_info,]  # Unpack neighborhood details into separate columns
-            for s_id, (region, neighborhoods) in enumerate(chicago_regions.items(), start=1)  # Assign unique store_id
-            for neighborhood_info in neighborhoods  # Iterate through each neighborhood in a region
-        ],
-        columns=[
-            "region",
-            "neighbourhood",
-            "pop_density",
-            "store_size",
-            "parking_space",
-            "category",
-            "zip_codes"
-        ],
+
+    def __init__(self, products: pd.DataFrame, start_date: datetime, end_date: datetime):
+        """
+        :param products: Products with product_id and shelf_life.
+        :param start_date: First day of the generated orders.
+        :param end_date: End of the generated orders (exclusive).
+        """
+        self.product_ids = products["product_id"].to_numpy()
+        self.product_codes = {p_id: code for code, p_id in enumerate(self.product_ids)}
+        self.bucket = pd.cut(products["shelf_life"], bins=restock_bucket_bins, labels=False).to_numpy()
+        self.period_days = restock_period_days[self.bucket]
+        self.start_day = np.datetime64(start_date.date(), "D")
+        self.end_day = np.datetime64(end_date.date(), "D")
+
+        # products x periods, enough periods for the shortest restock period over the whole date range
+        n_days = max(1, (end_date - start_date).days)
+        n_periods = -(-n_days // restock_period_days.min())
+        self.quantity = np.zeros((len(self.product_ids), n_periods), dtype=np.int64)
+
+    def add(self, product_id: str, day_idx: int, quantity: int) -> None:
+        """Adds quantity sold of product_id on day day_idx (days since start_date)."""
+        code = self.product_codes[product_id]
+        self.quantity[code, day_idx // self.period_days[code]] += quantity
+
+    def to_tables(self, vendor_prices: "VendorPrices | None" = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Returns the restock lookup and restock dates tables, same format as generate_stocks_table.
+        :param vendor_prices: See restock_lookup_table.
+        """
+        anchor_day = np.full(len(self.product_ids), self.start_day)
+        return restock_lookup_table(self.product_ids, self.bucket, anchor_day, self.quantity, self.end_day,
+                                    vendor_prices)
+
+
+# -----------Vendors---------------
+# Vendor pricing: minimum order quantity of each price tier and the discount of each tier before vendor noise,
+# smaller quantity orders = higher cost per unit
+vendor_quantity_tiers = np.array([1, 25, 100, 250])
+vendor_tier_discount = np.array([0.0, 0.04, 0.08, 0.12])
+
+
+def fake_ein(rng: np.random.Generator, size: int | None = None):
+    """Returns fake employer identification number(s), drawn from rng instead of reseeding the global state."""
+    prefix = rng.integers(10, 99, size=size)
+    serial = rng.integers(1000000, 9999999, size=size)
+    if size is None:
+        return f"{prefix}-{serial}"
+    return [f"{p}-{s}" for p, s in zip(prefix, serial)]
+
+
+def unique_company_names(n: int, seed: int | None = 42) -> list[str]:
+    """
+    Draws n distinct fake company names, in batches that are de-duplicated at once.
+    :param n: Number of names.
+    :param seed: Faker seed.
+    :return: List of n unique names
+    """
+    vendor_fake = Faker()
+    vendor_fake.seed_instance(seed)
+
+    names = []
+    while len(names) < n:
+        batch = [vendor_fake.company() for _ in range(int((n - len(names)) * 1.2) + 10)]
+        names = list(dict.fromkeys(names + batch))
+    return names[:n]
+
+
+class VendorPrices:
+    """
+    Compact (product x vendor x quantity tier) unit cost table. Every product is supplied by the same number of
+    vendors (those of its subcategory), so the table is a dense array and the cheapest vendor for any batch of
+    restocks is a single fancy-indexed argmin.
+    """
+
+    def __init__(self, product_ids, vendor_unique_ids, unit_cost, delivery_fee):
+        """
+        :param product_ids: product_id of every product row.
+        :param vendor_unique_ids: products x vendors vendor_unique_id.
+        :param unit_cost: products x vendors x tiers per item cost (float32).
+        :param delivery_fee: products x vendors delivery fee per restock order.
+        """
+        self.product_ids = product_ids
+        self.product_index = pd.Index(product_ids)
+        self.vendor_unique_ids = vendor_unique_ids
+        self.unit_cost = unit_cost
+        self.delivery_fee = delivery_fee
+
+    @classmethod
+    def from_tables(cls, vendors_df: pd.DataFrame, prices_df: pd.DataFrame) -> "VendorPrices":
+        """
+        Rebuilds the price table from the published vendor tables, so a later stage can look up vendors.
+        :param vendors_df: StarMart_Vendors.csv, the vendors of every product in consecutive rows.
+        :param prices_df: StarMart_Vendor_Prices.csv (see to_frame).
+        """
+        product_ids = np.asarray(pd.unique(vendors_df["product_id"]))
+        shape = (len(product_ids), len(vendors_df) // max(len(product_ids), 1))
+        if shape[0] * shape[1] != len(vendors_df) or \
+                (vendors_df["product_id"].to_numpy().reshape(shape) != product_ids[:, None]).any():
+            raise ValueError("Every product must have the same number of vendors, in consecutive rows")
+
+        vendor_unique_ids = vendors_df["vendor_unique_id"].to_numpy().reshape(shape)
+        tier_index = pd.MultiIndex.from_arrays([
+            np.repeat(vendor_unique_ids.ravel(), len(vendor_quantity_tiers)),
+            np.tile(vendor_quantity_tiers, vendor_unique_ids.size),
+        ])
+        unit_cost = prices_df.set_index(["vendor_unique_id", "min_qty"])["per_item_cost"].reindex(tier_index)
+        if unit_cost.isna().any():
+            raise ValueError("Vendor price table is missing quantity tiers")
+
+        return cls(product_ids, vendor_unique_ids, unit_cost.to_numpy(np.float32).reshape(*shape, -1),
+                   vendors_df["delivery_fee"].to_numpy().reshape(shape))
+
+    def cheapest_vendor(self, product_codes: np.ndarray, quantities: np.ndarray) -> tuple[np.ndarray, ...]:
+        """
+        Finds the cheapest vendor (unit cost of the quantity's tier times quantity, plus delivery fee) for every
+        restock at once.
+        :param product_codes: Row of every restocked product (see product_index.get_indexer).
+        :param quantities: Restock quantities.
+        :return: Tuple of vendor_unique_id, per item cost and total cost of every restock
+        """
+        product_codes = np.asarray(product_codes)
+        quantities = np.asarray(quantities)
+        tier = np.searchsorted(vendor_quantity_tiers, quantities, side="right") - 1
+        tier = np.clip(tier, 0, len(vendor_quantity_tiers) - 1)
+
+        vendors = np.arange(self.unit_cost.shape[1])
+        unit_cost = self.unit_cost[product_codes[:, None], vendors[None, :], tier[:, None]]
+        total_cost = unit_cost * quantities[:, None] + self.delivery_fee[product_codes]
+        best = np.argmin(total_cost, axis=1)
+
+        rows = np.arange(len(product_codes))
+        return (self.vendor_unique_ids[product_codes, best],
+                unit_cost[rows, best],
+                total_cost[rows, best])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long table with one row per (vendor, product, tier): vendor_unique_id, min_qty, per_item_cost."""
+        n_tiers = len(vendor_quantity_tiers)
+        return pd.DataFrame({
+            "vendor_unique_id": np.repeat(self.vendor_unique_ids.ravel(), n_tiers),
+            "min_qty": np.tile(vendor_quantity_tiers, self.vendor_unique_ids.size),
+            "per_item_cost": self.unit_cost.ravel().round(2),
+        })
+
+
+def generate_fake_vendors(products_df: pd.DataFrame | None = None,
+                          vendors_per_subcategory: int = 3,
+                          seed: int | None = 42) -> tuple[pd.DataFrame, VendorPrices]:
+    """
+    Generates vendors_per_subcategory vendors for every subcategory, each supplying every product of it.
+    :param products_df: Products with product_id, subcategory and cost_price, the published StarMart_Products.csv
+        if not given.
+    :param vendors_per_subcategory: Number of vendors of every subcategory.
+    :param seed: Seed for names, delivery fees and prices.
+    :return: Tuple of the vendors table (one row per vendor and product, per_item_cost is the single unit price) and
+        the quantity-tier price table
+    """
+    rng = np.random.default_rng(seed)
+    if products_df is None:
+        products_df = get_dataset(base_dir / "StarMart_Products.csv", ["product_id", "subcategory", "cost_price"])
+
+    sub_codes, sub_categories = pd.factorize(products_df["subcategory"])
+    n_vendors = len(sub_categories) * vendors_per_subcategory
+
+    # vendors, numbered in subcategory order
+    cat_sku = generate_unique_skus(sub_categories)
+    vendor_sub = np.repeat(np.arange(len(sub_categories)), vendors_per_subcategory)
+    vendor_sku = [cat_sku[sub_categories[sub]] for sub in vendor_sub]
+    vendor_id = np.array(
+        [f"STRMRT_VNDR_{sku}_{v_id}" for v_id, sku in enumerate(vendor_sku, start=1)], dtype=object
     )
-    # store id
-    f_stores_df["store_id"] = [f"STRMRT_STR_{i + 1:02d}" for i in range(len(f_stores_df))]
+    vendor_name = np.array(unique_company_names(n_vendors, seed), dtype=object)
+    vendor_fee = rng.choice([20, 25, 35, 30], size=n_vendors)
+
+    # products x vendors: every product is supplied by the vendors of its subcategory
+    n_products = len(products_df)
+    product_vendor = sub_codes[:, None] * vendors_per_subcategory + np.arange(vendors_per_subcategory)[None, :]
+
+    # base price a bit under cost, vendor-specific price level and volume discount
+    cost_price = products_df["cost_price"].to_numpy()
+    base_cost = cost_price[:, None] - rng.uniform(0.1, 0.3, size=(n_products, vendors_per_subcategory))
+    price_level = rng.normal(1.0, 0.03, size=n_vendors)
+    tier_slope = rng.uniform(0.5, 1.5, size=n_vendors)
+    unit_cost = (
+            base_cost[:, :, None]
+            * price_level[product_vendor][:, :, None]
+            * (1 - vendor_tier_discount[None, None, :] * tier_slope[product_vendor][:, :, None])
+    )
+    # a vendor never charges more than the product's own cost, at most 99% of it rounded down to the cent
+    max_cost = np.floor(cost_price * 99) / 100
+    unit_cost = np.clip(unit_cost.round(2), 0.01, max_cost[:, None, None]).astype(np.float32)
+
+    vendor_unique_ids = np.array(
+        [f"STRMRT_VNDR_{i}" for i in range(1, product_vendor.size + 1)], dtype=object
+    ).reshape(product_vendor.shape)
+
+    vendors_df = pd.DataFrame({
+        "vendor_id": vendor_id[product_vendor].ravel(),
+        "vendor_name": vendor_name[product_vendor].ravel(),
+        "delivery_fee": vendor_fee[product_vendor].ravel(),
+        "product_id": np.repeat(products_df["product_id"].to_numpy(), vendors_per_subcategory),
+        "per_item_cost": unit_cost[:, :, 0].ravel().round(2),
+        "vendor_unique_id": vendor_unique_ids.ravel(),
+    })
 
-    # moving store_id to the start
-    cols = f_stores_df.columns.tolist()
-    cols.insert(0, cols.pop(cols.index("store_id")))
-    f_stores_df = f_stores_df[cols]
+    vendor_prices = VendorPrices(
+        products_df["product_id"].to_numpy(), vendor_unique_ids, unit_cost, vendor_fee[product_vendor]
+    )
 
-    return f_stores_df
+    return vendors_df, vendor_prices
 
 
 # ------------------------------------------------------------------------------------------------------------------
@@ -964,6 +1299,7 @@ def generate_customers_df(n: int) -> pd.DataFrame:
     addresses = generate_unique_addresses(n, region_neighborhoods, weights, chicago_streets)
     phone_numbers = generate_unique_phone_numbers(size=n)
     gender = np.random.choice(["Male", "Female"], size=n, p=[0.4854, 0.5146])
+    fake = get_faker()
     names = [fake.name_male() if g == "Male" else fake.name_female() for g in gender]
     emails = generate_unique_emails(size=n, names=names, phone_num=phone_numbers)
 
@@ -982,28 +1318,51 @@ def generate_customers_df(n: int) -> pd.DataFrame:
 
 
 #----------------------------------------------------------------------------------------------------------------------
-# Customer df should already be created
-customer_df = pd.read_csv(
-    "C:/Users/shrav/Data_Analysis_Projects/Big Projects/Project StarMart/Datasets/StarMart_Customers.csv"
-).loc[:, ["customer_id", "age", "membership", "recurring"]]
-
-# Split the customer_df into recurring and non-recurring
-recurring_ids = customer_df[customer_df["recurring"] == "Recurring"]['customer_id']
-non_recurring_ids = customer_df[customer_df["recurring"] == "Non-Recurring"]['customer_id']
-one_time_ids = customer_df[customer_df["recurring"] == "One Time Customer"]['customer_id']
-customer_pool = []
-
-for c_idx in recurring_ids:
-    customer_pool.extend([c_idx] * random.randint(12, 18))  # Loyal: 8–14 orders
-for c_idx in non_recurring_ids:
-    customer_pool.extend([c_idx] * random.randint(3, 6))  # Mid: 2–5 orders
-for c_idx in one_time_ids:
-    customer_pool.append(c_idx)  # Just once
-
-random.shuffle(customer_pool)
-
-customer_dict = customer_df.set_index("customer_id").to_dict("index")
-del customer_df
+@lru_cache(maxsize=None)
+def customer_context(customers_file_path: Path | None = None, seed: int = 2025) -> SimpleNamespace:
+    """
+    Gets the customers table (published earlier in the pipeline) on first use and builds the order simulation state.
+    :param customers_file_path: Customers csv, defaults to base_dir / "StarMart_All_Customers.csv" (every generated
+        customer, StarMart_Customers.csv only keeps the ones who ordered).
+    :param seed: Seed of the customer pool, a private random.Random so the pool does not depend on call order.
+    :return: Namespace with
+        pool: customer_ids repeated by their number of visits, shuffled
+        dict: customer_id -> {"age", "membership", "recurring"}
+        ids: customer_ids in file order
+        codes: customer_id -> integer code (position in ids), used to track which customers placed orders
+        income, family_size: columns of the customers table (aligned with ids), features of the cart size model
+    """
+    if customers_file_path is None:
+        customers_file_path = base_dir / "StarMart_All_Customers.csv"
+    customer_df = get_dataset(
+        customers_file_path, ["customer_id", "age", "membership", "recurring", "income", "family_size"]
+    )
+    rng = random.Random(seed)
+
+    # Split the customer_df into recurring and non-recurring
+    recurring_ids = customer_df[customer_df["recurring"] == "Recurring"]['customer_id']
+    non_recurring_ids = customer_df[customer_df["recurring"] == "Non-Recurring"]['customer_id']
+    one_time_ids = customer_df[customer_df["recurring"] == "One Time Customer"]['customer_id']
+    customer_pool = []
+
+    for c_idx in recurring_ids:
+        customer_pool.extend([c_idx] * rng.randint(12, 18))  # Loyal: 8–14 orders
+    for c_idx in non_recurring_ids:
+        customer_pool.extend([c_idx] * rng.randint(3, 6))  # Mid: 2–5 orders
+    for c_idx in one_time_ids:
+        customer_pool.append(c_idx)  # Just once
+
+    rng.shuffle(customer_pool)
+
+    customer_ids = customer_df["customer_id"].to_numpy()
+    return SimpleNamespace(
+        pool=customer_pool,
+        dict=customer_df.set_index("customer_id")[["age", "membership", "recurring"]].to_dict("index"),
+        ids=customer_ids,
+        codes={c_id: code for code, c_id in enumerate(customer_ids)},
+        income=customer_df["income"].to_numpy(),
+        family_size=customer_df["family_size"].to_numpy(),
+    )
 
 
 def expected_splits(n, k_min=1, k_max=15, s=0.1, c=30):
@@ -1050,7 +1409,8 @@ def get_customer_count(curr_year: int,
     Simulates customer traffic with noise centered around key variable means.
     Optimized to reduce unnecessary random draws and improve performance.
     """
-    curr_date = datetime(curr_year, curr_month, curr_day)
+    retail_cal = get_calendar(curr_year, curr_year)
+    cal_day = retail_cal.day_index(datetime(curr_year, curr_month, curr_day))
 
     # Base customer count with slight noise
     base_customers = random.normalvariate(50, 5)
@@ -1091,14 +1451,14 @@ def get_customer_count(curr_year: int,
 
     # Weekday multiplier
     weekday_multipliers = {0: 1.0, 1: 0.85, 2: 0.90, 3: 1.05, 4: 1.1, 5: 1.2, 6: 1.15}
-    weekday_multiplier = weekday_multipliers[curr_date.weekday()] * random.normalvariate(
+    weekday_multiplier = weekday_multipliers[retail_cal.weekday[cal_day]] * random.normalvariate(
         1.0, 0.02
     )
 
     # Holiday bonus
     holiday_bonus = 1.0
-    if curr_date in high_traffic_periods:
-        holiday_name = holiday_lookup.get(curr_date)
+    if retail_cal.holiday_code[cal_day]:
+        holiday_name = holiday_names[retail_cal.holiday_code[cal_day]]
         f_holiday_weights = {
             "Labor Day": 1.02,
             "Father's Day": 1.03,
@@ -1139,32 +1499,102 @@ def get_customer_count(curr_year: int,
 
 
 def get_season(curr_date):
-    """Return the current season based on the month."""
-    curr_month = curr_date.month
-
-    if 3 <= curr_month <= 5:
-        return "Spring"
-    elif 6 <= curr_month <= 8:
-        return "Summer"
-    elif 9 <= curr_month <= 11:
-        return "Fall"
-    else:
-        return "Winter"
+    """Return the current season based on the month (Spring: Mar-May, Summer: Jun-Aug, Fall: Sep-Nov, else Winter)."""
+    return str(get_calendar(curr_date.year, curr_date.year).season_name(curr_date))
 
 
 def generate_sorted_order_times(n, base_date):
     """Generates a sorted list of time-stamps from 7am to 10pm"""
+    return order_time_seconds(n, base_date).astype("datetime64[s]").astype(datetime).tolist()
+
+
+def order_time_seconds(n: int, base_date: datetime) -> np.ndarray:
+    """
+    Sorted order times of a day from 7am to 10pm, as int64 seconds since 1970-01-01.
+    Same draws as one np.random.randint call per order.
+    """
     start_seconds = 7 * 3600  # 7 AM = 25,200 seconds
     end_seconds = 22 * 3600  # 10 PM = 79,200 seconds
 
-    times = np.array(
-        [
-            base_date + timedelta(seconds=np.random.randint(start_seconds, end_seconds))
-            for _ in range(n)
+    day_start = np.datetime64(base_date, "s").astype(np.int64)
+    return day_start + np.sort(np.random.randint(start_seconds, end_seconds, size=n).astype(np.int64))
+
+
+# ---- Orders CSV formatting ----
+# Whole columns are formatted at once and every batch is written as one joined string, instead of csv.writer
+# calling str() on every field of every row.
+def format_timestamps(seconds) -> np.ndarray:
+    """Formats int64 seconds since 1970-01-01 as "YYYY-MM-DD HH:MM:SS" strings."""
+    text = np.datetime_as_string(np.asarray(seconds, dtype=np.int64).astype("datetime64[s]"), unit="s")
+    return np.char.replace(text, "T", " ")
+
+
+def format_cents(cents) -> np.ndarray:
+    """Formats int cents as fixed two decimal prices, 1999 -> "19.99"."""
+    dollars, rest = np.divmod(np.asarray(cents, dtype=np.int64), 100)
+    return np.char.add(np.char.add(dollars.astype(str), "."), np.char.zfill(rest.astype(str), 2))
+
+
+def prefixed_ids(prefix: str, ids) -> np.ndarray:
+    """Formats integer ids with a prefix, ("STRMRT_ORDR_", 7) -> "STRMRT_ORDR_7"."""
+    return np.char.add(prefix, np.asarray(ids, dtype=np.int64).astype(str))
+
+
+class OrderLineBatch:
+    """Order lines of one store-day as plain columns, formatted to CSV text in one go by to_csv_text."""
+
+    header = ["line_order_id", "order_id", "customer_id", "product_id", "store_id", "cashier_id", "order_datetime",
+              "quantity", "final_price", "return_time", "money_return"]
+
+    def __init__(self):
+        self.line_ids = []
+        self.order_ids = []
+        self.customer_ids = []
+        self.product_ids = []
+        self.store_ids = []
+        self.cashier_ids = []
+        self.order_times = []
+        self.quantities = []
+        self.price_cents = []
+        self.return_times = []
+        self.money_returns = []
+
+    def __len__(self) -> int:
+        return len(self.line_ids)
+
+    def append(self, line_id: int, order_id: int, customer_id: str, product_id: str, store_id: str, cashier_id: str,
+               order_time: int, quantity: int, price_cents: int, return_time: int, money_return: bool) -> None:
+        """Adds one order line, times are seconds since 1970-01-01."""
+        self.line_ids.append(line_id)
+        self.order_ids.append(order_id)
+        self.customer_ids.append(customer_id)
+        self.product_ids.append(product_id)
+        self.store_ids.append(store_id)
+        self.cashier_ids.append(cashier_id)
+        self.order_times.append(order_time)
+        self.quantities.append(quantity)
+        self.price_cents.append(price_cents)
+        self.return_times.append(return_time)
+        self.money_returns.append(money_return)
+
+    def to_csv_text(self) -> str:
+        """CSV rows of the batch, CRLF terminated like csv.writer, without the header."""
+        if not self.line_ids:
+            return ""
+        columns = [
+            prefixed_ids("STRMRT_LINE_ID_", self.line_ids).tolist(),
+            prefixed_ids("STRMRT_ORDR_", self.order_ids).tolist(),
+            self.customer_ids,
+            self.product_ids,
+            self.store_ids,
+            self.cashier_ids,
+            format_timestamps(self.order_times).tolist(),
+            np.asarray(self.quantities).astype(str).tolist(),
+            format_cents(self.price_cents).tolist(),
+            format_timestamps(self.return_times).tolist(),
+            np.where(self.money_returns, "True", "False").tolist(),
         ]
-    )
-
-    return sorted(times)
+        return "\r\n".join(map(",".join, zip(*columns))) + "\r\n"
 
 
 def dicts_with_hierarchy_skew(
@@ -1261,19 +1691,40 @@ def choose_item(
 
 
 def generate_orders_file(
-        orders_file_path, start_date: datetime, end_date: datetime
-) -> None:
-    """Generates orders and orders_summary csv file from start date to end date"""
+        orders_file_path,
+        start_date: datetime,
+        end_date: datetime,
+        restock_accumulator: RestockAccumulator | None = None,
+        basket_size_provider: HeuristicBasketSizes | ModelBasketSizes | None = None
+) -> np.ndarray:
+    """
+    Generates orders and orders_summary csv file from start date to end date.
+    The file is formatted here and compressed / written on a background thread, see compressed_io.open_output.
+    :param orders_file_path: Uncompressed path of the orders file, the suffix of the output compression is added.
+    :param restock_accumulator: If given, every written order line is also added to it, so the restock lookup can be
+        emitted without reading the orders file back.
+    :param basket_size_provider: Gives the basket sizes of all customers of a store-day in one call,
+        HeuristicBasketSizes() by default.
+    :return: customer_ids of every customer that has at least one order line in the file
+    """
+
+    customers = customer_context()
+    customer_pool, customer_dict = customers.pool, customers.dict
+    retail_cal = get_calendar(start_date.year, end_date.year)
+    if basket_size_provider is None:
+        basket_size_provider = HeuristicBasketSizes()
 
     customer_pointer = 0
+    # one flag per customer code, set when an order line is written for that customer
+    customers_seen = np.zeros(len(customers.ids), dtype=bool)
     order_id = 1
     line_order_id = 1
     curr_date = start_date
 
-    products_df = pd.read_csv(
-        r"C:\Users\shrav\Data_Analysis_Projects\Big Projects\Project StarMart\Datasets\StarMart_Products.csv").loc[
-                  :, ["product_id", "store_id", "category", "subcategory", "cost_price", "variant", "product_name"]
-                  ]
+    products_df = get_dataset(
+        base_dir / "StarMart_Products.csv",
+        ["product_id", "store_id", "category", "subcategory", "cost_price", "variant", "product_name"]
+    )
 
     subcategory_probs_d, product_probs_d, variant_probs_d = dicts_with_hierarchy_skew(products_df)
 
@@ -1297,39 +1748,30 @@ def generate_orders_file(
             mask = store_products["category"] == category
             category_df_dict[(store_id, category)] = store_products[mask]
 
-    markup_df = product_markup_and_discount()
+    markup_df = product_markup_and_discount(products_df, dtype=np.float64)
     markup_dict = markup_df.set_index('product_id')['markup'].to_dict()
 
     holiday_discount_dict = markup_df.set_index('product_id')['holiday_discount'].to_dict()
     normal_discount_dict = markup_df.set_index('product_id')['normal_day_discount'].to_dict()
     del markup_df, employee_df
 
-    with open(orders_file_path, "w", newline="", buffering=1024 * 1024) as orders_file:
-        order_writer = csv.writer(orders_file)
+    # no return: 1900-01-01 00:00:00
+    no_return_time = np.datetime64("1900-01-01T00:00:00", "s").astype(np.int64)
+
+    with open_output(orders_file_path) as orders_file:
         # headers
-        order_writer.writerow(
-            [
-                "line_order_id",
-                "order_id",
-                "customer_id",
-                "product_id",
-                "store_id",
-                "cashier_id",
-                "order_datetime",
-                "quantity",
-                "final_price",
-                "return_time",
-                "money_return"
-            ]
-        )
+        orders_file.write(",".join(OrderLineBatch.header) + "\r\n")
 
         while curr_date < end_date:
             day = curr_date.day
             month = curr_date.month
             year = curr_date.year
+            day_idx = (curr_date - start_date).days
 
-            discount, curr_holiday = get_discount_flag(curr_date, discount_list)
-            curr_season = get_season(curr_date)
+            cal_day = retail_cal.day_index(curr_date)
+            discount = int(retail_cal.discount_flag[cal_day])
+            curr_holiday = str(holiday_names[retail_cal.holiday_code[cal_day]])
+            curr_season = str(season_names[retail_cal.season[cal_day]])
 
             for _, store in f_stores_df.iterrows():
                 store_id = store["store_id"]
@@ -1344,8 +1786,15 @@ def generate_orders_file(
                 )
 
                 # order times for the current day
-                order_times = generate_sorted_order_times(
-                    curr_customer_count, curr_date
+                order_times = order_time_seconds(curr_customer_count, curr_date)
+                batch = OrderLineBatch()
+
+                # basket sizes of every customer of the store-day in one batch
+                day_customers = [
+                    customer_pool[(customer_pointer + k) % len(customer_pool)] for k in range(curr_customer_count)
+                ]
+                basket_sizes = basket_size_provider.basket_sizes(
+                    curr_date, store_category, discount, curr_holiday, day_customers
                 )
 
                 for customer in range(curr_customer_count):
@@ -1357,9 +1806,7 @@ def generate_orders_file(
                     c_id = customer_pool[customer_pointer]
                     membership = customer_dict[c_id]["membership"]
 
-                    basket_size = basket_size_calculator(
-                        curr_date, store_category, discount, curr_holiday, membership
-                    )
+                    basket_size = int(basket_sizes[customer])
 
                     cart_size_split = random_split(basket_size)
                     num_of_categories = len(cart_size_split)
@@ -1401,7 +1848,7 @@ def generate_orders_file(
 
                         # The Membership discount is applied on the final price
                         membership_discount = 0.15 * membership
-                        final_price = round(price_after_markup * (1 - membership_discount), 2)
+                        final_price_cents = round(price_after_markup * (1 - membership_discount) * 100)
 
                         # cap orders to 70 per product
                         quantity = cart_size_split[i]
@@ -1413,28 +1860,19 @@ def generate_orders_file(
                         if random.random() < 0.04:
                             return_time_sec = random.randint(10_800, 1_209_600)
                             if return_time_sec < 604_800:
-                                return_time = curr_time + timedelta(seconds=return_time_sec)
+                                return_time = curr_time + return_time_sec
                                 if random.random() < 0.40:
                                     money_return = True
                         else:
-                            return_time = datetime(year=1900, month=1, day=1)
+                            return_time = no_return_time
                             money_return = False
 
                         # Log the values, discount and line total will be applied in SQL
-                        order_row = [
-                            f"STRMRT_LINE_ID_{line_order_id}",
-                            f"STRMRT_ORDR_{order_id}",
-                            c_id,
-                            p_id,
-                            store_id,
-                            line_cashier_id,
-                            curr_time,
-                            quantity,
-                            final_price,
-                            return_time,
-                            money_return
-                        ]
-                        order_writer.writerow(order_row)
+                        batch.append(line_order_id, order_id, c_id, p_id, store_id, line_cashier_id, curr_time,
+                                     quantity, final_price_cents, return_time, money_return)
+                        customers_seen[customers.codes[c_id]] = True
+                        if restock_accumulator is not None:
+                            restock_accumulator.add(p_id, day_idx, quantity)
 
                         line_order_id += 1
 
@@ -1443,11 +1881,19 @@ def generate_orders_file(
 
                     if customer_pointer >= len(customer_pool):
                         customer_pointer = 0
+
+                # one joined write per store-day
+                orders_file.write(batch.to_csv_text())
             curr_date += timedelta(days=1)
             print(curr_date)
 
+    return customers.ids[customers_seen]
 
-def generate_orders_dataframe_test(start_date: datetime, end_date: datetime) -> pd.DataFrame:
+
+def generate_orders_dataframe_test(start_date: datetime,
+                                   end_date: datetime,
+                                   basket_size_provider: HeuristicBasketSizes | ModelBasketSizes | None = None
+                                   ) -> pd.DataFrame:
     """
     Generates a Pandas DataFrame of simulated orders between start_date and end_date.
 
@@ -1456,13 +1902,19 @@ def generate_orders_dataframe_test(start_date: datetime, end_date: datetime) ->
                       store_id, cashier_id, order_datetime, quantity, final_price,
                       return_time, money_return.
     """
+    customers = customer_context()
+    customer_pool, customer_dict = customers.pool, customers.dict
+    retail_cal = get_calendar(start_date.year, end_date.year)
+    if basket_size_provider is None:
+        basket_size_provider = HeuristicBasketSizes()
+
     customer_pointer = 0
     order_id = 1
     line_order_id = 1
     curr_date = start_date
 
     products_df = generate_product_df(stats=False).loc[
-                  :, ["product_id", "store_id", "category", "cost_price"]
+                  :, ["product_id", "store_id", "category", "subcategory", "cost_price"]
                   ]
 
     f_stores_df = generate_stores_df()
@@ -1485,7 +1937,7 @@ def generate_orders_dataframe_test(start_date: datetime, end_date: datetime) ->
             mask = store_products["category"] == category
             category_df_dict[(store_id, category)] = store_products[mask]
 
-    markup_df = product_markup_and_discount()
+    markup_df = product_markup_and_discount(products_df, dtype=np.float64)
     markup_dict = markup_df.set_index("product_id")["markup"].to_dict()
 
     holiday_discount_dict = markup_df.set_index("product_id")["holiday_discount"].to_dict()
@@ -1500,8 +1952,10 @@ def generate_orders_dataframe_test(start_date: datetime, end_date: datetime) ->
         month = curr_date.month
         year = curr_date.year
 
-        discount, curr_holiday = get_discount_flag(curr_date, discount_list)
-        curr_season = get_season(curr_date)
+        cal_day = retail_cal.day_index(curr_date)
+        discount = int(retail_cal.discount_flag[cal_day])
+        curr_holiday = str(holiday_names[retail_cal.holiday_code[cal_day]])
+        curr_season = str(season_names[retail_cal.season[cal_day]])
 
         for _, store in f_stores_df.iterrows():
             store_id = store["store_id"]
@@ -1518,6 +1972,14 @@ def generate_orders_dataframe_test(start_date: datetime, end_date: datetime) ->
             # order times for the current day
             order_times = generate_sorted_order_times(curr_customer_count, curr_date)
 
+            # basket sizes of every customer of the store-day in one batch
+            day_customers = [
+                customer_pool[(customer_pointer + k) % len(customer_pool)] for k in range(curr_customer_count)
+            ]
+            basket_sizes = basket_size_provider.basket_sizes(
+                curr_date, store_category, discount, curr_holiday, day_customers
+            )
+
             for customer in range(curr_customer_count):
                 # get cashier info
                 line_cashier = cashier_df.iloc[random.randint(0, len(cashier_df) - 1)]
@@ -1527,9 +1989,7 @@ def generate_orders_dataframe_test(start_date: datetime, end_date: datetime) ->
                 c_id = customer_pool[customer_pointer]
                 membership = customer_dict[c_id]["membership"]
 
-                basket_size = basket_size_calculator(
-                    curr_date, store_category, discount, curr_holiday, membership
-                )
+                basket_size = int(basket_sizes[customer])
 
                 cart_size_split = random_split(basket_size)
                 num_of_categories = len(cart_size_split)
@@ -0,0 +1,232 @@
+"""
+Compiles the nested dict literals of project_data.py into a versioned, memory-mappable catalog artifact.
+
+The artifact is a directory of .npy files (flat numeric arrays, fixed-width string tables) plus a manifest.json that
+records the format version and the hash of project_data.py it was built from. Arrays are opened with
+np.load(mmap_mode="r"), so every worker process shares the same pages instead of walking the dicts again.
+
+Every build goes to its own subdirectory named after the format version and the project_data.py hash, and is
+published by renaming a private temporary directory onto it. A build is never modified once published, so processes
+building at the same time cannot break each other. Builds of other versions or hashes are pruned after every publish;
+memory maps of a pruned build stay valid, and where its files are locked (Windows) it is left for a later prune.
+
+Build it explicitly with `python catalog_artifact.py`, or let load_catalog_artifact() rebuild it whenever
+project_data.py changes.
+"""
+import json
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from table_cache import file_hash, project_data_path, unique_tmp_path
+
+ARTIFACT_VERSION = 2
+artifact_dir = Path(__file__).resolve().parent / "build" / "catalog"
+
+
+def parse_shelf_life(shelf_life_value: str) -> int:
+    """
+    Converts a shelf life string from the shelf_life dict ("6 days", "3 weeks", "Indefinite", ..) to days.
+    :param shelf_life_value: Shelf life string.
+    :return: Shelf life in days.
+    """
+    if shelf_life_value == "Indefinite":
+        return 1000
+
+    n, period = shelf_life_value.split()
+
+    period_multipliers = {"days": 1, "weeks": 7, "months": 30, "years": 365}
+    period_multiplier = period_multipliers.get(
+        period, 1
+    )  # Default to 1 if unit is unknown
+
+    return int(n) * period_multiplier
+
+
+def string_table(values) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Interns a sequence of strings.
+    :param values: Strings in catalog order.
+    :return: Tuple of (fixed-width unique string table in first-seen order, int32 codes into that table)
+    """
+    table = list(dict.fromkeys(values))
+    lookup = {value: code for code, value in enumerate(table)}
+    codes = np.array([lookup[value] for value in values], dtype=np.int32)
+    return np.array(table, dtype=str), codes
+
+
+def compile_catalog() -> dict[str, np.ndarray]:
+    """
+    Walks project_data once and returns every artifact array by name.
+
+    product_* arrays have one entry per (product, variant) in catalog order, sub_* arrays one entry per subcategory,
+    nb_* arrays one entry per (region, neighbourhood) and streets is flat, indexed through nb_street_offset.
+    """
+    import project_data as pdata
+
+    # --- products x variants ---
+    sub_names, sub_category, sub_n_products, sub_shelf_life = [], [], [], []
+    product_sub, product_pos, product_name, product_variant = [], [], [], []
+    product_variant_pos, product_n_variants, product_cost, product_rating = [], [], [], []
+
+    for category, sub_categories in pdata.category_and_products.items():
+        for item, product_list in sub_categories.items():
+            sub_idx = len(sub_names)
+            sub_names.append(item)
+            sub_category.append(category)
+            sub_n_products.append(len(product_list))
+            sub_shelf_life.append(parse_shelf_life(pdata.shelf_life.get(item)))
+
+            # return [['N/A', 1]] to loop through a nested list
+            variant_list = pdata.variant_and_multiplier.get(item, [["N/A", 1]])
+
+            for prod_pos, (product, prod_cost_price, _, base_rating) in enumerate(product_list):
+                for variant_pos, (variant_name, price_multiplier) in enumerate(variant_list):
+                    product_sub.append(sub_idx)
+                    product_pos.append(prod_pos)
+                    product_name.append(product)
+                    product_variant.append(variant_name)
+                    product_variant_pos.append(variant_pos)
+                    product_n_variants.append(len(variant_list))
+                    product_cost.append(round(prod_cost_price * price_multiplier, 2))
+                    product_rating.append(base_rating)
+
+    categories, sub_category_codes = string_table(sub_category)
+    product_names, product_name_codes = string_table(product_name)
+    variants, variant_codes = string_table(product_variant)
+
+    # --- neighbourhoods and streets ---
+    regions = np.array(list(pdata.chicago_regions), dtype=str)
+    nb_region, nb_name, nb_population, nb_street_offset, nb_street_count = [], [], [], [], []
+    streets = []
+    for region_code, (region, neighbourhoods) in enumerate(pdata.chicago_regions.items()):
+        for neighbourhood, population, *_ in neighbourhoods:
+            region_streets = pdata.chicago_streets[(region, neighbourhood)]
+            nb_region.append(region_code)
+            nb_name.append(neighbourhood)
+            nb_population.append(population)
+            nb_street_offset.append(len(streets))
+            nb_street_count.append(len(region_streets))
+            streets.extend(region_streets)
+
+    return {
+        "categories": categories,
+        "subcategories": np.array(sub_names, dtype=str),
+        "product_names": product_names,
+        "variants": variants,
+        "regions": regions,
+        "neighbourhoods": np.array(nb_name, dtype=str),
+        "streets": np.array(streets, dtype=str),
+        "sub_category": sub_category_codes.astype(np.int16),
+        "sub_n_products": np.array(sub_n_products, dtype=np.int16),
+        "sub_shelf_life": np.array(sub_shelf_life, dtype=np.int32),
+        "product_sub": np.array(product_sub, dtype=np.int16),
+        "product_pos": np.array(product_pos, dtype=np.int16),
+        "product_name": product_name_codes,
+        "product_variant": variant_codes,
+        "product_variant_pos": np.array(product_variant_pos, dtype=np.int16),
+        "product_n_variants": np.array(product_n_variants, dtype=np.int16),
+        "product_cost": np.array(product_cost, dtype=np.float64),
+        "product_rating": np.array(product_rating, dtype=np.float64),
+        "nb_region": np.array(nb_region, dtype=np.int8),
+        "nb_population": np.array(nb_population, dtype=np.int64),
+        "nb_street_offset": np.array(nb_street_offset, dtype=np.int32),
+        "nb_street_count": np.array(nb_street_count, dtype=np.int32),
+    }
+
+
+def build_path(out_dir: Path = artifact_dir) -> Path:
+    """Directory of the build of the current format version and project_data.py inside out_dir."""
+    return out_dir / f"v{ARTIFACT_VERSION}-{file_hash(project_data_path)[:16]}"
+
+
+def build_catalog_artifact(out_dir: Path = artifact_dir) -> Path:
+    """
+    Compiles project_data.py and publishes the artifact in its build directory inside out_dir.
+    The arrays and the manifest are written to a temporary directory private to this call, then renamed onto the
+    build directory. If another process published the same build first, its copy is kept and ours is dropped.
+
+    :param out_dir: Artifact directory.
+    :return: Path of the manifest.
+    """
+    arrays = compile_catalog()
+
+    target_dir = build_path(out_dir)
+    tmp_dir = unique_tmp_path(target_dir)
+    tmp_dir.mkdir(parents=True)
+
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", array, allow_pickle=False)
+
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "project_data_sha256": file_hash(project_data_path),
+        "arrays": {name: {"dtype": str(array.dtype), "shape": list(array.shape)} for name, array in arrays.items()},
+    }
+    (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+
+    try:
+        # renaming a directory onto a non-empty one fails on every platform, so a published build is never replaced
+        os.rename(tmp_dir, target_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not artifact_is_current(out_dir):
+            raise
+
+    prune_stale_builds(out_dir)
+    return target_dir / "manifest.json"
+
+
+def prune_stale_builds(out_dir: Path = artifact_dir) -> list[Path]:
+    """
+    Removes the published builds of other format versions or project_data.py hashes from out_dir.
+    Temporary directories of builds in progress (dot names) are left alone.
+
+    :param out_dir: Artifact directory.
+    :return: The stale build directories that were found.
+    """
+    current = build_path(out_dir)
+    stale = [path for path in out_dir.glob("v*-*") if path.is_dir() and path != current]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+    return stale
+
+
+def artifact_is_current(out_dir: Path = artifact_dir) -> bool:
+    """Returns True if out_dir holds a complete build of the current format version and project_data.py."""
+    manifest_path = build_path(out_dir) / "manifest.json"
+    if not manifest_path.exists():
+        return False
+
+    manifest = json.loads(manifest_path.read_text())
+    return (
+            manifest.get("version") == ARTIFACT_VERSION
+            and manifest.get("project_data_sha256") == file_hash(project_data_path)
+    )
+
+
+@lru_cache(maxsize=None)
+def load_catalog_artifact(out_dir: Path = artifact_dir) -> SimpleNamespace:
+    """
+    Loads the catalog artifact, rebuilding it first if it is missing or stale.
+    Arrays are memory-mapped read only, so they are shared between processes through the page cache.
+
+    :param out_dir: Artifact directory.
+    :return: Namespace with one attribute per artifact array.
+    """
+    if not artifact_is_current(out_dir):
+        build_catalog_artifact(out_dir)
+
+    build_dir = build_path(out_dir)
+    manifest = json.loads((build_dir / "manifest.json").read_text())
+    return SimpleNamespace(
+        **{name: np.load(build_dir / f"{name}.npy", mmap_mode="r") for name in manifest["arrays"]}
+    )
+
+
+if __name__ == "__main__":
+    print(f"Catalog artifact written to {build_catalog_artifact().parent}")
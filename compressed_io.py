@@ -0,0 +1,193 @@
+"""
+Compressed output files.
+
+The generated CSVs can be written gzip or zstd compressed (StarMart_Orders.csv -> StarMart_Orders.csv.gz / .zst).
+BackgroundWriter is a text file whose encoding, compression and disk writes run on a background thread, so the
+generator keeps formatting rows while the previous chunk is compressed (zlib and zstd release the GIL, zstd also
+compresses on all cores).
+
+Readers never need to know how a file was written: find_output picks whichever variant of a file exists, open_input
+returns a text stream over it and read_output_csv passes it to pd.read_csv, which infers the compression from the
+suffix.
+
+zstd needs the zstandard package, gzip only the standard library.
+"""
+import gzip
+import io
+import queue
+import threading
+import zlib
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+compression_suffixes = {"gzip": ".gz", "zstd": ".zst"}
+
+# compression of the files written by this process, set once by the pipeline for every stage
+_output_compression = None
+
+
+def set_output_compression(compression: str | None) -> None:
+    """
+    Sets the compression of the output files written from now on.
+    :param compression: None, "gzip" or "zstd".
+    """
+    global _output_compression
+    if compression is not None and compression not in compression_suffixes:
+        raise ValueError(f"Unknown compression {compression!r}, expected one of {', '.join(compression_suffixes)}")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+    _output_compression = compression
+
+
+def output_path(path: Path, compression: str | None = None) -> Path:
+    """
+    Path an output file is written to, with the suffix of its compression.
+    :param path: Uncompressed path, e.g. base_dir / "StarMart_Orders.csv".
+    :param compression: Compression, the one set by set_output_compression if not given.
+    """
+    path = Path(path)
+    compression = compression or _output_compression
+    return path.with_name(path.name + compression_suffixes[compression]) if compression else path
+
+
+def output_variants(path: Path) -> list[Path]:
+    """Every path an output file can have, uncompressed first."""
+    path = Path(path)
+    return [path, *(path.with_name(path.name + suffix) for suffix in compression_suffixes.values())]
+
+
+def find_output(path: Path | str) -> Path:
+    """
+    The existing variant of an output file, the one of the current compression first.
+    :param path: Uncompressed path, e.g. "StarMart_Orders.csv" finds StarMart_Orders.csv.gz after a gzip run.
+    :return: Path of the file on disk, output_path(path) if no variant exists.
+    """
+    candidates = [output_path(path), *output_variants(path)]
+    return next((candidate for candidate in candidates if candidate.exists()), candidates[0])
+
+
+def new_compressor(compression: str | None, level: int | None = None):
+    """Streaming compressor object (compress / flush) of a compression, None when uncompressed."""
+    if compression == "gzip":
+        # wbits 31 writes the gzip header and trailer, any gzip reader can open the file
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3 if level is None else level, threads=-1).compressobj()
+    return None
+
+
+class BackgroundWriter:
+    """
+    Write-only text file that hands every chunk_size characters to a writer thread, which encodes, compresses and
+    writes them. Works with csv.writer and DataFrame.to_csv like a file opened with newline="".
+    """
+
+    def __init__(self, path: Path, compression: str | None = None, chunk_size: int = 1024 * 1024,
+                 level: int | None = None, max_pending: int = 8):
+        """
+        :param path: File to write, taken as is (see output_path for the compressed name).
+        :param compression: None, "gzip" or "zstd".
+        :param chunk_size: Characters buffered before a chunk is handed to the writer thread.
+        :param level: Compression level, the library default if not given.
+        :param max_pending: Chunks waiting for the writer thread before write() blocks, bounds the memory when the
+            disk is slower than the generator.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+        self.error = None
+
+        self.compressor = new_compressor(compression, level)
+        self.file = open(path, "wb")
+        self.chunks = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self.drain, name=f"writer-{path.name}", daemon=True)
+        self.thread.start()
+
+    def drain(self) -> None:
+        """Writer thread, runs until close() queues None."""
+        try:
+            while (chunk := self.chunks.get()) is not None:
+                data = chunk.encode("utf-8")
+                self.file.write(self.compressor.compress(data) if self.compressor else data)
+            if self.compressor:
+                self.file.write(self.compressor.flush())
+        except BaseException as error:
+            self.error = error
+            # keep taking chunks so write() never blocks on a full queue
+            while self.chunks.get() is not None:
+                pass
+
+    def submit(self) -> None:
+        if self.error is not None:
+            raise self.error
+        self.chunks.put("".join(self.parts))
+        self.parts = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.chunk_size:
+            self.submit()
+        return len(text)
+
+    def close(self) -> None:
+        """Writes the remaining text and waits for the writer thread, re-raising its error."""
+        if self.thread.is_alive():
+            if self.parts and self.error is None:
+                self.submit()
+            self.chunks.put(None)
+            self.thread.join()
+            self.file.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_output(path: Path, compression: str | None = None, **kwargs) -> BackgroundWriter:
+    """
+    Opens an output file for writing in the background. The variants of the file with another compression are
+    removed, so readers never pick up a stale one.
+    :param path: Uncompressed path, the compression suffix is added.
+    :param compression: Compression, the one set by set_output_compression if not given.
+    :param kwargs: Passed to BackgroundWriter.
+    """
+    compression = compression or _output_compression
+    target = output_path(path, compression)
+    for variant in output_variants(path):
+        if variant != target:
+            variant.unlink(missing_ok=True)
+    return BackgroundWriter(target, compression, **kwargs)
+
+
+def open_input(path: Path) -> io.TextIOBase:
+    """
+    Opens whichever variant of an output file exists as a text stream (newline="", ready for csv.reader).
+    :param path: Uncompressed path.
+    """
+    path = find_output(path)
+    if path.suffix == compression_suffixes["gzip"]:
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.suffix == compression_suffixes["zstd"]:
+        if zstandard is None:
+            raise ImportError(f"Reading {path.name} needs the zstandard package (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def read_output_csv(path: Path | str, **kwargs) -> pd.DataFrame:
+    """pd.read_csv of whichever variant of an output file exists, used by the Analysis notebooks as well."""
+    return pd.read_csv(find_output(path), **kwargs)
@@ -1,77 +1,148 @@
+import argparse
+
 from all_functions import *
+from dataset_registry import get_dataset, publish_dataset
+from pipeline import Stage, run_pipeline
 
 base_dir = Path(
     "C:/Users/shrav/Data_Analysis_Projects/Big Projects/Project StarMart/Datasets"
 )
 
+start_dt = datetime(2024, 1, 1)
+end_dt = datetime(2025, 1, 1)
+generator_seed = 42
+
 
 def csv_writer(file_name, df):
-    file_path = base_dir / file_name
-    df.to_csv(file_path, index=False)
-    print(f"{file_name} done!")
+    # published for the downstream stages, the csv itself is written in the background
+    publish_dataset(base_dir / file_name, df)
 
 
-# Customers Table
-start_dt = datetime(2024, 1, 1)
-end_dt = datetime(2025, 1, 1)
-customer_df = return_complete_df(40_000, 50_000, 90_000)
-csv_writer("StarMart_Customers.csv", customer_df)
-
-# Employee Table
-employee_df = generate_employee_df()
-csv_writer("StarMart_Employees.csv", employee_df)
-del employee_df
-
-# Products Table
-products_df = generate_product_df()
-csv_writer("StarMart_Product.csv", products_df)
-del products_df
-
-# Stores Table
-stores_df = generate_stores_df()
-# removing category as it is not useful anymore
-stores_df = stores_df.drop(columns=["category"])
-csv_writer("StarMart_Stores.csv", stores_df)
-del stores_df
-
-# Orders and Orders Summary Table
-orders_file_path = base_dir / "StarMart_Orders.csv"
-generate_orders_file(orders_file_path, start_date=start_dt, end_date=end_dt)
-print("Orders and Orders Summary Done")
-
-orders_df = pd.read_csv(orders_file_path)
-all_customers = list(orders_df['customer_id'].unique())
-customer_df = customer_df[customer_df['customer_id'].isin(all_customers)]
-csv_writer("StarMart_Customers.csv", customer_df)
-
-del customer_df, orders_df
-
-# Holiday Dates
-dates_df = pd.DataFrame(holiday_lookup_dates, columns=["holiday_dates"])
-csv_writer("StarMart_Holiday_Dates.csv", dates_df)
-
-# Discount Dates
-dates_df = pd.DataFrame(list(discount_list), columns=["discount_dates"])
-csv_writer("StarMart_Discount_Dates.csv", dates_df)
-
-# Stocks
-stocks, restock_dates = generate_stocks_table()
-csv_writer("StarMart_Inventory_Lookup.csv", stocks)
-csv_writer("StarMart_Restock_Dates.csv", restock_dates)
-
-# Vendors
-vendors_df = generate_fake_vendors()
-csv_writer("StarMart_Vendors.csv", vendors_df)
-
-# Markup And Discount
-markup_discount = product_markup_and_discount()
-csv_writer("StarMart_Markup_Discount.csv", markup_discount)
-
-# Holiday Restock Days
-dates_df = pd.DataFrame(list(holiday_restock_dates), columns=["restock_dates"])
-csv_writer("StarMart_Holiday_Restock.csv", dates_df)
-
-# Holiday Lookup
-holiday_lookup_df = pd.DataFrame.from_dict(holiday_lookup, orient='index', columns=['Holiday_Name'])
-holiday_lookup_df = holiday_lookup_df.reset_index().rename(columns={'index': 'Date'})
-csv_writer("StarMart_Holiday_Lookup.csv", holiday_lookup_df)
+# ---- Stages, every stage gets its inputs from the dataset registry and publishes its outputs to base_dir ----
+def customers_stage():
+    # every generated customer, the orders stage keeps the ones who placed an order in StarMart_Customers.csv
+    customer_df = return_complete_df(40_000, 50_000, 90_000)
+    csv_writer("StarMart_All_Customers.csv", customer_df)
+
+
+def employees_stage():
+    employee_df = generate_employee_df()
+    csv_writer("StarMart_Employees.csv", employee_df)
+
+
+def products_stage():
+    products_df = generate_product_df()
+    csv_writer("StarMart_Products.csv", products_df)
+
+
+def stores_stage():
+    stores_df = generate_stores_df()
+    # removing category as it is not useful anymore
+    stores_df = stores_df.drop(columns=["category"])
+    csv_writer("StarMart_Stores.csv", stores_df)
+
+
+def orders_stage():
+    # Orders, restock quantities are summed while the orders are written
+    products_df = get_dataset(base_dir / "StarMart_Products.csv", ["product_id", "shelf_life"])
+    orders_file_path = base_dir / "StarMart_Orders.csv"
+    restock_accumulator = RestockAccumulator(products_df, start_dt, end_dt)
+    # basket sizes come from the cart size model once it is trained (other_scripts/cart_size_training.py)
+    basket_sizes = ModelBasketSizes() if basket_model_path.exists() else HeuristicBasketSizes()
+    all_customers = generate_orders_file(orders_file_path, start_date=start_dt, end_date=end_dt,
+                                         restock_accumulator=restock_accumulator, basket_size_provider=basket_sizes)
+    print("Orders and Orders Summary Done")
+
+    customer_df = get_dataset(base_dir / "StarMart_All_Customers.csv")
+    customer_df = customer_df[customer_df['customer_id'].isin(all_customers)]
+    csv_writer("StarMart_Customers.csv", customer_df)
+
+    # Stocks, every restock is ordered from its cheapest vendor
+    vendor_prices = VendorPrices.from_tables(get_dataset(base_dir / "StarMart_Vendors.csv"),
+                                             get_dataset(base_dir / "StarMart_Vendor_Prices.csv"))
+    stocks, restock_dates = restock_accumulator.to_tables(vendor_prices)
+    csv_writer("StarMart_Inventory_Lookup.csv", stocks)
+    csv_writer("StarMart_Restock_Dates.csv", restock_dates)
+
+
+def calendar_stage():
+    retail_cal = get_calendar(r_start_year, r_end_year)
+    is_holiday = retail_cal.holiday_code > 0
+
+    # Holiday Dates
+    dates_df = pd.DataFrame({"holiday_dates": retail_cal.dates[is_holiday]})
+    csv_writer("StarMart_Holiday_Dates.csv", dates_df)
+
+    # Discount Dates
+    dates_df = pd.DataFrame(sorted(get_discount_dates()), columns=["discount_dates"])
+    csv_writer("StarMart_Discount_Dates.csv", dates_df)
+
+    # Holiday Restock Days
+    dates_df = pd.DataFrame({"restock_dates": retail_cal.dates[retail_cal.restock_flag]})
+    csv_writer("StarMart_Holiday_Restock.csv", dates_df)
+
+    # Holiday Lookup
+    holiday_lookup_df = pd.DataFrame({
+        "Date": retail_cal.dates[is_holiday],
+        "Holiday_Name": holiday_names[retail_cal.holiday_code[is_holiday]],
+    })
+    csv_writer("StarMart_Holiday_Lookup.csv", holiday_lookup_df)
+
+
+def vendors_stage():
+    vendors_df, vendor_prices = generate_fake_vendors(seed=generator_seed)
+    csv_writer("StarMart_Vendors.csv", vendors_df)
+    csv_writer("StarMart_Vendor_Prices.csv", vendor_prices.to_frame())
+
+
+def markup_stage():
+    markup_discount = product_markup_and_discount(seed=generator_seed)
+    csv_writer("StarMart_Markup_Discount.csv", markup_discount)
+
+
+def prepare_shared_state():
+    """
+    Builds the catalog artifact and the stores table cache once, before the stages start: the products, employees
+    and stores stages all need them, and would otherwise each build them in their own worker process.
+    """
+    load_catalog_artifact()
+    generate_stores_df()
+
+
+pipeline_stages = [
+    Stage("customers", customers_stage, outputs=["StarMart_All_Customers.csv"]),
+    Stage("employees", employees_stage, outputs=["StarMart_Employees.csv"]),
+    Stage("products", products_stage, outputs=["StarMart_Products.csv"]),
+    Stage("stores", stores_stage, outputs=["StarMart_Stores.csv"]),
+    Stage(
+        "orders", orders_stage,
+        inputs=["StarMart_All_Customers.csv", "StarMart_Products.csv", "StarMart_Vendors.csv",
+                "StarMart_Vendor_Prices.csv"],
+        outputs=["StarMart_Orders.csv", "StarMart_Customers.csv", "StarMart_Inventory_Lookup.csv",
+                 "StarMart_Restock_Dates.csv"],
+    ),
+    Stage(
+        "calendar", calendar_stage,
+        outputs=["StarMart_Holiday_Dates.csv", "StarMart_Discount_Dates.csv", "StarMart_Holiday_Restock.csv",
+                 "StarMart_Holiday_Lookup.csv"],
+    ),
+    Stage("vendors", vendors_stage, inputs=["StarMart_Products.csv"],
+          outputs=["StarMart_Vendors.csv", "StarMart_Vendor_Prices.csv"], seed=generator_seed),
+    Stage("markup", markup_stage, inputs=["StarMart_Products.csv"], outputs=["StarMart_Markup_Discount.csv"],
+          seed=generator_seed),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the StarMart csv files")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="Run only these stages")
+    parser.add_argument("--from", dest="start_from", metavar="STAGE",
+                        help="Run this stage and every stage downstream of it")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--force", action="store_true", help="Rebuild the selected stages even if they are current")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], default=None,
+                        help="Write compressed csv files (.csv.gz / .csv.zst), zstd needs the zstandard package")
+    args = parser.parse_args()
+
+    run_pipeline(pipeline_stages, base_dir, max_workers=args.workers, only=args.only, start_from=args.start_from,
+                 force=args.force, compression=args.compression, prepare=prepare_shared_state)
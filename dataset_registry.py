@@ -0,0 +1,98 @@
+"""
+Hand-off of the generated tables between the pipeline stages.
+
+A stage publishes every table it produces with publish_dataset instead of writing the CSV itself. The DataFrame is
+kept in memory for the rest of the process and pickled (pandas' native binary format, loaded without parsing) into
+a .datasets directory next to the CSVs, which is how the stages running in other worker processes pick it up. The
+CSV is written on a background thread: downstream code reads the table with get_dataset and never waits for it.
+flush_writes() waits for the pending CSV writes, the pipeline calls it at the end of every stage so the outputs are
+complete before they are hashed.
+
+A pickle is only used while the CSV it was published with is unchanged (size and mtime recorded once the CSV is
+written), a CSV regenerated or edited outside the pipeline is read instead. CSVs are written with the output
+compression of compressed_io and read back whatever their compression.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from compressed_io import find_output, open_output, read_output_csv
+
+registry_dir_name = ".datasets"
+
+# CSV path -> DataFrame, tables published or loaded by this process
+_datasets = {}
+# a single thread keeps the writes sequential, the disk is the bottleneck anyway
+_csv_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="csv_writer")
+_pending_writes = []
+
+
+def dataset_paths(csv_path: Path) -> tuple[Path, Path]:
+    """Pickle of a table and the stamp of the CSV it was published with."""
+    registry_dir = csv_path.parent / registry_dir_name
+    return registry_dir / f"{csv_path.stem}.pkl", registry_dir / f"{csv_path.stem}.json"
+
+
+def write_csv(df: pd.DataFrame, csv_path: Path, stamp_path: Path) -> None:
+    """Writes the CSV of a published table, then stamps it so other processes can trust the pickle."""
+    with open_output(csv_path) as file:
+        df.to_csv(file, index=False)
+    stat = file.path.stat()
+    stamp_path.write_text(json.dumps({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}))
+    print(f"{file.path.name} done!")
+
+
+def publish_dataset(csv_path: Path, df: pd.DataFrame) -> None:
+    """
+    Makes a table available to the downstream stages and queues its CSV write.
+    The DataFrame must not be modified afterwards, it is shared with the writer thread and later readers.
+    :param csv_path: Output CSV of the table, also the name it is looked up by.
+    :param df: Table.
+    """
+    _datasets[str(csv_path)] = df
+    pickle_path, stamp_path = dataset_paths(csv_path)
+    pickle_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # the pickle is not valid until the CSV is written
+    stamp_path.unlink(missing_ok=True)
+    tmp_path = pickle_path.with_suffix(".tmp")
+    df.to_pickle(tmp_path)
+    tmp_path.replace(pickle_path)
+
+    _pending_writes.append(_csv_executor.submit(write_csv, df, csv_path, stamp_path))
+
+
+def flush_writes() -> None:
+    """Waits for the queued CSV writes, re-raising the first failed one."""
+    while _pending_writes:
+        _pending_writes.pop(0).result()
+
+
+def pickle_is_current(csv_path: Path) -> bool:
+    """True if the pickle of a table was published with the CSV currently on disk."""
+    pickle_path, stamp_path = dataset_paths(csv_path)
+    csv_path = find_output(csv_path)
+    if not pickle_path.exists() or not stamp_path.exists() or not csv_path.exists():
+        return False
+    stamp = json.loads(stamp_path.read_text())
+    stat = csv_path.stat()
+    return stamp["size"] == stat.st_size and stamp["mtime_ns"] == stat.st_mtime_ns
+
+
+def get_dataset(csv_path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Returns a published table: from memory, else from its pickle, else from the CSV.
+    :param csv_path: Output CSV of the table.
+    :param columns: Columns to return, all of them if not given.
+    :return: DataFrame, shared with the registry when columns is not given (treat it as read only)
+    """
+    key = str(csv_path)
+    if key in _datasets:
+        df = _datasets[key]
+    elif pickle_is_current(csv_path):
+        df = _datasets[key] = pd.read_pickle(dataset_paths(csv_path)[0])
+    else:
+        df = read_output_csv(csv_path, usecols=columns)
+    return df.loc[:, columns] if columns is not None else df
@@ -1,8 +1,8 @@
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import lru_cache
 import matplotlib.pyplot as plt
-import seaborn as sns
 from raw_data import (
     holiday_impact,
     family_impact,
@@ -16,22 +16,332 @@ from raw_data import (
 )
 
 
+def to_day_ordinals(dates) -> np.ndarray:
+    """Converts dates (datetime, Timestamp, datetime64, DatetimeIndex or a list of them) to days since 1970-01-01."""
+    return np.asarray(pd.DatetimeIndex(np.atleast_1d(dates)).values, dtype="datetime64[D]").astype(np.int64)
+
+
+@lru_cache(maxsize=16)
+def day_set_of(dates: tuple) -> frozenset[int]:
+    """
+    Day ordinals of a tuple of dates, memoized on the tuple. The lookup still hashes the whole tuple, so a call is
+    O(len(dates)) even on a hit; only the date conversion is skipped.
+    """
+    return frozenset(to_day_ordinals(list(dates)).tolist()) if dates else frozenset()
+
+
+def discount_day_set(discount_dt_lst) -> frozenset[int]:
+    """
+    Day ordinals of the discount dates, so membership checks are O(1) instead of a scan of the date list.
+    A frozenset is returned as is; a list costs O(len(list)) on every call (tuple copy and hash, see day_set_of).
+    Build the set once and pass it to get_discount_flag when checking many dates.
+    """
+    if isinstance(discount_dt_lst, frozenset):
+        return discount_dt_lst
+    return day_set_of(tuple(discount_dt_lst))
+
+
 def get_discount_flag(date, discount_dt_lst=None) -> tuple:
     """
     Check whether the given date is a holiday or in the discount date list.
     Returns (1, holiday_name) if it's a holiday or discounted, else (0, "Normal Day").
+    discount_dt_lst can be a list of dates or the output of discount_day_set. With a list every call is
+    O(len(list)); precompute discount_day_set(list) for repeated calls, or use discount_flags for a batch of dates.
     """
     curr_holiday = holiday_lookup.get(date, "Normal Day")
 
     if curr_holiday != "Normal Day":
         return 1, curr_holiday
 
-    if discount_dt_lst is not None and date in discount_dt_lst:
+    if discount_dt_lst is not None and to_day_ordinals(date)[0] in discount_day_set(discount_dt_lst):
         return 1, "Normal Day"
 
     return 0, "Normal Day"
 
 
+# Lookup arrays, the impact dicts are turned into arrays once and indexed by whole feature columns
+income_levels = np.array(["Low", "Medium", "High"])
+income_bins = [50000, 100000]  # upper bounds of Low and Medium income
+store_levels = np.array(["High", "Medium", "Low"])
+
+
+def impact_array(impact: dict, keys) -> np.ndarray:
+    """
+    Converts an impact dict to an array aligned with keys.
+    :param impact: Impact dict (family_impact, month_impact, ..).
+    :param keys: Keys in code order; integer keys 0..n can be passed as range(n + 1) to index by the value itself.
+    :return: Float array, NaN for keys missing from the dict
+    """
+    return np.array([impact.get(key, np.nan) for key in keys], dtype=float)
+
+
+@lru_cache(maxsize=None)
+def holiday_lookup_arrays() -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sorted day ordinals (days since 1970-01-01) of holiday_lookup and the holiday name of each, built once per
+    process and shared by every batch (read-only).
+    :return: Tuple of (day ordinals, holiday names)
+    """
+    lookup = sorted((np.datetime64(date, "D").astype(np.int64), name) for date, name in holiday_lookup.items())
+    arrays = np.array([day for day, _ in lookup], dtype=np.int64), np.array([name for _, name in lookup])
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+def holiday_names_of(days: np.ndarray) -> np.ndarray:
+    """Holiday name of every day ordinal in days, "Normal Day" when it is not in holiday_lookup."""
+    lookup_days, lookup_names = holiday_lookup_arrays()
+    pos = np.clip(np.searchsorted(lookup_days, days), 0, len(lookup_days) - 1)
+    return np.where(lookup_days[pos] == days, lookup_names[pos], "Normal Day")
+
+
+def discount_flags(dates, discount_dt_lst=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batch version of get_discount_flag, linear in the number of dates.
+    The discount dates are marked in a per-day boolean array covering their range, every date is then one index.
+
+    :param dates: Dates to check (datetime64 array, DatetimeIndex or list of datetimes)
+    :param discount_dt_lst: Dates other than holidays with a discount
+    :return: Tuple of (discount flag of every date, 1 on holidays and discount dates, holiday name of every date)
+    """
+    days = to_day_ordinals(dates)
+    holidays = holiday_names_of(days)
+    flags = holidays != "Normal Day"
+
+    if discount_dt_lst is not None and len(discount_dt_lst):
+        discount_days = to_day_ordinals(discount_dt_lst)
+        first_day = discount_days.min()
+        is_discount_day = np.zeros(discount_days.max() - first_day + 1, dtype=bool)
+        is_discount_day[discount_days - first_day] = True
+
+        in_range = (days >= first_day) & (days < first_day + len(is_discount_day))
+        flags[in_range] |= is_discount_day[days[in_range] - first_day]
+
+    return flags.astype(np.int64), holidays
+
+
+def cart_size_batch(
+        dates: np.ndarray,
+        income: np.ndarray,
+        family_size: np.ndarray,
+        store_size: np.ndarray,
+        discount_flags: np.ndarray,
+        holidays: np.ndarray,
+        multiplier: float = 1,
+        base_mean: float = 8,
+        base_std: float = 1.5,
+) -> np.ndarray:
+    """
+    Array version of cart_size_calculator, every effect is drawn as a whole column.
+
+    :param dates: Dates (datetime64[D])
+    :param income: Income of every customer
+    :param family_size: Number of members in every customers family
+    :param store_size: Size of the store ("High", "Medium", "Low")
+    :param discount_flags: 1 if the date has a discount else 0
+    :param holidays: Holiday name of every date, "Normal Day" when there is none
+    :param multiplier: Percentage tweaker for the other features(current 100%)
+    :param base_mean: starting point for the cart, see cart_size_calculator
+    :param base_std: Standard deviation for the base mean
+    :return: Cart size of every row
+    """
+    n = len(dates)
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+    weekdays = (days + 3) % 7  # 1970-01-01 was a Thursday
+
+    # 1) Baseline
+    baseline = np.random.normal(base_mean, base_std, n)
+
+    # additional noice
+    a = 0.1  # mean
+    b = 0.2  # std
+
+    # 2) Family effect
+    fam_effect = impact_array(family_impact, range(max(family_impact) + 1))[family_size] + np.random.normal(a, b, n)
+
+    # 3) Income effect
+    income_code = np.digitize(income, income_bins)
+    income_effect = impact_array(income_impact, income_levels)[income_code] - np.random.normal(a, b, n)
+
+    # 4) Month effect
+    month_eff = impact_array(month_impact, range(13))[months] + np.random.normal(a, b, n)
+
+    # 5) Weekend effect
+    wkd_eff = impact_array(daily_impact, range(7))[weekdays] - np.random.normal(a, b, n)
+
+    # 6) Store location effect
+    store_code = pd.Categorical(store_size, categories=store_levels).codes
+    store_effect = impact_array(store_impact, store_levels)[store_code] + np.random.normal(a, b, n)
+
+    # 7) Holiday effect, holidays missing from holiday_impact get the no holiday effect
+    no_holiday_effect = np.random.normal(-0.5, 0.20, n)
+    holiday_names, holiday_code = np.unique(holidays, return_inverse=True)
+    holiday_base = impact_array(holiday_impact, holiday_names)[holiday_code]
+    holiday_effect = np.where(np.isnan(holiday_base), no_holiday_effect, holiday_base) + np.random.normal(a, b, n)
+
+    # 8) Discount effect
+    discount_effect = impact_array(discount_impact, (0, 1))[discount_flags] + np.random.normal(a, b, n)
+
+    # 9) Sum all effects
+    total_items = baseline * (
+            multiplier
+            + fam_effect
+            + income_effect
+            + month_eff
+            + wkd_eff
+            + store_effect
+            + holiday_effect
+            + discount_effect
+    )
+
+    return np.maximum(1, total_items.astype(np.int64))
+
+
+# Streaming statistics, constant memory however many rows are summarized
+class StreamingStats:
+    """
+    Running count, mean and variance (Welford, merged per chunk with Chan's formula) plus a histogram of fixed width
+    bins starting at 0, which gives the median / quantiles and the density curve without keeping the values.
+    Bins are grown as larger values arrive, negative values are counted in the first bin.
+    """
+
+    def __init__(self, bin_width: float = 1.0):
+        """
+        :param bin_width: Histogram bin width, 1 gives exact quantiles for integer values like cart sizes.
+        """
+        self.bin_width = bin_width
+        self.n = 0
+        self._mean = 0.0
+        self.m2 = 0.0  # sum of squared differences from the mean
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, values) -> None:
+        """Adds a chunk of values."""
+        values = np.asarray(values, dtype=float)
+        n_b = len(values)
+        if n_b == 0:
+            return
+
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        delta = mean_b - self._mean
+        n = self.n + n_b
+        self._mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / n
+        self.n = n
+
+        bins = np.bincount(np.clip(values // self.bin_width, 0, None).astype(np.int64))
+        if len(bins) > len(self.counts):
+            self.counts = np.pad(self.counts, (0, len(bins) - len(self.counts)))
+        self.counts[:len(bins)] += bins
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.n else np.nan
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1, same as pandas)."""
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    def quantile(self, q: float) -> float:
+        """
+        Quantile q (0..1) with the linear interpolation of pandas: the values of ranks floor(q * (n - 1)) and
+        ceil(q * (n - 1)) are taken as the left edge of their bins and interpolated. Exact for integer values with
+        bin_width 1, otherwise within bin_width of Series.quantile.
+        """
+        if self.n == 0:
+            return np.nan
+        rank = q * (self.n - 1)
+        lower, upper = np.searchsorted(np.cumsum(self.counts), [np.floor(rank), np.ceil(rank)], side="right")
+        return (lower + (upper - lower) * (rank - np.floor(rank))) * self.bin_width
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def density(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Histogram density curve.
+        :return: Tuple of (bin centers, density of every bin)
+        """
+        centers = (np.arange(len(self.counts)) + 0.5) * self.bin_width
+        return centers, self.counts / max(self.n, 1) / self.bin_width
+
+
+def cart_size_summary(chunks) -> dict[str, StreamingStats]:
+    """
+    Summarizes cart datasets chunk by chunk.
+    :param chunks: Iterable of DataFrames with cart_size, discount_flag and holiday columns (or a single DataFrame).
+    :return: StreamingStats of cart_size for "all" rows, "discount" / "no_discount" days and "holiday" / "normal" days
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+
+    summary = {group: StreamingStats() for group in ("all", "discount", "no_discount", "holiday", "normal")}
+    for chunk in chunks:
+        cart_size = chunk["cart_size"].to_numpy()
+        is_discount = chunk["discount_flag"].to_numpy() == 1
+        is_holiday = chunk["holiday"].to_numpy() != "Normal Day"
+
+        summary["all"].update(cart_size)
+        summary["discount"].update(cart_size[is_discount])
+        summary["no_discount"].update(cart_size[~is_discount])
+        summary["holiday"].update(cart_size[is_holiday])
+        summary["normal"].update(cart_size[~is_holiday])
+
+    return summary
+
+
+def print_cart_size_stats(summary: dict[str, StreamingStats]) -> None:
+    """Prints the statistics of a cart_size_summary."""
+    print(f"Overall Mean Cart Size: {summary['all'].mean:.2f}")
+    print(f"Median Cart Size: {summary['all'].median}")
+    print(f"Std Dev of Cart Size: {summary['all'].std:.2f}")
+
+    print(f"Mean Cart Size (Holiday): {summary['discount'].mean:.2f}")
+    print(f"Mean Cart Size (Normal): {summary['no_discount'].mean:.2f}")
+
+
+def plot_cart_size_density(summary: dict[str, StreamingStats]) -> None:
+    """Plots the binned density curves of a cart_size_summary, overall and holiday vs no holiday."""
+    # plot the density plot for the overall cart size
+    plt.figure(figsize=(10, 6))
+    centers, density = summary["all"].density()
+    plt.fill_between(centers, density, alpha=0.3)
+    plt.plot(centers, density)
+
+    # Add mean and median lines
+    plt.axvline(summary["all"].mean, linestyle="--", color="blue", label="Mean")
+    plt.axvline(summary["all"].median, linestyle="-.", color="red", label="Median")
+
+    # Labels and title
+    plt.xlabel("Cart Size")
+    plt.ylabel("Density")
+    plt.title("Cart Size Distribution")
+    plt.legend()
+    plt.show()
+
+    # plot the density plot for normal days and holidays
+    plt.figure(figsize=(10, 6))
+    for group, label, color in (("holiday", "Holiday", "blue"), ("normal", "No Holiday", "red")):
+        centers, density = summary[group].density()
+        plt.fill_between(centers, density, alpha=0.3, color=color)
+        plt.plot(centers, density, label=label, color=color)
+
+    # Labels and title
+    plt.xlabel("Cart Size")
+    plt.ylabel("Density")
+    plt.title(
+        "Cart Size Distribution during Holiday vs No Holiday (Discounts may be present)"
+    )
+    plt.legend()
+    plt.tight_layout()
+    plt.show()
+
+
 # Main Data Generation
 def generate_cart_dataset(
         samples: int,
@@ -67,19 +377,18 @@ def generate_cart_dataset(
     # creating lists to iterate through during data generation
 
     # Date range
-    start_date = datetime.strptime(start_dt, "%Y-%m-%d")
-    end_date = datetime.strptime(end_dt, "%Y-%m-%d")
-    date_range = (end_date - start_date).days
-
-    dates = []
-    for _ in range(samples):
-        if np.random.rand() < holiday_probability:
-            date = np.random.choice(list(high_traffic_periods))
-            dates.append(date)
-        else:
-            # pick a random normal date
-            date = start_date + timedelta(days=np.random.randint(0, date_range + 1))
-            dates.append(date)
+    start_date = np.datetime64(start_dt, "D")
+    end_date = np.datetime64(end_dt, "D")
+    date_range = int((end_date - start_date).astype(np.int64))
+
+    # holiday_probability of the dates are picked from the high traffic periods, the rest from the date range
+    high_traffic_days = np.array(sorted(high_traffic_periods), dtype="datetime64[D]")
+    pick_holiday = np.random.rand(samples) < holiday_probability
+    dates = np.where(
+        pick_holiday,
+        high_traffic_days[np.random.randint(0, len(high_traffic_days), samples)],
+        start_date + np.random.randint(0, date_range + 1, samples),
+    )
 
     np.random.shuffle(dates)
 
@@ -87,10 +396,6 @@ def generate_cart_dataset(
     discount_sample = int(samples * 0.1)
     discount_dates = dates[:discount_sample]
 
-    # Convert the date ranges to datetime
-    dates = pd.to_datetime(dates)
-    discount_dates = pd.to_datetime(discount_dates)
-
     # Generate income
     # this will get an income range which is skewed towards low income
     income = np.random.lognormal(mean=4.2, sigma=0.35, size=samples) * 1000
@@ -102,103 +407,43 @@ def generate_cart_dataset(
     )
 
     # Store location
-    store_locations: np.ndarray[str] = np.random.choice(
-        ["High", "Medium", "Low"], size=samples
+    store_locations: np.ndarray[str] = store_levels[np.random.randint(0, len(store_levels), samples)]
+
+    # Discount flags and holidays, holidays are discounted as well
+    sample_discount_flags, holiday_names = discount_flags(dates, discount_dates)
+
+    cart_sizes = cart_size_batch(
+        dates,
+        income,
+        family_size,
+        store_locations,
+        sample_discount_flags,
+        holiday_names,
+        multiplier=multiplier,
+        base_mean=base_mean,
+        base_std=base_std,
     )
 
-    # Prepare columns
-    discount_flags = []
-    holiday_names = []
-    cart_sizes = []
-
-    for i in range(samples):
-        curr_date, curr_income, cur_family_size, curr_store_size = (
-            dates[i],
-            int(income[i]),
-            family_size[i],
-            store_locations[i],
-        )
-
-        # get the cart size
-        curr_cart_size = cart_size_calculator(
-            curr_date,
-            curr_income,
-            cur_family_size,
-            curr_store_size,
-            discount_dt_lst=discount_dates,
-            multiplier=multiplier,
-            base_mean=base_mean,
-            base_std=base_std,
-        )
-
-        discount_flag, curr_holiday = get_discount_flag(curr_date, discount_dates)
-        discount_flags.append(discount_flag)
-        holiday_names.append(curr_holiday)
-        cart_sizes.append(curr_cart_size)
-
     # Build DataFrame
     df = pd.DataFrame(
         {
-            "date": dates,
+            "date": pd.to_datetime(dates),
             "income": income,
             "family_size": family_size,
             "store_location": store_locations,
-            "discount_flag": discount_flags,
+            "discount_flag": sample_discount_flags,
             "holiday": holiday_names,
             "cart_size": cart_sizes,
         }
     )
 
     # print optional stats or graphs to visualize, or to tweak the data
-    if p_stats:
-        mean_all = df["cart_size"].mean()
-        mean_holiday = df.loc[df["discount_flag"] == 1, "cart_size"].mean()
-        mean_normal = df.loc[df["discount_flag"] == 0, "cart_size"].mean()
-        print(f"Overall Mean Cart Size: {mean_all:.2f}")
-        print(f"Median Cart Size: {df['cart_size'].median()}")
-        print(f"Std Dev of Cart Size: {df['cart_size'].std():.2f}")
-
-        print(f"Mean Cart Size (Holiday): {mean_holiday:.2f}")
-        print(f"Mean Cart Size (Normal): {mean_normal:.2f}")
-
-    if p_graphs:
-        # plot the density plot for the overall cart size
-        plt.figure(figsize=(10, 6))
-        sns.kdeplot(df["cart_size"], fill=True)
-
-        # Add mean and median lines
-        plt.axvline(df["cart_size"].mean(), linestyle="--", color="blue", label="Mean")
-        plt.axvline(
-            df["cart_size"].median(), linestyle="-.", color="red", label="Median"
-        )
-
-        # Labels and title
-        plt.xlabel("Cart Size")
-        plt.ylabel("Density")
-        plt.title("Cart Size Distribution")
-        plt.legend()
-        plt.show()
-
-        # plot the density plot for normal days and holidays
-
-        # holiday group
-        holiday_grp = df[df["holiday"] != "Normal Day"]
-        normal_grp = df[df["holiday"] == "Normal Day"]
-
-        # Plot
-        plt.figure(figsize=(10, 6))
-        sns.kdeplot(holiday_grp["cart_size"], label="Holiday", fill=True, color="blue")
-        sns.kdeplot(normal_grp["cart_size"], label="No Holiday", fill=True, color="red")
-
-        # Labels and title
-        plt.xlabel("Cart Size")
-        plt.ylabel("Density")
-        plt.title(
-            "Cart Size Distribution during Holiday vs No Holiday (Discounts may be present)"
-        )
-        plt.legend()
-        plt.tight_layout()
-        plt.show()
+    if p_stats or p_graphs:
+        summary = cart_size_summary(df)
+        if p_stats:
+            print_cart_size_stats(summary)
+        if p_graphs:
+            plot_cart_size_density(summary)
 
     return df
 
@@ -228,7 +473,8 @@ def cart_size_calculator(
                       final value should be.
     :param base_std: Standard deviation for the base mean
     :param discount_dt_lst: Holidays are considered as discounts by default, if additional holidays dates need to be
-                     considered as discounts provide a list of date strings **Must Be Datetime Elements**
+                     considered as discounts provide a list of date strings **Must Be Datetime Elements**, pass
+                     discount_day_set(list) instead when calling it for many dates
     :return: Cart size for the features provided
     """
 
@@ -0,0 +1,182 @@
+"""
+Out-of-core training of the cart size model.
+
+Synthetic rows are generated chunk by chunk with generate_cart_dataset, encoded on the fly against fixed categories
+(no fitting pass over the data) and fed to SGDRegressor.partial_fit, so memory stays at one chunk however many rows
+the model is trained on. Throughput (rows/sec), chunk size in memory and the peak RSS of the process are printed
+after every chunk.
+
+The saved bundle is a plain dict {"model", "feature_columns", "categories", "numeric_scale", "residual_std", ...}
+so the order generator can rebuild the features without importing this script.
+
+Usage: python cart_size_training.py --rows 100000000 --chunk-size 1000000
+The bundle is written to build/cart_size_model.pkl by default, where generate_orders_file's ModelBasketSizes
+provider looks for it.
+"""
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+
+from cart_size_calculator import generate_cart_dataset, holiday_lookup, store_levels
+
+# the pipeline modules live in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from pipeline import peak_rss_mb
+from retail_calendar import holiday_names
+
+numeric_columns = ["family_size", "income", "discount_flag"]
+# fixed divisors that bring the numeric features close to 0..1, SGD needs features on a similar scale
+numeric_scale = {"family_size": 6.0, "income": 100000.0, "discount_flag": 1.0}
+
+
+def cart_categories() -> dict[str, list]:
+    """Every category of the one-hot encoded features, known up front so each chunk encodes to the same columns."""
+    return {
+        # the names the order generator passes (RetailCalendar.holiday_name), not the training lookup's
+        "holiday": holiday_names.tolist(),
+        "store_location": list(store_levels),
+        "month": list(range(1, 13)),
+        "weekday": list(range(7)),
+    }
+
+
+def cart_feature_columns(categories: dict[str, list]) -> list[str]:
+    """Names of the encoded feature columns, in matrix order."""
+    return numeric_columns + [f"{feature}_{value}" for feature, values in categories.items() for value in values]
+
+
+def encode_cart_features(df: pd.DataFrame, categories: dict[str, list], scale: dict[str, float]) -> np.ndarray:
+    """
+    Encodes a cart dataset chunk into the model feature matrix.
+    :param df: Chunk with family_size, income, discount_flag, holiday, store_location and date (or month / weekday).
+    :param categories: Output of cart_categories, unknown categories encode to all zeros.
+    :param scale: Divisor of every numeric column.
+    :return: float32 matrix, columns in cart_feature_columns order
+    """
+    n = len(df)
+    if "month" not in df:
+        df = df.assign(month=df["date"].dt.month, weekday=df["date"].dt.weekday)
+
+    n_features = len(numeric_columns) + sum(len(values) for values in categories.values())
+    features = np.zeros((n, n_features), dtype=np.float32)
+    for col, column in enumerate(numeric_columns):
+        features[:, col] = df[column].to_numpy() / scale[column]
+
+    # one hot, one column block per categorical feature
+    offset = len(numeric_columns)
+    rows = np.arange(n)
+    for feature, values in categories.items():
+        codes = pd.Categorical(df[feature], categories=values).codes
+        known = codes >= 0
+        features[rows[known], offset + codes[known]] = 1
+        offset += len(values)
+
+    return features
+
+
+def generate_cart_chunks(n_rows: int, chunk_size: int, start_dt: str, end_dt: str, seed: int = 42, **kwargs):
+    """
+    Yields cart dataset chunks of chunk_size rows (the last one smaller) until n_rows are generated.
+    Every chunk gets its own seed (seed + chunk number), kwargs are passed to generate_cart_dataset.
+    """
+    for chunk, start in enumerate(range(0, n_rows, chunk_size)):
+        yield generate_cart_dataset(
+            min(chunk_size, n_rows - start), start_dt, end_dt, p_stats=False, p_graphs=False, seed=seed + chunk,
+            **kwargs
+        )
+
+
+def train_cart_size_model(
+        n_rows: int,
+        chunk_size: int = 1_000_000,
+        start_dt: str = "2024-01-01",
+        end_dt: str = "2025-01-01",
+        validation_rows: int = 200_000,
+        seed: int = 42,
+        **kwargs,
+) -> dict:
+    """
+    Trains an SGDRegressor on n_rows generated rows, one chunk at a time.
+
+    :param n_rows: Number of training rows.
+    :param chunk_size: Rows generated, encoded and fitted per step.
+    :param start_dt: Starting date of the dataset.
+    :param end_dt: Ending date of the dataset.
+    :param validation_rows: Rows of a separately seeded chunk used for the metrics and the residual std.
+    :param seed: Seed of the first training chunk, the validation chunk uses seed - 1.
+    :param kwargs: Passed to generate_cart_dataset (multiplier, base_mean, ..).
+    :return: Model bundle dict
+    """
+    categories = cart_categories()
+    unknown_holidays = set(holiday_lookup.values()) - set(categories["holiday"])
+    if unknown_holidays:
+        raise ValueError(f"holiday_lookup names the retail calendar does not know: {sorted(unknown_holidays)}")
+
+    model = SGDRegressor(loss="squared_error", penalty="l2", alpha=1e-6, learning_rate="invscaling", eta0=0.01,
+                         random_state=seed)
+
+    trained_rows = 0
+    train_start = time.perf_counter()
+    for chunk_no, chunk in enumerate(generate_cart_chunks(n_rows, chunk_size, start_dt, end_dt, seed, **kwargs)):
+        fit_start = time.perf_counter()
+        features = encode_cart_features(chunk, categories, numeric_scale)
+        model.partial_fit(features, chunk["cart_size"].to_numpy())
+
+        trained_rows += len(chunk)
+        chunk_mb = (features.nbytes + chunk.memory_usage(deep=True).sum()) / 1024 ** 2
+        print(
+            f"chunk {chunk_no + 1}: {trained_rows:,}/{n_rows:,} rows, "
+            f"{len(chunk) / (time.perf_counter() - fit_start):,.0f} rows/sec encode + fit, "
+            f"{trained_rows / (time.perf_counter() - train_start):,.0f} rows/sec overall, "
+            f"chunk {chunk_mb:,.1f} MB, peak RSS {peak_rss_mb():,.1f} MB"
+        )
+        del chunk, features
+
+    # held out chunk for the metrics and the noise the generator adds on top of predictions
+    validation = generate_cart_dataset(validation_rows, start_dt, end_dt, p_stats=False, p_graphs=False,
+                                       seed=seed - 1, **kwargs)
+    prediction = model.predict(encode_cart_features(validation, categories, numeric_scale))
+    residuals = validation["cart_size"].to_numpy() - prediction
+    print(f"MAE: {np.abs(residuals).mean():.2f}")
+    print(f"RMSE: {np.sqrt((residuals ** 2).mean()):.3f}")
+
+    return {
+        "model": model,
+        "feature_columns": cart_feature_columns(categories),
+        "categories": categories,
+        "numeric_scale": numeric_scale,
+        "residual_std": float(residuals.std()),
+        "trained_rows": trained_rows,
+    }
+
+
+def save_model_bundle(bundle: dict, path) -> None:
+    """Pickles a model bundle."""
+    with open(path, "wb") as file:
+        pickle.dump(bundle, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_model_bundle(path) -> dict:
+    """Loads a model bundle saved by save_model_bundle."""
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the cart size model on streamed synthetic data")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Number of training rows")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Rows per training chunk")
+    parser.add_argument("--out", default=Path(__file__).resolve().parent.parent / "build" / "cart_size_model.pkl",
+                        type=Path, help="Path of the saved model bundle")
+    args = parser.parse_args()
+
+    cart_model = train_cart_size_model(args.rows, chunk_size=args.chunk_size)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    save_model_bundle(cart_model, args.out)
+    print(f"Model saved to {args.out}")
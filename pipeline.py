@@ -0,0 +1,370 @@
+"""
+Runs the table generation stages as a DAG.
+
+Every stage declares the files it reads (inputs) and writes (outputs), a stage depends on the stages producing its
+inputs. Stages whose dependencies are done run in parallel on a process pool. Every stage gets a fresh worker process
+(max_tasks_per_child=1), so its peak RSS is its own and memory is handed back to the OS when it finishes.
+
+Wall time, peak RSS and output size of every stage are reported at the end of the run.
+
+Outputs are written with the compression given to run_pipeline (compressed_io), inputs are read whatever their
+compression.
+
+Rebuilds are incremental: a manifest in the output directory records, for every stage, a fingerprint of everything
+its outputs depend on (seed, source of the project functions it reaches, project_data sections it reads, hashes of
+its input files) and the content hash of every output. A stage whose fingerprint and outputs are unchanged is skipped.
+"""
+import hashlib
+import inspect
+import json
+import sys
+import time
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+import project_data
+from compressed_io import find_output, output_path, set_output_compression
+from dataset_registry import flush_writes
+from table_cache import code_members, code_names, project_callees
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+project_dir = Path(__file__).resolve().parent
+manifest_name = "pipeline_manifest.json"
+
+
+class Stage:
+    """One table building step of the pipeline."""
+
+    def __init__(self, name: str, func, inputs=(), outputs=(), seed=None):
+        """
+        :param name: Stage name, used by --only / --from.
+        :param func: Module level function (picklable) that reads the inputs and writes the outputs.
+        :param inputs: File names the stage reads.
+        :param outputs: File names the stage writes.
+        :param seed: Seed of the stage's random draws, part of its fingerprint.
+        """
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.seed = seed
+
+
+# ---- Fingerprints ----
+def sha256_file(path: Path, block_size: int = 1024 * 1024) -> str:
+    """sha256 of a file, read in blocks so multi GB outputs are not loaded at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_record(path: Path, known: dict | None = None) -> dict:
+    """
+    Content hash, size and mtime of a file.
+    :param known: Previous record of the file, its hash is reused when size and mtime are unchanged.
+    """
+    stat = path.stat()
+    if known and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+        return known
+    return {"sha256": sha256_file(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def canonical_repr(value) -> str:
+    """repr that does not depend on set ordering, so the same data always hashes the same between processes."""
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{canonical_repr(k)}: {canonical_repr(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(canonical_repr(v) for v in value)) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(canonical_repr(v) for v in value) + "]"
+    if isinstance(value, np.ndarray):
+        return f"ndarray({value.dtype}, {value.shape}, {hashlib.sha256(value.tobytes()).hexdigest()})"
+    if inspect.isfunction(value):
+        # the default repr holds the address of the function
+        try:
+            return f"function({hash_text(inspect.getsource(value))})"
+        except OSError:
+            return f"function({value.__module__}.{value.__qualname__})"
+    return repr(value)
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def stage_dependencies_of_code(func) -> dict:
+    """
+    Walks every project function and class reachable from func through global names (table_cache.project_callees,
+    the same walk as the table cache keys).
+    :return: Dict with the hashed "code" (source by qualified name), the hashed project_data "sections" and the
+        module level "values" (constants like dates or seeds) it reads
+    """
+    sources, sections, values = {}, {}, {}
+    data_names = {name for name, value in vars(project_data).items()
+                  if not name.startswith("_") and not callable(value) and not isinstance(value, types.ModuleType)}
+
+    for obj in project_callees(func):
+        sources[f"{obj.__module__}.{obj.__qualname__}"] = hash_text(inspect.getsource(obj))
+
+        for member in code_members(obj):
+            for name in code_names(member.__code__):
+                if name in data_names:
+                    sections[name] = hash_text(canonical_repr(getattr(project_data, name)))
+                # private globals are caches, project_data names imported into other modules are already sections
+                if name not in member.__globals__ or name.startswith("_") or name in sections:
+                    continue
+
+                target = member.__globals__[name]
+                if inspect.isfunction(inspect.unwrap(target)) or inspect.isclass(target):
+                    continue  # walked by project_callees
+                if isinstance(target, Path) and target.is_file() and target.suffix != ".py":
+                    # files outside the pipeline, e.g. the trained cart size model (sources are hashed above)
+                    values[f"{member.__module__}.{name}"] = sha256_file(target)
+                elif isinstance(target, (int, float, str, date, Path, tuple, list, dict, set, np.ndarray)):
+                    values[f"{member.__module__}.{name}"] = hash_text(canonical_repr(target))
+
+    return {"code": sources, "sections": sections, "values": values}
+
+
+def stage_fingerprint(stage: Stage, out_dir: Path, known_files: dict, compression: str | None = None) -> dict:
+    """
+    Everything the outputs of a stage depend on.
+    :param known_files: File records of the manifest, reused for unchanged input files.
+    :param compression: Output compression.
+    :return: Dict of hashed parts, plus their combined "fingerprint"
+    """
+    input_paths = [find_output(out_dir / i) for i in stage.inputs]
+    parts = {
+        "seed": stage.seed,
+        "compression": compression,
+        **stage_dependencies_of_code(stage.func),
+        "inputs": {path.name: file_record(path, known_files.get(path.name))["sha256"] for path in input_paths},
+    }
+    parts["fingerprint"] = hash_text(json.dumps(parts, sort_keys=True, default=str))
+    return parts
+
+
+def changed_parts(old: dict, new: dict) -> list[str]:
+    """Names of the fingerprint parts that differ, e.g. ["sections.product_markup", "inputs.StarMart_Products.csv"]."""
+    changed = []
+    for part in ("seed", "compression", "code", "sections", "values", "inputs"):
+        old_part, new_part = old.get(part), new.get(part)
+        if isinstance(new_part, dict) and isinstance(old_part, dict):
+            changed += [f"{part}.{key}" for key in sorted(set(old_part) | set(new_part))
+                        if old_part.get(key) != new_part.get(key)]
+        elif old_part != new_part:
+            changed.append(part)
+    return changed
+
+
+def load_manifest(manifest_path: Path) -> dict:
+    if manifest_path.exists():
+        return json.loads(manifest_path.read_text())
+    return {"stages": {}, "files": {}}
+
+
+def save_manifest(manifest: dict, manifest_path: Path) -> None:
+    """Writes the manifest atomically, an interrupted run keeps the records of the stages it finished."""
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    tmp_path.replace(manifest_path)
+
+
+def stage_is_current(stage: Stage, fingerprint: dict, manifest: dict, out_dir: Path) -> bool:
+    """True if the stage was built with the same fingerprint and its outputs have not been touched since."""
+    record = manifest["stages"].get(stage.name)
+    if record is None or record["fingerprint"]["fingerprint"] != fingerprint["fingerprint"]:
+        return False
+
+    for output in stage.outputs:
+        path = output_path(out_dir / output)
+        known = manifest["files"].get(path.name)
+        if not path.exists() or known is None or file_record(path, known)["sha256"] != known["sha256"]:
+            return False
+    return True
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of the current process in MB, NaN where the resource module is missing (Windows)."""
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_stage(stage: Stage, out_dir: Path, compression: str | None = None) -> dict:
+    """
+    Runs one stage in the current (worker) process and hashes its outputs there, in parallel with the other stages.
+    The CSV writes the stage queued in the dataset registry are finished first, they are part of the stage's time.
+    :param compression: Output compression, set in the worker as it does not inherit the parent's module state.
+    :return: Stage stats, wall_s, peak_rss_mb, output_mb and the "files" records of the outputs
+    """
+    set_output_compression(compression)
+    start = time.perf_counter()
+    stage.func()
+    flush_writes()
+    wall_s = time.perf_counter() - start
+
+    paths = [output_path(out_dir / output) for output in stage.outputs]
+    files = {path.name: file_record(path) for path in paths if path.exists()}
+    output_bytes = sum(record["size"] for record in files.values())
+    return {"wall_s": wall_s, "peak_rss_mb": peak_rss_mb(), "output_mb": output_bytes / 1024 ** 2, "files": files}
+
+
+def stage_dependencies(stages: list[Stage]) -> dict[str, set[str]]:
+    """
+    Maps every stage name to the names of the stages producing its inputs.
+    Raises ValueError if two stages write the same file.
+    """
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            if output in producers:
+                raise ValueError(f"{output} is written by both {producers[output]} and {stage.name}")
+            producers[output] = stage.name
+
+    return {stage.name: {producers[i] for i in stage.inputs if i in producers} for stage in stages}
+
+
+def select_stages(stages: list[Stage], only=None, start_from=None) -> list[Stage]:
+    """
+    Picks the stages of a partial run.
+    :param only: Stage names to run, nothing else.
+    :param start_from: Stage name, runs it and every stage downstream of it.
+    :return: Selected stages in declaration order, all of them if neither option is given.
+    """
+    names = {stage.name for stage in stages}
+    unknown = (set(only or ()) | ({start_from} if start_from else set())) - names
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}, available: {', '.join(sorted(names))}")
+
+    selected = set(only) if only else set(names)
+    if start_from:
+        deps = stage_dependencies(stages)
+        downstream = {start_from}
+        changed = True
+        while changed:
+            new = {name for name, stage_deps in deps.items() if stage_deps & downstream} - downstream
+            downstream |= new
+            changed = bool(new)
+        selected &= downstream
+
+    return [stage for stage in stages if stage.name in selected]
+
+
+def print_report(results: dict[str, dict], total_s: float) -> None:
+    """Prints the stats of every stage."""
+    print(f"\n{'stage':<22}{'status':>9}{'wall s':>10}{'peak RSS MB':>14}{'output MB':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:<22}{result['status']:>9}{result.get('wall_s', float('nan')):>10.1f}"
+            f"{result.get('peak_rss_mb', float('nan')):>14.1f}{result.get('output_mb', float('nan')):>12.1f}"
+        )
+    print(f"Total wall time: {total_s:.1f} s")
+
+
+def run_pipeline(stages: list[Stage], out_dir: Path, max_workers: int | None = None, only=None,
+                 start_from=None, force: bool = False, compression: str | None = None,
+                 prepare=None) -> dict[str, dict]:
+    """
+    Runs the selected stages, each as soon as the stages it depends on are done.
+
+    Dependencies outside the selection are taken from the files already in out_dir. When a stage fails, the stages
+    depending on it are skipped, the independent ones still run, and a RuntimeError is raised after the report.
+    Stages that are current according to the manifest are not run (status "cached").
+
+    :param stages: Every stage of the pipeline.
+    :param out_dir: Directory of the input / output files.
+    :param max_workers: Size of the process pool, os.cpu_count() by default.
+    :param only: See select_stages.
+    :param start_from: See select_stages.
+    :param force: Run the selected stages even if they are current.
+    :param compression: Compression of the outputs, None, "gzip" or "zstd".
+    :param prepare: Function called once in this process before any stage is submitted, builds the state shared by
+        the stages (artifacts, table caches) so the workers find it instead of racing to build it.
+    :return: Stats of every selected stage by name
+    """
+    set_output_compression(compression)
+    selected = select_stages(stages, only, start_from)
+    selected_names = {stage.name for stage in selected}
+    deps = {name: stage_deps & selected_names for name, stage_deps in stage_dependencies(stages).items()}
+
+    # inputs that nothing in this run produces must already exist
+    produced = {output for stage in selected for output in stage.outputs}
+    missing = {i for stage in selected for i in stage.inputs
+               if i not in produced and not find_output(out_dir / i).exists()}
+    if missing:
+        raise FileNotFoundError(f"Missing inputs in {out_dir}: {', '.join(sorted(missing))}, run their stages first")
+
+    if prepare is not None:
+        prepare()
+
+    manifest_path = out_dir / manifest_name
+    manifest = load_manifest(manifest_path)
+    pending = {stage.name: stage for stage in selected}
+    fingerprints = {}
+    results = {}
+    running = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(results.get(dep, {}).get("status") in ("failed", "skipped") for dep in deps[name]):
+                    results[name] = {"status": "skipped"}
+                    del pending[name]
+                elif all(results.get(dep, {}).get("status") in ("done", "cached") for dep in deps[name]):
+                    # fingerprint once the inputs are final
+                    fingerprints[name] = stage_fingerprint(stage, out_dir, manifest["files"], compression)
+                    del pending[name]
+                    if not force and stage_is_current(stage, fingerprints[name], manifest, out_dir):
+                        results[name] = {"status": "cached"}
+                        print(f"[{time.perf_counter() - start:7.1f}s] {name} is up to date")
+                        continue
+
+                    previous = manifest["stages"].get(name)
+                    if force:
+                        reason = "forced"
+                    elif previous is None:
+                        reason = "first build"
+                    else:
+                        changed = changed_parts(previous["fingerprint"], fingerprints[name])
+                        reason = ", ".join(changed) or "outputs changed"
+                    print(f"[{time.perf_counter() - start:7.1f}s] start {name} ({reason})")
+                    running[pool.submit(run_stage, stage, out_dir, compression)] = name
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between stages: {', '.join(sorted(pending))}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = {"status": "done", **future.result()}
+                    print(f"[{time.perf_counter() - start:7.1f}s] done  {name} ({results[name]['wall_s']:.1f} s)")
+
+                    manifest["files"].update(results[name].pop("files"))
+                    manifest["stages"][name] = {"fingerprint": fingerprints[name]}
+                    save_manifest(manifest, manifest_path)
+                except Exception as error:
+                    results[name] = {"status": "failed"}
+                    print(f"[{time.perf_counter() - start:7.1f}s] {name} failed: {error!r}")
+
+    print_report({stage.name: results[stage.name] for stage in selected}, time.perf_counter() - start)
+
+    failed = [name for name, result in results.items() if result["status"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Stages failed: {', '.join(failed)}")
+    return results
@@ -2118,12 +2118,14 @@ holiday_discount_items = {
 }
 
 # Data for basket_size script
-# Holiday Discounts and Impacts
+# Holiday Discounts and Impacts: name -> ((month, day), days of high traffic before the holiday)
+# Dates of moving holidays (Thanksgiving, Superbowl, Easter, Labor/Mother's/Father's/Memorial Day) are the 2024 ones,
+# retail_calendar.moving_holidays computes them for every other year
 holiday_date_ranges = {
     "Thanksgiving & Black Friday": ((11, 28), 7),
     "Superbowl": ((2, 11), 3),
     "Christmas": ((12, 25), 14),
-    "Easter": ((3, 31), 7),  # fixed for simplicity
+    "Easter": ((3, 31), 7),
     "Halloween": ((10, 31), 7),
     "Independence Day": ((7, 4), 7),
     "Valentine's Day": ((2, 14), 7),
@@ -2900,34 +2902,6 @@ holiday_weights = {
     ],
 }
 
-# Quick lookup dicts and sets for faster compilation
+# Year range of the retail calendar, retail_calendar.py builds the per-day holiday lookups for it
 r_start_year = 2020
 r_end_year = 2025
-
-holiday_lookup = {}          # {datetime: holiday name}
-high_traffic_periods = set()  # set of dates (datetime objects)
-
-for r_year in range(r_start_year, r_end_year + 1):
-    for r_name, ((r_month, r_day), duration) in holiday_date_ranges.items():
-        r_date = datetime(r_year, r_month, r_day)
-
-        # Main + pre-holiday (duration days before)
-        for r_i in range(duration + 1):
-            d = r_date - timedelta(days=r_i)
-            high_traffic_periods.add(d)
-            holiday_lookup[d] = r_name
-
-        # Post-holiday period (3 days after)
-        for r_i in range(1, 4):
-            d = r_date + timedelta(days=r_i)
-            high_traffic_periods.add(d)
-            holiday_lookup[d] = r_name
-
-holiday_lookup_dates = list(holiday_lookup.keys())
-
-holiday_restock_dates = []
-for r_year in range(r_start_year, r_end_year + 1):
-    for _, ((r_month, r_day), duration) in holiday_date_ranges.items():
-        r_end_date = datetime(r_year, r_month, r_day)
-        r_start_date = r_end_date - timedelta(days=duration - 1)
-        holiday_restock_dates.append(r_start_date)
@@ -0,0 +1,146 @@
+import numpy as np
+
+from retail_calendar import RetailCalendar
+
+
+def holiday_days(first_day: int, last_day: int) -> np.ndarray:
+    """
+    Holiday mask of a day range.
+    :param first_day: First day ordinal (days since 1970-01-01).
+    :param last_day: Last day ordinal (exclusive).
+    :return: Boolean array, True on days inside a holiday window of the retail calendar.
+    """
+    years = np.array([first_day, last_day - 1]).astype("datetime64[D]").astype("datetime64[Y]").astype(int) + 1970
+    retail_cal = RetailCalendar(int(years[0]), int(years[1]))
+    return retail_cal.holiday_code[retail_cal.day_index(np.arange(first_day, last_day).astype("datetime64[D]"))] > 0
+
+
+def trailing_mean(values: np.ndarray, observed: np.ndarray, window: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise mean of the `window` observed columns before each column, for one extra column past the end.
+    :param values: rows x columns values, ignored where observed is False.
+    :param observed: rows x columns mask of the columns that have data.
+    :param window: Number of previous columns to average, per row (rows x 1).
+    :return: Tuple of (rows x columns + 1 means, rows x columns + 1 number of observed columns in the window)
+    """
+    n_rows, n_cols = values.shape
+    zeros = np.zeros((n_rows, 1))
+    value_sum = np.concatenate([zeros, np.cumsum(np.where(observed, values, 0), axis=1)], axis=1)
+    count_sum = np.concatenate([zeros, np.cumsum(observed, axis=1)], axis=1)
+
+    cols = np.arange(n_cols + 1)
+    lo = np.maximum(cols[None, :] - window, 0)
+    total = value_sum - np.take_along_axis(value_sum, lo, axis=1)
+    count = count_sum - np.take_along_axis(count_sum, lo, axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, 0.0), count
+
+
+def forecast_restock_quantities(demand: np.ndarray,
+                                period_days: np.ndarray,
+                                anchor_day: np.ndarray,
+                                end_day: np.datetime64,
+                                safety_pct: np.ndarray,
+                                history_days: int = 28) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Forecasts the restock quantity of every product for every restock period, all products at once.
+
+    demand[p, k] is the quantity of product p sold in its period k, which covers period_days[p] days from
+    anchor_day[p] + k * period_days[p]. This is a backfill of the restocks of a generated sales history, not a causal
+    forecast: the seasonal factors and the warm-up rate are fitted once on the whole history, only the level of each
+    period comes from the periods before it.
+    1) Daily sales rates are normalised by the product's mean rate (whole history).
+    2) Holiday uplift is the extra normalised rate of periods overlapping retail calendar holidays, scaled by the share
+       of holiday days in the period (whole history, all products).
+    3) Month seasonality is the mean normalised rate per calendar month once the holiday effect is removed (whole
+       history, all products).
+    4) The deseasonalised rate is averaged over the previous ~history_days and multiplied back by the period's
+       month and holiday factors, its length and the safety stock percentage.
+
+    The first period of a product has no previous periods (warm-up): it gets the product's mean rate times the
+    period's month and holiday factors. That mean includes the first period's sales among all the others, it is
+    not the period's own sales.
+
+    :param demand: products x periods quantities sold.
+    :param period_days: Restock period length of every product (days).
+    :param anchor_day: Start of period 0 of every product (datetime64[D]).
+    :param end_day: End of the observed sales (exclusive, datetime64[D]).
+    :param safety_pct: Extra stock on top of the forecast, per product (%).
+    :param history_days: Days of history the trailing mean covers.
+    :return: Tuple of products x (periods + 1) restock quantities (0 past the first period after end_day) and the
+        period start dates (datetime64[D]); the extra column holds the first period after the sales
+    """
+    n_products, n_periods = demand.shape
+    cols = np.arange(n_periods + 1)
+
+    # calendar of every distinct (anchor, period length) schedule, products share the rows of their schedule
+    anchor = anchor_day.astype("datetime64[D]").astype(np.int64)
+    schedules, schedule_idx = np.unique(
+        np.stack([anchor, period_days.astype(np.int64)], axis=1), axis=0, return_inverse=True
+    )
+    schedule_idx = schedule_idx.ravel()
+    schedule_days = schedules[:, 1:]
+
+    start = schedules[:, :1] + cols[None, :] * schedule_days
+    end = np.datetime64(end_day, "D").astype(np.int64)
+    schedule_covered = np.clip(np.minimum(start + schedule_days, end) - start, 0, None)
+
+    # share of holiday days and middle month of every period
+    first_day = start.min()
+    holidays = holiday_days(first_day, start.max() + schedule_days.max() + 1)
+    holiday_cum = np.concatenate([[0], np.cumsum(holidays)])
+    schedule_holiday = (holiday_cum[start + schedule_days - first_day] - holiday_cum[start - first_day]) / schedule_days
+    schedule_month = (start + schedule_days // 2).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12
+
+    period_days = schedule_days[schedule_idx]
+    covered = schedule_covered[schedule_idx]
+    holiday_share = schedule_holiday[schedule_idx]
+    month = schedule_month[schedule_idx]
+
+    # observed daily rates, normalised per product
+    observed = covered[:, :n_periods] > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(observed, demand / covered[:, :n_periods], np.nan)
+        product_rate = demand.sum(axis=1) / covered[:, :n_periods].sum(axis=1)
+        norm = rate / product_rate[:, None]
+    valid = np.isfinite(norm)
+
+    # holiday uplift
+    h = holiday_share[:, :n_periods]
+    holiday_periods = valid & (h > 0)
+    normal_periods = valid & (h == 0)
+    uplift = 0.0
+    if holiday_periods.any() and normal_periods.any():
+        uplift = (norm[holiday_periods].mean() / norm[normal_periods].mean() - 1) / h[holiday_periods].mean()
+    holiday_factor = np.maximum(1 + uplift * holiday_share, 0.1)
+
+    # month seasonality
+    m = month[:, :n_periods][valid]
+    adjusted = (norm / holiday_factor[:, :n_periods])[valid]
+    month_count = np.bincount(m, minlength=12)
+    month_factor = np.ones(12)
+    seen = month_count > 0
+    if seen.any():
+        month_factor[seen] = np.bincount(m, weights=adjusted, minlength=12)[seen] / month_count[seen]
+        month_factor[seen] /= month_factor[seen].mean()
+    month_factor = np.maximum(month_factor, 0.1)
+
+    seasonal = month_factor[month] * holiday_factor
+
+    # deseasonalised rate averaged over the previous periods
+    base = np.where(observed, np.nan_to_num(rate) / seasonal[:, :n_periods], 0.0)
+    window = np.maximum(1, -(-history_days // period_days))
+    baseline, history = trailing_mean(base, observed, window)
+
+    # no history yet, the deseasonalised rate of the seasonal baseline is the product's mean rate
+    warm_up = np.nan_to_num(product_rate)[:, None]
+    baseline = np.where(history > 0, baseline, warm_up)
+
+    restock_qty = np.ceil(baseline * seasonal * period_days * (1 + safety_pct[:, None] / 100)).astype(np.int64)
+
+    # forecast every period that starts before the end of the sales, plus the one after it
+    next_period = -(-(end - schedules[:, 0]) // schedules[:, 1])
+    restock_qty[cols[None, :] > next_period[schedule_idx, None]] = 0
+
+    return restock_qty, start[schedule_idx].astype("datetime64[D]")
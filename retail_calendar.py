@@ -0,0 +1,141 @@
+"""
+Day-ordinal retail calendar.
+
+Every attribute the generators look up per date (holiday, discount flag, season, weekday, month, restock flag) is
+precomputed once for a year range into NumPy arrays indexed by day: index = day ordinal (days since 1970-01-01) minus
+the ordinal of the first day of the range. Batch code converts its dates with day_index() and indexes the arrays
+instead of hashing Python datetimes into dicts and sets.
+
+Holiday windows come from holiday_date_ranges in project_data.py. Holidays that move every year (Easter,
+Thanksgiving, the Monday / Sunday holidays) are computed per year by moving_holidays, so any year range is supported.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from project_data import holiday_date_ranges
+
+# Code 0 is a normal day, holiday codes follow the order of holiday_date_ranges
+holiday_names = np.array(["Normal Day", *holiday_date_ranges])
+season_names = np.array(["Winter", "Spring", "Summer", "Fall"])
+month_season = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)  # season code of months 1..12
+
+post_holiday_days = 3  # high traffic days after every holiday
+
+
+def easter_date(year: int) -> date:
+    """Easter Sunday of a Gregorian year (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """
+    Date of the n-th given weekday of a month.
+    :param weekday: Monday = 0 .. Sunday = 6.
+    :param n: 1 for the first, 2 for the second, .. -1 for the last.
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7 + 7 * (-n - 1))
+
+
+# Holidays without a fixed date, by holiday_date_ranges name
+moving_holidays = {
+    "Thanksgiving & Black Friday": lambda year: nth_weekday(year, 11, 3, 4),  # 4th Thursday of November
+    "Superbowl": lambda year: nth_weekday(year, 2, 6, 2),  # 2nd Sunday of February
+    "Easter": easter_date,
+    "Labor Day": lambda year: nth_weekday(year, 9, 0, 1),  # 1st Monday of September
+    "Mother's Day": lambda year: nth_weekday(year, 5, 6, 2),  # 2nd Sunday of May
+    "Father's Day": lambda year: nth_weekday(year, 6, 6, 3),  # 3rd Sunday of June
+    "Memorial Day": lambda year: nth_weekday(year, 5, 0, -1),  # last Monday of May
+}
+
+
+def holiday_date(name: str, year: int) -> date:
+    """Date of a holiday of holiday_date_ranges in a year, computed for moving holidays."""
+    if name in moving_holidays:
+        return moving_holidays[name](year)
+    (month, day), _ = holiday_date_ranges[name]
+    return date(year, month, day)
+
+
+def to_day_ordinal(dates) -> np.ndarray | np.int64:
+    """Converts a date, datetime, datetime64 or an array of them to day ordinals (days since 1970-01-01)."""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+class RetailCalendar:
+    """
+    Per-day arrays of a year range, all indexed by day_index():
+    holiday_code: index into holiday_names, 0 on normal days
+    discount_flag: 1 on holidays and on the extra discount dates
+    season: index into season_names
+    weekday: Monday = 0 .. Sunday = 6
+    month: 1 .. 12
+    restock_flag: True on the first day of the main window of every holiday (restock before the rush)
+    """
+
+    def __init__(self, start_year: int, end_year: int, discount_dates=()):
+        """
+        :param start_year: First year of the calendar.
+        :param end_year: Last year of the calendar (inclusive).
+        :param discount_dates: Non-holiday dates with a discount.
+        """
+        self.dates = np.arange(np.datetime64(f"{start_year}-01-01"), np.datetime64(f"{end_year + 1}-01-01"))
+        self.first_day = self.dates[0].astype(np.int64)
+        n_days = len(self.dates)
+
+        # the holiday windows of the neighbouring years can spill into the range (New Year starts in December)
+        self.holiday_code = np.zeros(n_days, dtype=np.int8)
+        self.restock_flag = np.zeros(n_days, dtype=bool)
+        for year in range(start_year - 1, end_year + 2):
+            for code, (name, (_, duration)) in enumerate(holiday_date_ranges.items(), start=1):
+                day = to_day_ordinal(holiday_date(name, year)) - self.first_day
+                # duration days before the holiday to post_holiday_days after, later holidays win overlaps
+                lo, hi = max(day - duration, 0), min(day + post_holiday_days + 1, n_days)
+                if lo < hi:
+                    self.holiday_code[lo:hi] = code
+                restock_day = day - (duration - 1)
+                if 0 <= restock_day < n_days:
+                    self.restock_flag[restock_day] = True
+
+        discount_idx = to_day_ordinal(list(discount_dates)) - self.first_day
+        self.discount_flag = (self.holiday_code > 0).astype(np.int8)
+        self.discount_flag[discount_idx[(discount_idx >= 0) & (discount_idx < n_days)]] = 1
+
+        months = self.dates.astype("datetime64[M]").astype(np.int64) % 12
+        self.month = (months + 1).astype(np.int8)
+        self.season = month_season[months]
+        self.weekday = ((self.dates.astype(np.int64) + 3) % 7).astype(np.int8)  # 1970-01-01 was a Thursday
+
+    def day_index(self, dates) -> np.ndarray | np.int64:
+        """
+        Converts dates to indices into the calendar arrays.
+        :param dates: date, datetime, datetime64 or an array of them.
+        :return: Index or array of indices.
+        """
+        idx = to_day_ordinal(dates) - self.first_day
+        if np.any((idx < 0) | (idx >= len(self.dates))):
+            raise ValueError(f"Dates outside the calendar range {self.dates[0]} .. {self.dates[-1]}")
+        return idx
+
+    def holiday_name(self, dates):
+        """Holiday name(s) of dates, "Normal Day" outside holiday windows."""
+        return holiday_names[self.holiday_code[self.day_index(dates)]]
+
+    def season_name(self, dates):
+        """Season name(s) of dates."""
+        return season_names[self.season[self.day_index(dates)]]
@@ -1,42 +1,39 @@
 # import pandas as pd
+import argparse
+import io
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 import csv
 from pathlib import Path
 
+from compressed_io import open_input
+
 base_dir = Path(
     r"C:\Users\shrav\OneDrive\Desktop\All Projects\Project StarMart\Datasets"
 )
+create_statements_path = Path(__file__).resolve().parent / "Sql_Files" / "StarMart_Create_Statements.sql"
 
 
-def load_csv_batched(connection_params, table_name, csv_filepath, batch_size=50000):
-    """Load csv file to postgres with batches"""
-    conn = psycopg2.connect(**connection_params)
-    cursor = conn.cursor()
-    print("Current Table:", table_name)
-
+def insert_csv_batched(conn, table_name, csv_filepath, batch_size=50000):
+    """
+    Inserts a csv file with executemany, committing every batch.
+    :return: Number of rows inserted
+    """
     total_records = 0  # Record tracker
 
-    try:
-        with open(csv_filepath, "r", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            header = next(reader)
-            data = []
-            for row in reader:
-                row = [val for val in row]
-                data.append(tuple(row))
-
-                if len(data) == batch_size:
-                    sql = f"INSERT INTO {table_name} ({', '.join(header)}) VALUES ({', '.join(['%s'] * len(header))})"
-                    cursor.executemany(sql, data)
-                    conn.commit()
-                    total_records += len(data)
-
-                    if total_records % batch_size == 0:
-                        print(f"Inserted {total_records} records...")
-
-                    data = []  # Clear the list after every dump
-
-            if data:  # If anything is remaining
+    with conn.cursor() as cursor, open_input(csv_filepath) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        data = []
+        for row in reader:
+            row = [val for val in row]
+            data.append(tuple(row))
+
+            if len(data) == batch_size:
                 sql = f"INSERT INTO {table_name} ({', '.join(header)}) VALUES ({', '.join(['%s'] * len(header))})"
                 cursor.executemany(sql, data)
                 conn.commit()
@@ -45,16 +42,314 @@ def load_csv_batched(connection_params, table_name, csv_filepath, batch_size=500
                 if total_records % batch_size == 0:
                     print(f"Inserted {total_records} records...")
 
-            print(f"Successfully loaded {total_records} records into {table_name}\n")
+                data = []  # Clear the list after every dump
+
+        if data:  # If anything is remaining
+            sql = f"INSERT INTO {table_name} ({', '.join(header)}) VALUES ({', '.join(['%s'] * len(header))})"
+            cursor.executemany(sql, data)
+            conn.commit()
+            total_records += len(data)
+
+    return total_records
+
+
+def load_csv_batched(connection_params, table_name, csv_filepath, batch_size=50000):
+    """Load csv file to postgres with batches, the csv can be plain, .gz or .zst compressed"""
+    conn = psycopg2.connect(**connection_params)
+    print("Current Table:", table_name)
+    start = time.perf_counter()
+
+    try:
+        total_records = insert_csv_batched(conn, table_name, csv_filepath, batch_size)
+        print_load_rate(table_name, total_records, time.perf_counter() - start)
+
+    except psycopg2.DatabaseError as error:
+        print(f"Error while loading data: {error}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+# ---- COPY loader ----
+# COPY ... FROM STDIN streams the csv text to the server, which parses it itself: no per row Python tuples, no
+# INSERT statements, one transaction per table.
+class ChunkStream(io.TextIOBase):
+    """Read-only text file over an iterable of csv text chunks, so a generator can be copied without a file."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        text, self.buffer = self.buffer[:size], self.buffer[size:]
+        return text
+
+    def readline(self, size: int = -1) -> str:
+        while "\n" not in self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        end = self.buffer.find("\n") + 1 or len(self.buffer)
+        return self.read(end if size < 0 else min(size, end))
+
+
+def copy_csv_stream(conn, table_name, stream, chunk_size=8 * 1024 * 1024):
+    """
+    Copies csv text into a table with COPY FROM STDIN, inside the connection's current transaction.
+    :param conn: psycopg2 connection.
+    :param table_name: Target table.
+    :param stream: Text stream whose first line is the csv header (column names of the table).
+    :param chunk_size: Characters read from the stream and sent to the server per round trip.
+    :return: Number of rows copied
+    """
+    # the header gives the column list, so the csv column order does not have to match the table
+    header = next(csv.reader([stream.readline()]))
+    sql = f"COPY {table_name} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv)"
+    with conn.cursor() as cursor:
+        cursor.copy_expert(sql, stream, size=chunk_size)
+        return cursor.rowcount
+
+
+def copy_csv_file(conn, table_name, csv_filepath, chunk_size=8 * 1024 * 1024):
+    """Copies a csv file (plain, .gz or .zst) with COPY FROM STDIN, the caller commits. Returns the rows copied."""
+    with open_input(csv_filepath) as f:
+        return copy_csv_stream(conn, table_name, f, chunk_size)
+
+
+def print_load_rate(table_name, total_records, seconds):
+    print(f"Successfully loaded {total_records} records into {table_name} "
+          f"in {seconds:.1f} s ({total_records / max(seconds, 1e-9):,.0f} rows/sec)\n")
+
+
+def load_csv_copy(connection_params, table_name, csv_filepath, chunk_size=8 * 1024 * 1024):
+    """
+    Load csv file (plain, .gz or .zst) to postgres with COPY, streamed from disk and committed once.
+    :param chunk_size: Characters sent to the server per round trip.
+    :return: Number of rows loaded
+    """
+    conn = psycopg2.connect(**connection_params)
+    print("Current Table:", table_name)
+    start = time.perf_counter()
+
+    try:
+        total_records = copy_csv_file(conn, table_name, csv_filepath, chunk_size)
+        conn.commit()
+        print_load_rate(table_name, total_records, time.perf_counter() - start)
+        return total_records
+    except psycopg2.DatabaseError as error:
+        print(f"Error while loading data: {error}")
+        conn.rollback()
+        return 0
+    finally:
+        conn.close()
+
 
+def load_chunks_copy(connection_params, table_name, chunks, chunk_size=8 * 1024 * 1024):
+    """
+    Load csv text produced by a generator (header first, e.g. OrderLineBatch.to_csv_text batches) with COPY,
+    without writing a file.
+    :return: Number of rows loaded
+    """
+    conn = psycopg2.connect(**connection_params)
+    start = time.perf_counter()
+
+    try:
+        total_records = copy_csv_stream(conn, table_name, ChunkStream(chunks), chunk_size)
+        conn.commit()
+        print_load_rate(table_name, total_records, time.perf_counter() - start)
+        return total_records
     except psycopg2.DatabaseError as error:
         print(f"Error while loading data: {error}")
         conn.rollback()
+        return 0
     finally:
-        cursor.close()
         conn.close()
 
 
+def benchmark_loaders(connection_params, table_name, csv_filepath, batch_size=50000, chunk_size=8 * 1024 * 1024):
+    """
+    Loads one csv with the executemany and the COPY path into an empty copy of table_name and prints rows/sec.
+    The copy is created with CREATE TABLE .. (LIKE ..) and dropped afterwards, the real table is not touched.
+    """
+    bench_table = f"{table_name}_load_benchmark"
+    conn = psycopg2.connect(**connection_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {bench_table}")
+            cursor.execute(f"CREATE TABLE {bench_table} (LIKE {table_name} INCLUDING DEFAULTS)")
+        conn.commit()
+
+        rates = {}
+        for mode in ("insert", "copy"):
+            start = time.perf_counter()
+            if mode == "insert":
+                load_csv_batched(connection_params, bench_table, csv_filepath, batch_size)
+            else:
+                load_csv_copy(connection_params, bench_table, csv_filepath, chunk_size)
+            seconds = time.perf_counter() - start
+
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {bench_table}")
+                rows = cursor.fetchone()[0]
+                cursor.execute(f"TRUNCATE {bench_table}")
+            conn.commit()
+            rates[mode] = rows / max(seconds, 1e-9)
+            print(f"{mode:>6}: {rows} rows in {seconds:.1f} s, {rates[mode]:,.0f} rows/sec")
+
+        print(f"COPY is {rates['copy'] / max(rates['insert'], 1e-9):.1f}x faster than executemany")
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {bench_table}")
+        conn.commit()
+        conn.close()
+
+
+# ---- Foreign key ordered, concurrent loading ----
+# Tables read or written by the triggers of StarMart_Triggers.sql, by the table whose inserts fire them. Inserting
+# an order runs current_day_tracker -> scheduled_restock_and_cleanup -> restock_and_cleanup and inventory_updater,
+# so the orders are loaded after everything those functions touch, not only after the tables of their foreign keys.
+trigger_dependencies = {
+    "starmart_orders": {
+        "starmart_current_date",
+        "starmart_restock_dates",
+        "starmart_inventory_lookup",
+        "starmart_products",
+        "starmart_vendors",
+        "starmart_inventory",
+        "starmart_inventory_log",
+    },
+}
+
+
+def foreign_key_graph(sql_path=create_statements_path):
+    """
+    Parses the CREATE TABLE / ALTER TABLE statements of a sql file.
+    :return: Dict of table name -> set of the tables its foreign keys reference (self references left out)
+    """
+    sql = Path(sql_path).read_text(encoding="utf-8")
+    sql = re.sub(r"/\*.*?\*/", "", sql, flags=re.S)  # block comments
+    sql = re.sub(r"--[^\n]*", "", sql)  # line comments
+
+    graph = {}
+    for statement in sql.split(";"):
+        match = re.search(r"\b(?:CREATE|ALTER)\s+TABLE\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(?:ONLY\s+)?\"?(\w+)",
+                          statement, flags=re.I)
+        if match is None:
+            continue
+        table = match.group(1).lower()
+        references = {ref.lower() for ref in re.findall(r"\bREFERENCES\s+\"?(\w+)", statement, flags=re.I)}
+        graph.setdefault(table, set()).update(references - {table})
+    return graph
+
+
+def load_dependency_graph(sql_path=create_statements_path):
+    """Dict of table name -> set of the tables it is loaded after: its foreign keys plus trigger_dependencies."""
+    graph = foreign_key_graph(sql_path)
+    for table, tables_used in trigger_dependencies.items():
+        graph.setdefault(table, set()).update(tables_used - {table})
+    return graph
+
+
+def load_levels(tables, graph):
+    """
+    Groups tables into levels, every table only references tables of earlier levels.
+    References to tables that are not loaded are ignored (they are filled by triggers or not at all).
+    :return: List of levels, each a sorted list of table names
+    """
+    remaining = {table: graph.get(table, set()) & set(tables) for table in tables}
+    levels = []
+    while remaining:
+        level = sorted(table for table, deps in remaining.items() if not deps)
+        if not level:
+            raise ValueError(f"Foreign key cycle between {', '.join(sorted(remaining))}")
+        levels.append(level)
+        remaining = {table: deps - set(level) for table, deps in remaining.items() if table not in level}
+    return levels
+
+
+def load_tables(connection_params, table_files, mode="copy", max_workers=4, batch_size=50000,
+                chunk_size=8 * 1024 * 1024, sql_path=create_statements_path):
+    """
+    Loads every table once, each as soon as the tables its foreign keys reference and its triggers use are loaded
+    (see load_dependency_graph), independent tables concurrently over a pool of max_workers connections.
+    When a table fails, the tables referencing it are skipped and a RuntimeError is raised at the end.
+
+    :param table_files: Dict of table name -> csv path.
+    :param mode: "copy" or "insert".
+    :return: Dict of table name -> rows loaded
+    """
+    graph = load_dependency_graph(sql_path)
+    load_levels(table_files, graph)  # fails early on a cycle
+    deps = {table: graph.get(table, set()) & set(table_files) for table in table_files}
+    # tables others wait for start first
+    n_dependants = {table: sum(table in table_deps for table_deps in deps.values()) for table in table_files}
+
+    connection_pool = ThreadedConnectionPool(1, max_workers, **connection_params)
+
+    def load(table):
+        conn = connection_pool.getconn()
+        start = time.perf_counter()
+        try:
+            if mode == "copy":
+                rows = copy_csv_file(conn, table, table_files[table], chunk_size)
+            else:
+                rows = insert_csv_batched(conn, table, table_files[table], batch_size)
+            conn.commit()
+            print_load_rate(table, rows, time.perf_counter() - start)
+            return rows
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            connection_pool.putconn(conn)
+
+    pending = dict(table_files)
+    status = {}
+    loaded = {}
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                for table in sorted(pending, key=lambda name: (-n_dependants[name], name)):
+                    if any(status.get(dep) in ("failed", "skipped") for dep in deps[table]):
+                        status[table] = "skipped"
+                        del pending[table]
+                    elif all(status.get(dep) == "done" for dep in deps[table]):
+                        print("Current Table:", table)
+                        running[executor.submit(load, table)] = table
+                        del pending[table]
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table = running.pop(future)
+                    try:
+                        loaded[table] = future.result()
+                        status[table] = "done"
+                    except Exception as error:
+                        print(f"Error while loading {table}: {error}")
+                        status[table] = "failed"
+    finally:
+        connection_pool.closeall()
+
+    not_loaded = sorted(table for table, table_status in status.items() if table_status != "done")
+    if not_loaded:
+        raise RuntimeError(f"Tables not loaded: {', '.join(not_loaded)}")
+    return loaded
+
+
 # DB connection settings
 conn_params = {
     "dbname": "StarMart",
@@ -64,49 +359,60 @@ conn_params = {
     "port": 5432,
 }
 
-# Files to be inserted in this order
+# Files to be loaded, the load order comes from the foreign keys of StarMart_Create_Statements.sql and the triggers
 small_csv = [
     "StarMart_Stores.csv",
     "StarMart_Employees.csv",
     "StarMart_Products.csv",
     "StarMart_Vendors.csv",
+    "StarMart_Vendor_Prices.csv",
     "StarMart_Markup_Discount.csv",
     "StarMart_Inventory_Lookup.csv",
     "StarMart_Customers.csv",
     "StarMart_Discount_Dates.csv",
     "StarMart_Holiday_Dates.csv",
-    "StarMart_Markup_Discount.csv",
     "StarMart_Restock_Dates.csv",
     "StarMart_Holiday_Lookup.csv"
 ]
 
-for csv_file in small_csv:
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the StarMart csv files into postgres")
+    parser.add_argument("--mode", choices=["copy", "insert"], default="copy",
+                        help="COPY FROM STDIN (default) or batched executemany INSERTs")
+    parser.add_argument("--chunk-size", type=int, default=8 * 1024 * 1024,
+                        help="Characters sent per round trip by the COPY loader")
+    parser.add_argument("--benchmark", metavar="CSV_FILE",
+                        help="Compare both loaders on one file (e.g. StarMart_Orders.csv) instead of loading")
+    parser.add_argument("--workers", type=int, default=4, help="Tables loaded at the same time (connections)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_loaders(conn_params, args.benchmark.replace(".csv", "").lower(), base_dir / args.benchmark,
+                          chunk_size=args.chunk_size)
+        raise SystemExit
+
+    csv_file = "StarMart_Orders.csv"
     curr_path = base_dir / csv_file
-    sql_table_name = csv_file.replace(".csv", "").lower()
-    load_csv_batched(conn_params, sql_table_name, curr_path, 100000)
-
-csv_file = "StarMart_Orders.csv"
-curr_path = base_dir / csv_file
-
-# # Load the CSV
-# df = pd.read_csv(curr_path)
-#
-# # Extract numeric ID from STRMRT_LINE_ID_* column
-# df['numeric_id'] = df['line_order_id'].str.extract(r'_(\d+)$').astype(int)
-#
-# # Sort by the numeric ID
-# df = df.sort_values('numeric_id')
-#
-# # Remove the first 1,100,000 rows
-# n_remove_rows = 1100000
-# df = df[df['numeric_id'] > n_remove_rows]
-#
-# # Drop the helper column
-# df = df.drop(columns=['numeric_id'])
-#
-# # Save back to CSV
-# df.to_csv(curr_path, index=False)
-
-# Prepare table name and load to SQL
-sql_table_name = csv_file.replace(".csv", "").lower()
-load_csv_batched(conn_params, sql_table_name, curr_path, 50000)
+
+    # # Load the CSV
+    # df = pd.read_csv(curr_path)
+    #
+    # # Extract numeric ID from STRMRT_LINE_ID_* column
+    # df['numeric_id'] = df['line_order_id'].str.extract(r'_(\d+)$').astype(int)
+    #
+    # # Sort by the numeric ID
+    # df = df.sort_values('numeric_id')
+    #
+    # # Remove the first 1,100,000 rows
+    # n_remove_rows = 1100000
+    # df = df[df['numeric_id'] > n_remove_rows]
+    #
+    # # Drop the helper column
+    # df = df.drop(columns=['numeric_id'])
+    #
+    # # Save back to CSV
+    # df.to_csv(curr_path, index=False)
+
+    # Prepare table names and load to SQL, every table once
+    table_csv_files = {file.replace(".csv", "").lower(): base_dir / file for file in [*small_csv, csv_file]}
+    load_tables(conn_params, table_csv_files, args.mode, args.workers, chunk_size=args.chunk_size)
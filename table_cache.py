@@ -0,0 +1,189 @@
+import hashlib
+import inspect
+import json
+import os
+import random
+import sys
+import types
+from functools import wraps
+from pathlib import Path
+from uuid import uuid4
+
+import faker.generator
+import numpy as np
+import pandas as pd
+
+project_dir = Path(__file__).resolve().parent
+# Cached dimension tables live next to the scripts, one pickle per cache key
+cache_dir = project_dir / ".table_cache"
+project_data_path = project_dir / "project_data.py"
+
+# key -> DataFrame, so repeated calls in the same process skip the disk as well
+_memory_cache = {}
+_file_hashes = {}
+_source_hashes = {}
+
+
+def file_hash(path: Path) -> str:
+    """
+    Returns the sha256 of a file, memoized on (path, size, mtime) so unchanged files are hashed once per process.
+    :param path: File to hash.
+    :return: Hex digest of the file content.
+    """
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _file_hashes:
+        _file_hashes[memo_key] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return _file_hashes[memo_key]
+
+
+def unique_tmp_path(path: Path) -> Path:
+    """Temporary sibling of path no other process or thread uses, moved onto path once complete."""
+    return path.with_name(f".{path.name}.{os.getpid()}.{uuid4().hex}.tmp")
+
+
+def is_project_code(obj) -> bool:
+    """True for functions and classes defined in a module of this directory."""
+    module = sys.modules.get(getattr(obj, "__module__", None) or "")
+    module_file = getattr(module, "__file__", None)
+    return module_file is not None and Path(module_file).resolve().parent == project_dir
+
+
+def code_names(code: types.CodeType) -> set[str]:
+    """Global and attribute names used by a code object and the functions / comprehensions nested in it."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+def code_members(obj) -> list:
+    """Functions whose code belongs to obj: the function itself, or every method of a class (unwrapped)."""
+    if inspect.isclass(obj):
+        return [inspect.unwrap(m) for m in vars(obj).values() if inspect.isfunction(inspect.unwrap(m))]
+    return [obj]
+
+
+def project_callees(func) -> list:
+    """
+    Every project function and class reachable from func through global names, func included.
+    Decorated functions (lru_cache, cached_table) are unwrapped.
+    """
+    seen = {}
+    stack = [inspect.unwrap(func)]
+    while stack:
+        obj = stack.pop()
+        key = f"{obj.__module__}.{obj.__qualname__}"
+        if key in seen:
+            continue
+        seen[key] = obj
+
+        for member in code_members(obj):
+            for name in code_names(member.__code__):
+                target = member.__globals__.get(name)
+                target = inspect.unwrap(target) if callable(target) else target
+                if (inspect.isfunction(target) or inspect.isclass(target)) and is_project_code(target):
+                    stack.append(target)
+    return [seen[key] for key in sorted(seen)]
+
+
+def source_hash(func) -> str:
+    """sha256 over the source of func and of every project function / class it calls, memoized per process."""
+    if func not in _source_hashes:
+        digest = hashlib.sha256()
+        for obj in project_callees(func):
+            digest.update(f"{obj.__module__}.{obj.__qualname__}".encode())
+            digest.update(inspect.getsource(obj).encode())
+        _source_hashes[func] = digest.hexdigest()
+    return _source_hashes[func]
+
+
+def table_cache_key(func, seed, args=(), kwargs=None) -> str:
+    """
+    Builds the content address of a dimension table.
+    The key covers the builder (name and source of the builder and of everything it calls), the seed, the call
+    arguments and the content of project_data.py, so editing any of them produces a new key instead of returning a
+    stale table.
+
+    :param func: Table builder function.
+    :param seed: Seed the builder uses for its random draws.
+    :param args: Positional arguments of the call.
+    :param kwargs: Keyword arguments of the call.
+    :return: Hex digest identifying the table.
+    """
+    config = json.dumps({"args": list(args), "kwargs": kwargs or {}}, sort_keys=True, default=str)
+    parts = [
+        f"{func.__module__}.{func.__qualname__}",
+        source_hash(func),
+        str(seed),
+        hashlib.sha256(config.encode()).hexdigest(),
+        file_hash(project_data_path),
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def seeded_build(func, seed, args, kwargs) -> pd.DataFrame:
+    """
+    Runs a builder with random, np.random and Faker's shared random seeded with seed, then restores their states.
+    The table only depends on its key, and the global streams are the same whether the table was built or read
+    from the cache.
+    """
+    if seed is None:
+        return func(*args, **kwargs)
+
+    states = random.getstate(), np.random.get_state(), faker.generator.random.getstate()
+    random.seed(seed)
+    np.random.seed(seed)
+    faker.generator.random.seed(seed)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        random.setstate(states[0])
+        np.random.set_state(states[1])
+        faker.generator.random.setstate(states[2])
+
+
+def cached_table(seed=None):
+    """
+    Decorator that memoizes a DataFrame builder in memory and on disk (pickle, pandas' native binary format).
+    Later calls with the same key return a copy of the cached frame instead of rebuilding it.
+
+    :param seed: Seed of random, np.random and Faker during the build (see seeded_build), part of the cache key.
+        Builders that draw random values must give one, or their table depends on the state of the process.
+    :return: Decorator.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = table_cache_key(func, seed, args, kwargs)
+
+            if key not in _memory_cache:
+                cache_file = cache_dir / f"{func.__name__}_{key[:16]}.pkl"
+                if cache_file.exists():
+                    _memory_cache[key] = pd.read_pickle(cache_file)
+                else:
+                    df = seeded_build(func, seed, args, kwargs)
+                    cache_dir.mkdir(parents=True, exist_ok=True)
+                    # write then rename, so a crashed run never leaves half a pickle behind, and processes building
+                    # the same table at once each write their own file (the last rename wins, the content is equal)
+                    tmp_file = unique_tmp_path(cache_file)
+                    df.to_pickle(tmp_file)
+                    os.replace(tmp_file, cache_file)
+                    _memory_cache[key] = df
+
+            return _memory_cache[key].copy()
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def clear_table_cache():
+    """Removes every cached table from memory and disk."""
+    _memory_cache.clear()
+    if cache_dir.exists():
+        for cache_file in cache_dir.glob("*.pkl"):
+            cache_file.unlink()
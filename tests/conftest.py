@@ -0,0 +1,37 @@
+import sys
+import types
+from datetime import datetime
+from pathlib import Path
+
+# the modules are scripts in the repository root (and other_scripts), not an installed package
+repo_dir = Path(__file__).resolve().parent.parent
+for path in (repo_dir, repo_dir / "other_scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+try:
+    import raw_data  # noqa: F401
+except ImportError:
+    # raw_data.py holds the hand-tuned impact tables of other_scripts and is not part of the repository, the tests
+    # only need the holiday lookup
+    sys.modules["raw_data"] = types.SimpleNamespace(
+        holiday_impact={}, family_impact={}, income_impact={}, store_impact={}, discount_impact={},
+        month_impact={}, daily_impact={}, high_traffic_periods=[],
+        holiday_lookup={datetime(2024, 7, 4): "Independence Day"},
+    )
+
+try:
+    import psycopg2  # noqa: F401
+except ImportError:
+    # sql_writer imports psycopg2 at module level, the tests replace every connection with a fake one
+    psycopg2 = types.ModuleType("psycopg2")
+    psycopg2.DatabaseError = type("DatabaseError", (Exception,), {})
+
+    def connect(**params):
+        raise psycopg2.DatabaseError("psycopg2 is not installed, patch sql_writer.psycopg2.connect")
+
+    psycopg2.connect = connect
+    psycopg2.pool = types.ModuleType("psycopg2.pool")
+    psycopg2.pool.ThreadedConnectionPool = None
+    sys.modules["psycopg2"] = psycopg2
+    sys.modules["psycopg2.pool"] = psycopg2.pool
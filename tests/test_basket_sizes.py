@@ -0,0 +1,74 @@
+import pickle
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import all_functions
+from all_functions import HeuristicBasketSizes, ModelBasketSizes, basket_size_calculator
+from cart_size_training import cart_categories, cart_feature_columns, numeric_scale
+from retail_calendar import holiday_names
+
+
+@pytest.fixture
+def customers(monkeypatch):
+    context = SimpleNamespace(dict={"A": {"membership": 1}, "B": {"membership": 0}}, codes={"A": 0, "B": 1},
+                              family_size=np.array([2, 4]), income=np.array([50000, 90000]))
+    monkeypatch.setattr(all_functions, "customer_context", lambda: context)
+
+
+def test_heuristic_basket_sequence(customers):
+    provider = HeuristicBasketSizes(seed=42)
+    holiday = provider.basket_sizes(datetime(2024, 7, 4), "High", 1, "Independence Day", ["A", "B"] * 4)
+    normal_day = provider.basket_sizes(datetime(2024, 3, 5), "Low", 0, "Normal Day", ["A", "B"] * 4)
+
+    assert holiday.tolist() == [13, 24, 22, 22, 27, 26, 26, 23]
+    assert normal_day.tolist() == [14, 8, 14, 10, 13, 7, 14, 10]
+
+
+def test_basket_sizes_leave_global_rng_alone(customers):
+    np.random.seed(7)
+    expected = np.random.rand(3)
+
+    np.random.seed(7)
+    HeuristicBasketSizes().basket_sizes(datetime(2024, 7, 4), "High", 1, "Independence Day", ["A", "B"] * 10)
+    basket_size_calculator(datetime(2024, 7, 4), "Medium", 1, "Independence Day", 1)
+    np.testing.assert_array_equal(np.random.rand(3), expected)
+
+
+class LinearModel:
+    def __init__(self, weights):
+        self.weights = weights
+
+    def predict(self, features):
+        return features @ self.weights
+
+
+def save_bundle(path, categories):
+    columns = cart_feature_columns(categories)
+    # every holiday gets its own basket size, 10 x its calendar code
+    weights = np.zeros(len(columns))
+    for code, name in enumerate(categories["holiday"]):
+        weights[columns.index(f"holiday_{name}")] = 10 * (list(holiday_names).index(name) + 1)
+    bundle = {"model": LinearModel(weights), "feature_columns": columns, "categories": categories,
+              "numeric_scale": numeric_scale, "residual_std": 0.0}
+    with open(path, "wb") as file:
+        pickle.dump(bundle, file)
+    return path
+
+
+def test_every_calendar_holiday_reaches_the_model(customers, tmp_path):
+    provider = ModelBasketSizes(save_bundle(tmp_path / "model.pkl", cart_categories()))
+
+    for code, name in enumerate(holiday_names):
+        sizes = provider.basket_sizes(datetime(2024, 3, 5), "High", 0, name, ["A", "B"])
+        assert sizes.tolist() == [10 * (code + 1)] * 2
+
+
+def test_model_without_a_calendar_holiday_is_rejected(tmp_path):
+    categories = cart_categories()
+    categories["holiday"] = categories["holiday"][:-1]
+
+    with pytest.raises(ValueError, match=holiday_names[-1]):
+        ModelBasketSizes(save_bundle(tmp_path / "model.pkl", categories))
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cart_size_calculator
+from cart_size_calculator import StreamingStats, discount_day_set, get_discount_flag, holiday_names_of, to_day_ordinals
+
+
+def test_discount_list_is_converted_once(monkeypatch):
+    calls = []
+    to_day_ordinals = cart_size_calculator.to_day_ordinals
+    monkeypatch.setattr(cart_size_calculator, "to_day_ordinals",
+                        lambda dates: calls.append(dates) or to_day_ordinals(dates))
+    cart_size_calculator.day_set_of.cache_clear()
+
+    discount_dates = [datetime(2024, 3, 5), datetime(2024, 3, 6)]
+    flags = [get_discount_flag(datetime(2024, 3, day), discount_dates) for day in range(1, 10)]
+
+    assert [flag for flag, _ in flags] == [0, 0, 0, 0, 1, 1, 0, 0, 0]
+    # one conversion of the list, plus one per checked date
+    assert len(calls) == 1 + len(flags)
+    assert discount_day_set(discount_dates) is discount_day_set(tuple(discount_dates))
+
+
+def test_holiday_takes_precedence():
+    assert get_discount_flag(datetime(2024, 7, 4), discount_day_set([])) == (1, "Independence Day")
+
+
+@pytest.mark.parametrize("values, bin_width", [
+    (np.random.default_rng(1).integers(1, 40, 10_001), 1.0),
+    (np.random.default_rng(2).integers(1, 40, 10_000), 1.0),
+    (np.random.default_rng(3).gamma(4, 3, 9_999), 0.5),
+    (np.array([3, 7]), 1.0),
+])
+def test_quantiles_match_pandas(values, bin_width):
+    stats = StreamingStats(bin_width)
+    for chunk in np.array_split(values, 7):
+        stats.update(chunk)
+
+    series = pd.Series(values)
+    # integer values fall on the bin edges, their quantiles are exact
+    tolerance = 1e-9 if values.dtype.kind == "i" else bin_width
+    for q in (0, 0.01, 0.25, 0.5, 0.75, 0.99, 1):
+        assert stats.quantile(q) == pytest.approx(series.quantile(q), abs=tolerance)
+    assert stats.median == pytest.approx(series.median(), abs=tolerance)
+
+
+def test_holiday_lookup_is_built_once(monkeypatch):
+    cart_size_calculator.holiday_lookup_arrays.cache_clear()
+    days = to_day_ordinals([datetime(2024, 7, 3), datetime(2024, 7, 4)])
+
+    first = holiday_names_of(days)
+    monkeypatch.setattr(cart_size_calculator, "holiday_lookup", {})
+    second = holiday_names_of(days)
+    cart_size_calculator.holiday_lookup_arrays.cache_clear()
+
+    assert first.tolist() == second.tolist() == ["Normal Day", "Independence Day"]
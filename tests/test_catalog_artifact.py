@@ -0,0 +1,38 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from catalog_artifact import artifact_is_current, build_catalog_artifact, build_path, compile_catalog
+
+
+def test_concurrent_builds_publish_one_complete_artifact(tmp_path):
+    out_dir = tmp_path / "catalog"
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        manifests = list(pool.map(build_catalog_artifact, [out_dir] * 8))
+
+    assert set(manifests) == {build_path(out_dir) / "manifest.json"}
+    assert artifact_is_current(out_dir)
+    # every temporary directory was either published or removed
+    assert [path.name for path in out_dir.iterdir()] == [build_path(out_dir).name]
+
+
+def test_rebuild_keeps_published_build(tmp_path):
+    out_dir = tmp_path / "catalog"
+    build_catalog_artifact(out_dir)
+    mapped = np.load(build_path(out_dir) / "product_cost.npy", mmap_mode="r")
+
+    build_catalog_artifact(out_dir)
+    np.testing.assert_array_equal(mapped, compile_catalog()["product_cost"])
+
+
+def test_publish_prunes_stale_builds(tmp_path):
+    out_dir = tmp_path / "catalog"
+    stale = out_dir / "v1-0123456789abcdef"
+    in_progress = out_dir / ".v2-0123456789abcdef.123.tmp"
+    for path in (stale, in_progress):
+        path.mkdir(parents=True)
+        (path / "manifest.json").write_text("{}")
+
+    build_catalog_artifact(out_dir)
+
+    assert sorted(path.name for path in out_dir.iterdir()) == sorted([build_path(out_dir).name, in_progress.name])
@@ -0,0 +1,54 @@
+import csv
+import gzip
+
+import pandas as pd
+import pytest
+
+import compressed_io
+from compressed_io import BackgroundWriter, find_output, open_input, open_output, read_output_csv
+
+rows = [["line_order_id", "product_id", "quantity"]] + [
+    [f"STRMRT_LN_{i}", f"Pasta, \"Penne\" {i % 7}" if i % 11 == 0 else f"STRMRT_PRD_{i}", str(i % 5)]
+    for i in range(20_000)
+]
+
+compressions = [
+    None,
+    "gzip",
+    pytest.param("zstd", marks=pytest.mark.skipif(compressed_io.zstandard is None, reason="zstandard not installed")),
+]
+
+
+@pytest.mark.parametrize("compression", compressions)
+def test_background_writer_round_trip(tmp_path, compression):
+    path = compressed_io.output_path(tmp_path / "StarMart_Test.csv", compression)
+    # a small chunk size so the rows go through the writer thread in many chunks
+    with BackgroundWriter(path, compression, chunk_size=4096) as file:
+        csv.writer(file).writerows(rows)
+
+    with open_input(tmp_path / "StarMart_Test.csv") as file:
+        assert list(csv.reader(file)) == rows
+    if compression == "gzip":
+        with gzip.open(path, "rt", newline="") as file:
+            assert list(csv.reader(file)) == rows
+
+
+@pytest.mark.parametrize("compression", compressions)
+def test_plain_name_finds_compressed_output(tmp_path, compression, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "StarMart_Test.csv").write_text("stale\n")
+    with open_output(tmp_path / "StarMart_Test.csv", compression) as file:
+        pd.DataFrame(rows[1:], columns=rows[0]).to_csv(file, index=False)
+
+    # the notebooks read the plain name from their own directory
+    assert find_output("StarMart_Test.csv").name == compressed_io.output_path("StarMart_Test.csv", compression).name
+    df = read_output_csv("StarMart_Test.csv", dtype=str)
+    assert df.values.tolist() == rows[1:]
+
+
+def test_writer_error_is_raised_on_close(tmp_path):
+    writer = BackgroundWriter(tmp_path / "StarMart_Test.csv", chunk_size=1)
+    writer.file.close()  # the writer thread fails on its first write
+    with pytest.raises(ValueError):
+        writer.write("a,b\n")
+        writer.close()
@@ -0,0 +1,102 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import dataset_registry
+import pipeline
+from dataset_registry import flush_writes, get_dataset, pickle_is_current, publish_dataset
+
+
+@pytest.fixture(autouse=True)
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(dataset_registry, "_datasets", {})
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame({"product_id": ["STRMRT_PRD_1", "STRMRT_PRD_2"], "quantity": [3, 5]})
+
+
+def forget(csv_path):
+    """Drops the in-memory copy, as another worker process would not have it."""
+    dataset_registry._datasets.pop(str(csv_path))
+
+
+def test_pickle_is_used_once_csv_is_written(tmp_path, table):
+    csv_path = tmp_path / "StarMart_Test.csv"
+    publish_dataset(csv_path, table)
+    flush_writes()
+    forget(csv_path)
+
+    assert pickle_is_current(csv_path)
+    pd.testing.assert_frame_equal(get_dataset(csv_path), table)
+    pd.testing.assert_frame_equal(get_dataset(csv_path, ["quantity"]), table[["quantity"]])
+
+
+@pytest.mark.parametrize("edit", ["content", "mtime"])
+def test_pickle_is_rejected_when_csv_changes(tmp_path, table, edit):
+    csv_path = tmp_path / "StarMart_Test.csv"
+    publish_dataset(csv_path, table)
+    flush_writes()
+    forget(csv_path)
+
+    if edit == "content":
+        with open(csv_path, "a") as file:
+            file.write("STRMRT_PRD_3,7\n")
+    else:
+        stat = csv_path.stat()
+        os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert not pickle_is_current(csv_path)
+    expected = len(table) + (edit == "content")
+    assert len(get_dataset(csv_path)) == expected
+
+
+def test_pickle_is_not_trusted_before_csv_is_written(tmp_path, table, monkeypatch):
+    release = threading.Event()
+    write_csv = dataset_registry.write_csv
+
+    def slow_write_csv(*args):
+        release.wait(5)
+        write_csv(*args)
+
+    monkeypatch.setattr(dataset_registry, "write_csv", slow_write_csv)
+    csv_path = tmp_path / "StarMart_Test.csv"
+    publish_dataset(csv_path, table)
+
+    assert not pickle_is_current(csv_path)
+    release.set()
+    flush_writes()
+    assert pickle_is_current(csv_path)
+
+
+def test_outputs_are_flushed_before_they_are_hashed(tmp_path, monkeypatch):
+    release = threading.Event()
+    write_csv = dataset_registry.write_csv
+
+    def slow_write_csv(*args):
+        release.wait(0.5)
+        write_csv(*args)
+
+    def publishing_stage():
+        publish_dataset(tmp_path / "StarMart_Test.csv", pd.DataFrame({"value": range(100_000)}))
+
+    monkeypatch.setattr(dataset_registry, "write_csv", slow_write_csv)
+    # run_stage runs the stage in this process, as a pool worker does
+    result = pipeline.run_stage(pipeline.Stage("test", publishing_stage, outputs=["StarMart_Test.csv"]), tmp_path)
+
+    record = result["files"]["StarMart_Test.csv"]
+    assert record["size"] == (tmp_path / "StarMart_Test.csv").stat().st_size
+    assert record["sha256"] == pipeline.sha256_file(tmp_path / "StarMart_Test.csv")
+
+
+def test_flush_writes_reraises_failed_write(tmp_path, table, monkeypatch):
+    def failing_write_csv(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(dataset_registry, "write_csv", failing_write_csv)
+    publish_dataset(tmp_path / "StarMart_Test.csv", table)
+    with pytest.raises(OSError, match="disk full"):
+        flush_writes()
@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+repo_dir = Path(__file__).resolve().parent.parent
+project_modules = {path.stem for path in repo_dir.glob("*.py")}
+
+# run in a fresh interpreter from an empty directory, so no dataset or cached state is within reach
+probe = """
+import functools, json, sys
+sys.path.insert(0, sys.argv[1])
+import all_functions, table_cache
+cached = {name: value.cache_info().currsize for name, value in vars(all_functions).items()
+          if isinstance(value, functools._lru_cache_wrapper)}
+print(json.dumps({"cached": cached, "tables": len(table_cache._memory_cache)}))
+"""
+
+
+def test_import_builds_no_state(tmp_path):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe, str(repo_dir)],
+                            cwd=tmp_path, capture_output=True, text=True, check=True)
+    state = json.loads(result.stdout)
+
+    # get_faker, customer_context, load_catalog_artifact, flatten_product_catalog, .. are only filled on first use
+    assert state["cached"] and not any(state["cached"].values()), state["cached"]
+    assert state["tables"] == 0
+
+    # self time of the project modules, the third party imports (pandas, numpy, faker) are not counted
+    self_us = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            own, _, name = line.removeprefix("import time:").split("|")
+            if own.strip().isdigit():
+                self_us[name.strip()] = int(own)
+    project_s = sum(us for name, us in self_us.items() if name in project_modules) / 1e6
+    assert "all_functions" in self_us
+    assert project_s < 0.25, f"project modules take {project_s:.3f} s to import"
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from all_functions import multiplication_factor, product_markup, product_markup_and_discount
+
+
+def products():
+    subcategories = list(product_markup)
+    return pd.DataFrame({
+        "product_id": [f"STRMRT_PRD_{i}" for i in range(len(subcategories))],
+        "subcategory": subcategories,
+    })
+
+
+def test_float64_table_holds_the_exact_cent_values():
+    table = product_markup_and_discount(products(), dtype=np.float64)
+    expected_markup = np.round([multiplication_factor * product_markup[sub] for sub in product_markup], 2).tolist()
+
+    assert table["markup"].tolist() == expected_markup
+    for column in ["markup", "normal_day_discount", "holiday_discount"]:
+        assert table[column].dtype == np.float64
+        np.testing.assert_array_equal(table[column], table[column].round(2))
+
+
+def test_float32_table_is_the_float64_table_downcast():
+    wide = product_markup_and_discount(products(), dtype=np.float64)
+    narrow = product_markup_and_discount(products())
+
+    for column in ["markup", "normal_day_discount", "holiday_discount"]:
+        assert narrow[column].dtype == np.float32
+        np.testing.assert_array_equal(narrow[column], wide[column].astype(np.float32))
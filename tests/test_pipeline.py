@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+
+import pytest
+
+import pipeline
+import project_data
+from pipeline import Stage, run_pipeline
+from project_data import holiday_weights, season_weights
+
+
+# ---- a two-stage pipeline, each stage reads one project_data section ----
+def first_stage():
+    out_dir = Path(os.environ["PIPELINE_TEST_DIR"])
+    (out_dir / "first.csv").write_text(f"value\n{len(holiday_weights)}\n")
+
+
+def second_stage():
+    out_dir = Path(os.environ["PIPELINE_TEST_DIR"])
+    first = (out_dir / "first.csv").read_text()
+    (out_dir / "second.csv").write_text(first + f"{len(season_weights)}\n")
+
+
+stages = [
+    Stage("first", first_stage, outputs=["first.csv"]),
+    Stage("second", second_stage, inputs=["first.csv"], outputs=["second.csv"]),
+]
+
+
+@pytest.fixture
+def out_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_TEST_DIR", str(tmp_path))
+    return tmp_path
+
+
+def statuses(results):
+    return {name: result["status"] for name, result in results.items()}
+
+
+def test_unchanged_stages_are_skipped(out_dir):
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1)) == {"first": "done", "second": "done"}
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1)) == {"first": "cached", "second": "cached"}
+
+
+def test_section_edit_only_rebuilds_stages_reading_it(out_dir, monkeypatch):
+    run_pipeline(stages, out_dir, max_workers=1)
+
+    monkeypatch.setattr(project_data, "season_weights", {**season_weights, "Test Season": {}})
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1)) == {"first": "cached", "second": "done"}
+
+
+def test_edited_output_is_rebuilt(out_dir):
+    run_pipeline(stages, out_dir, max_workers=1)
+
+    (out_dir / "second.csv").write_text("edited\n")
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1)) == {"first": "cached", "second": "done"}
+
+
+def test_force_and_from_rerun_the_selected_stages(out_dir):
+    run_pipeline(stages, out_dir, max_workers=1)
+
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1, only=["second"], force=True)) == {"second": "done"}
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1, start_from="first", force=True)) == {
+        "first": "done", "second": "done"}
+    # without --force the selection is still skipped when current
+    assert statuses(run_pipeline(stages, out_dir, max_workers=1, start_from="second")) == {"second": "cached"}
+
+
+def names(selected):
+    return [stage.name for stage in selected]
+
+
+def test_select_stages():
+    assert names(pipeline.select_stages(stages)) == ["first", "second"]
+    assert names(pipeline.select_stages(stages, only=["second"])) == ["second"]
+    assert names(pipeline.select_stages(stages, start_from="first")) == ["first", "second"]
+    assert names(pipeline.select_stages(stages, start_from="second")) == ["second"]
+    assert names(pipeline.select_stages(stages, only=["first"], start_from="second")) == []
+    with pytest.raises(ValueError, match="Unknown stages: third"):
+        pipeline.select_stages(stages, only=["third"])
+
+
+def test_missing_input_of_partial_run(out_dir):
+    with pytest.raises(FileNotFoundError, match="first.csv"):
+        run_pipeline(stages, out_dir, max_workers=1, only=["second"])
+
+
+# ---- the real stages ----
+def test_markup_settings_only_fingerprint_stages_reading_them():
+    import csv_writer
+
+    sections = {stage.name: pipeline.stage_dependencies_of_code(stage.func)["sections"]
+                for stage in csv_writer.pipeline_stages}
+    assert "product_markup" in sections["markup"]
+    for name in ("customers", "employees", "products", "stores", "calendar", "vendors"):
+        assert "product_markup" not in sections[name], name
@@ -0,0 +1,28 @@
+import numpy as np
+
+from restock_forecast import forecast_restock_quantities
+
+
+def forecast(demand):
+    n_products, n_periods = demand.shape
+    return forecast_restock_quantities(
+        demand,
+        period_days=np.full(n_products, 6),
+        anchor_day=np.full(n_products, np.datetime64("2024-03-04")),
+        end_day=np.datetime64("2024-03-04") + 6 * n_periods,
+        safety_pct=np.full(n_products, 10),
+    )[0]
+
+
+def test_first_period_does_not_use_its_own_sales():
+    # same total sales, period 0 holds 10x more for the first product
+    demand = np.array([
+        [300, 30, 30, 30, 30],
+        [84, 84, 84, 84, 84],
+    ])
+    restock_qty = forecast(demand)
+
+    assert restock_qty[0, 0] == restock_qty[1, 0]
+    # the 84 units a period of the second product are forecast, plus the safety stock
+    assert restock_qty[1, 0] == np.ceil(84 * 1.1)
+
@@ -0,0 +1,110 @@
+import csv
+import gzip
+import io
+
+import pytest
+
+import sql_writer
+
+
+class FakeCursor:
+    """Records what a loader sends: the executemany rows, or the csv text read by copy_expert."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def executemany(self, sql, rows):
+        self.connection.statements.append(sql)
+        self.connection.rows.extend(rows)
+
+    def copy_expert(self, sql, stream, size=8192):
+        self.connection.statements.append(sql)
+        text = "".join(iter(lambda: stream.read(size), ""))
+        rows = [tuple(row) for row in csv.reader(io.StringIO(text, newline=""))]
+        self.connection.rows.extend(rows)
+        self.rowcount = len(rows)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.rows = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+header = ["line_order_id", "order_id", "customer_id", "product_id", "quantity", "order_time"]
+rows = [
+    [f"STRMRT_LN_{i}", f"STRMRT_ORD_{i // 3}", f"STRMRT_CSTMR_{i % 97}", f"STRMRT_PRD_{i % 13}", str(i % 5 + 1),
+     f"2024-01-01 {i % 24:02d}:00:00"]
+    for i in range(10_000)
+]
+# values the csv module quotes: commas, quotes and line breaks
+rows[1][3] = 'Pasta, "Penne"'
+rows[2][3] = "two\nlines"
+
+
+@pytest.fixture(params=["csv", "gzip"])
+def csv_path(request, tmp_path):
+    path = tmp_path / "StarMart_Orders.csv"
+    opener = gzip.open if request.param == "gzip" else open
+    target = path.with_name(path.name + ".gz") if request.param == "gzip" else path
+    with opener(target, "wt", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return path
+
+
+def test_copy_and_executemany_load_the_same_rows(csv_path, monkeypatch):
+    connections = []
+
+    def connect(**params):
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(sql_writer.psycopg2, "connect", connect)
+
+    sql_writer.load_csv_batched({}, "starmart_orders", csv_path, batch_size=3_000)
+    copied = sql_writer.load_csv_copy({}, "starmart_orders", csv_path, chunk_size=4096)
+    inserted, copy = connections
+
+    assert copied == len(rows)
+    assert inserted.rows == copy.rows == [tuple(row) for row in rows]
+    assert all(f"starmart_orders ({', '.join(header)})" in sql for sql in inserted.statements + copy.statements)
+    # executemany commits every batch, COPY once
+    assert (inserted.commits, copy.commits) == (4, 1)
+
+
+def test_chunk_stream_matches_joined_text():
+    chunks = ["a,b\n1,", "2\n3,4", "\n", "", "5,6\n"]
+    stream = sql_writer.ChunkStream(chunks)
+    assert stream.readline() == "a,b\n"
+    assert "".join(iter(lambda: stream.read(3), "")) == "".join(chunks)[4:]
+
+
+def test_orders_load_after_every_table_their_triggers_read():
+    tables = [file.replace(".csv", "").lower() for file in [*sql_writer.small_csv, "StarMart_Orders.csv"]]
+    levels = sql_writer.load_levels(tables, sql_writer.load_dependency_graph())
+    level_of = {table: idx for idx, level in enumerate(levels) for table in level}
+
+    for table in ("starmart_restock_dates", "starmart_inventory_lookup", "starmart_products", "starmart_vendors"):
+        assert level_of[table] < level_of["starmart_orders"], table
@@ -0,0 +1,101 @@
+import importlib
+import random
+import sys
+
+import faker.generator
+import numpy as np
+import pandas as pd
+import pytest
+from faker import Faker
+
+import table_cache
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Throwaway project directory holding the builder modules of a test, with its own cache."""
+    monkeypatch.setattr(table_cache, "project_dir", tmp_path)
+    monkeypatch.setattr(table_cache, "cache_dir", tmp_path / ".table_cache")
+    monkeypatch.setattr(table_cache, "_memory_cache", {})
+    monkeypatch.setattr(table_cache, "_source_hashes", {})
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def write_module(name, source):
+        (tmp_path / f"{name}.py").write_text(source)
+        sys.modules.pop(name, None)
+        importlib.invalidate_caches()
+        return importlib.import_module(name)
+
+    yield write_module
+    for name in [name for name, module in sys.modules.items()
+                 if str(getattr(module, "__file__", "")).startswith(str(tmp_path))]:
+        del sys.modules[name]
+
+
+builder_source = """
+import pandas as pd
+from table_cache import cached_table
+
+
+def helper():
+    return {value}
+
+
+@cached_table()
+def build():
+    return pd.DataFrame({{"x": [helper()]}})
+"""
+
+
+def test_key_covers_callee_source(project):
+    first = project("builders_a", builder_source.format(value=1))
+    second = project("builders_b", builder_source.format(value=2))
+
+    assert [obj.__name__ for obj in table_cache.project_callees(first.build)] == ["build", "helper"]
+    assert table_cache.source_hash(first.build) != table_cache.source_hash(second.build)
+
+
+def test_callee_edit_rebuilds_table(project):
+    assert project("builders", builder_source.format(value=1)).build()["x"].tolist() == [1]
+    table_cache._memory_cache.clear()
+    table_cache._source_hashes.clear()
+    assert project("builders", builder_source.format(value=2)).build()["x"].tolist() == [2]
+
+
+seeded_source = """
+import random
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+from table_cache import cached_table
+
+fake = Faker()
+
+
+@cached_table(seed=7)
+def build():
+    return pd.DataFrame({"random": [random.random()], "numpy": [np.random.rand()], "name": [fake.name()]})
+"""
+
+
+def test_seed_is_applied_and_global_state_restored(project):
+    builders = project("seeded_builders", seeded_source)
+
+    random.seed(1)
+    np.random.seed(1)
+    Faker.seed(1)
+    states = random.getstate(), np.random.get_state()[1].copy(), faker.generator.random.getstate()
+    built = builders.build()
+    assert random.getstate() == states[0]
+    assert (np.random.get_state()[1] == states[1]).all()
+    assert faker.generator.random.getstate() == states[2]
+
+    # a fresh process state and an empty cache give the same table
+    table_cache._memory_cache.clear()
+    for cache_file in table_cache.cache_dir.glob("*.pkl"):
+        cache_file.unlink()
+    random.seed(99)
+    np.random.seed(99)
+    Faker.seed(99)
+    pd.testing.assert_frame_equal(builders.build(), built)
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from all_functions import RestockAccumulator, VendorPrices, generate_fake_vendors, vendor_quantity_tiers
+
+
+@pytest.fixture(scope="module")
+def products():
+    rng = np.random.default_rng(0)
+    n = 300
+    return pd.DataFrame({
+        "product_id": [f"STRMRT_PRD_{i}" for i in range(n)],
+        "subcategory": rng.choice(["Bread", "Milk", "Pasta", "Snacks"], size=n),
+        "cost_price": rng.uniform(0.5, 40, size=n).round(2),
+        "shelf_life": rng.choice([3, 10, 60, 365], size=n),
+    })
+
+
+@pytest.fixture(scope="module")
+def vendors(products):
+    return generate_fake_vendors(products, vendors_per_subcategory=5, seed=1)
+
+
+def test_vendor_prices_stay_below_cost(products, vendors):
+    vendors_df, vendor_prices = vendors
+    cost_price = products.set_index("product_id")["cost_price"]
+
+    assert (vendors_df["per_item_cost"] < vendors_df["product_id"].map(cost_price)).all()
+    assert (vendor_prices.unit_cost < cost_price.to_numpy()[:, None, None]).all()
+    assert (vendor_prices.unit_cost > 0).all()
+
+
+def test_price_table_round_trips_through_csv_tables(vendors):
+    vendors_df, vendor_prices = vendors
+    rebuilt = VendorPrices.from_tables(vendors_df, vendor_prices.to_frame())
+
+    np.testing.assert_array_equal(rebuilt.product_ids, vendor_prices.product_ids)
+    np.testing.assert_array_equal(rebuilt.vendor_unique_ids, vendor_prices.vendor_unique_ids)
+    np.testing.assert_allclose(rebuilt.unit_cost, vendor_prices.unit_cost, atol=1e-6)
+    np.testing.assert_array_equal(rebuilt.delivery_fee, vendor_prices.delivery_fee)
+
+
+def test_cheapest_vendor_matches_brute_force(vendors):
+    _, vendor_prices = vendors
+    rng = np.random.default_rng(2)
+    codes = rng.integers(0, len(vendor_prices.product_ids), 500)
+    quantities = rng.integers(1, 400, 500)
+
+    vendor_ids, _, total_cost = vendor_prices.cheapest_vendor(codes, quantities)
+    for vendor_id, cost, code, quantity in zip(vendor_ids, total_cost, codes, quantities):
+        tier = np.searchsorted(vendor_quantity_tiers, quantity, side="right") - 1
+        costs = vendor_prices.unit_cost[code, :, tier] * quantity + vendor_prices.delivery_fee[code]
+        assert cost == pytest.approx(costs.min())
+        assert vendor_id == vendor_prices.vendor_unique_ids[code, np.argmin(costs)]
+
+
+def test_restocks_are_ordered_from_the_cheapest_vendor(products, vendors):
+    _, vendor_prices = vendors
+    accumulator = RestockAccumulator(products, datetime(2024, 1, 1), datetime(2024, 3, 1))
+    rng = np.random.default_rng(3)
+    for _ in range(5000):
+        accumulator.add(products["product_id"].iloc[rng.integers(len(products))], rng.integers(0, 60), 3)
+
+    stocks, _ = accumulator.to_tables(vendor_prices)
+    codes = vendor_prices.product_index.get_indexer(stocks["product_id"])
+    expected = vendor_prices.cheapest_vendor(codes, stocks["prod_lookup_qty"].to_numpy())[0]
+
+    assert list(stocks.columns) == ["product_id", "restock_date", "prod_lookup_qty", "vendor_unique_id"]
+    np.testing.assert_array_equal(stocks["vendor_unique_id"].to_numpy(), expected)
+    pd.testing.assert_frame_equal(accumulator.to_tables()[0], stocks.drop(columns="vendor_unique_id"))